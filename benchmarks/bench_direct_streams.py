@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Benchmark for the streams moved from Zenpy to the tap's own pagination helpers.
+
+Serves pages of ticket_forms, sla_policies, talk_phone_numbers and ticket_metric_events from
+memory and compares the CPU time of reading them through Zenpy, as these streams previously
+did, with reading them as plain dicts through `OffsetBasedStream` and `TimeBasedExportStream`.
+Both paths include `process_record`.
+
+Usage: python benchmarks/bench_direct_streams.py [number_of_pages] [records_per_page]
+"""
+import datetime
+import json
+import sys
+import time
+from unittest.mock import patch
+import requests
+from zenpy import Zenpy
+import singer
+from singer import utils
+from tap_zendesk import streams
+from tap_zendesk.sync import process_record
+
+CONFIG = {"subdomain": "acme", "access_token": "token", "start_date": "2020-01-01T00:00:00Z"}
+STATE = {"bookmarks": {"ticket_forms": {"updated_at": "2020-01-01T00:00:00Z"},
+                       "ticket_metric_events": {"time": "2020-01-01T00:00:00Z"}}}
+
+
+def ticket_form(i):
+    return {"id": i, "name": "Form {}".format(i), "display_name": "Form {}".format(i), "position": i,
+            "active": True, "end_user_visible": True, "default": False, "in_all_brands": True,
+            "ticket_field_ids": list(range(20)), "restricted_brand_ids": [], "raw_name": "Form",
+            "raw_display_name": "Form", "url": "https://acme.zendesk.com/api/v2/ticket_forms/{}.json".format(i),
+            "created_at": "2020-01-01T00:00:00Z", "updated_at": "2020-01-02T00:00:00Z"}
+
+
+def sla_policy(i):
+    return {"id": i, "title": "Policy {}".format(i), "description": "", "position": i,
+            "filter": {"all": [{"field": "type", "operator": "is", "value": "incident"}], "any": []},
+            "policy_metrics": [{"priority": p, "metric": "first_reply_time", "target": 60, "business_hours": False}
+                               for p in ("low", "normal", "high", "urgent")],
+            "created_at": "2020-01-01T00:00:00Z", "updated_at": "2020-01-02T00:00:00Z"}
+
+
+def phone_number(i):
+    return {"id": i, "number": "+1555000{:04d}".format(i), "display_number": "+1 (555) 000-{:04d}".format(i),
+            "name": "Line {}".format(i), "nickname": None, "country_code": "US", "capabilities": {"sms": True},
+            "toll_free": False, "recorded": True, "sms_group_id": None, "greeting_ids": [1, 2],
+            "created_at": "2020-01-01T00:00:00Z"}
+
+
+def ticket_metric_event(i):
+    return {"id": i, "ticket_id": i // 4, "metric": "reply_time", "instance_id": 1, "type": "measure",
+            "time": "2020-01-02T00:00:00Z"}
+
+
+def legacy_ticket_forms(client, stream):
+    """ TicketForms.sync as it was when it read through Zenpy """
+    state = json.loads(json.dumps(STATE))
+    bookmark = stream.get_bookmark(state)
+    for form in client.ticket_forms():
+        if utils.strptime_with_tz(form.updated_at) >= bookmark:
+            stream.update_bookmark(state, form.updated_at)
+            yield form
+
+
+def legacy_ticket_metric_events(client, stream):
+    """ TicketMetricEvents.sync as it was when it read through Zenpy """
+    state = json.loads(json.dumps(STATE))
+    bookmark = stream.get_bookmark(state)
+    start = bookmark - datetime.timedelta(seconds=1)
+    parsed_start = singer.strftime(start, "%Y-%m-%dT%H:%M:%SZ")
+    for event in client.tickets.metrics_incremental(start_time=int(start.timestamp())):
+        if bookmark < utils.strptime_with_tz(event.time):
+            stream.update_bookmark(state, event.time)
+        if parsed_start <= event.time:
+            yield event
+
+
+# stream => (item_key, record factory, extra page fields, the stream's sync through Zenpy)
+STREAMS = {
+    "ticket_forms": ("ticket_forms", ticket_form, {}, legacy_ticket_forms),
+    "sla_policies": ("sla_policies", sla_policy, {}, lambda client, stream: client.sla_policies()),
+    "talk_phone_numbers": ("phone_numbers", phone_number, {}, lambda client, stream: client.talk.phone_numbers()),
+    "ticket_metric_events": ("ticket_metric_events", ticket_metric_event, {"end_time": 1577923200},
+                             legacy_ticket_metric_events),
+}
+
+
+def make_pages(item_key, factory, extra, page_count, records_per_page):
+    pages = []
+    for page in range(page_count):
+        last = page == page_count - 1
+        body = {item_key: [factory(page * records_per_page + i) for i in range(records_per_page)],
+                "next_page": None if last else "https://acme.zendesk.com/api/v2/next?page={}".format(page + 1),
+                "end_of_stream": last, "count": records_per_page, **extra}
+        pages.append(json.dumps(body).encode("utf-8"))
+    return pages
+
+
+def serve(pages):
+    contents = iter(pages)
+
+    def get(self, url, *args, **kwargs): # pylint: disable=unused-argument
+        response = requests.models.Response()
+        response.status_code = 200
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json"
+        response._content = next(contents) # pylint: disable=protected-access
+        response.url = url
+        response.request = requests.Request("GET", url).prepare()
+        return response
+    return patch("requests.Session.get", new=get)
+
+
+def cpu_time(pages, records):
+    with serve(pages):
+        start = time.process_time()
+        count = sum(1 for record in records() if process_record(record) is not None)
+        return time.process_time() - start, count
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    records_per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print("{:<24}{:>10}{:>12}{:>12}{:>10}".format("stream", "records", "zenpy", "direct", "speedup"))
+    for name, (item_key, factory, extra, zenpy_records) in STREAMS.items():
+        pages = make_pages(item_key, factory, extra, page_count, records_per_page)
+        stream = streams.STREAMS[name](None, CONFIG)
+        stream.stream = name
+
+        before, count = cpu_time(pages, lambda: zenpy_records(Zenpy(subdomain="acme", oauth_token="token"), stream)) # pylint: disable=cell-var-from-loop
+        after, direct_count = cpu_time(pages, lambda: (record for _, record in stream.sync(json.loads(json.dumps(STATE))))) # pylint: disable=cell-var-from-loop
+        assert count == direct_count
+        print("{:<24}{:>10}{:>11.2f}s{:>11.2f}s{:>9.1f}x".format(name, count, before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark for streaming incremental export pages.
+
+Serves incremental ticket export pages (tickets with side-loaded metric_sets) from memory in
+64 KiB chunks and compares the peak memory and time to first record of loading each page
+whole, as `http.get_incremental_export` does, with parsing it as it is read, as
+`http.stream_incremental_export` does.
+
+Usage: python benchmarks/bench_export_stream.py [number_of_pages] [tickets_per_page]
+"""
+import io
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+import requests
+from tap_zendesk import http
+from bench_http_decode import make_page
+
+
+def make_response(content):
+    response = requests.models.Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response.raw = io.BytesIO(content)
+    return response
+
+
+def run(pages, records):
+    responses = iter([make_response(content) for content in pages])
+    with patch("requests.Session.get", side_effect=lambda *args, **kwargs: next(responses)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        first_record = None
+        count = 0
+        for _ in records():
+            if first_record is None:
+                first_record = time.perf_counter() - start
+            count += 1
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return count, first_record, elapsed, peak / 1024 / 1024
+
+
+def paged_records():
+    for page in http.get_incremental_export("https://acme.zendesk.com", "token", 300, 0, "metric_sets"):
+        yield from page["tickets"]
+
+
+def streamed_records():
+    return http.stream_incremental_export("https://acme.zendesk.com", "token", 300, 0, "metric_sets", "tickets")
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tickets_per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    pages = [make_page(i, tickets_per_page, i == page_count - 1) for i in range(page_count)]
+    page_megabytes = max(len(page) for page in pages) / 1024 / 1024
+
+    for name, records in (("whole pages", paged_records), ("streamed", streamed_records)):
+        # Only count memory allocated while parsing, not the pages served from memory
+        count, first_record, elapsed, peak = run(pages, records)
+        print("{:<12} {} records from {} pages of {:.1f} MB: first record after {:.3f}s, "
+              "{:.2f}s total, peak {:.1f} MB".format(name, count, page_count, page_megabytes,
+                                                     first_record, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark for JSON decoding on the synchronous call path.
+
+Serves incremental ticket export pages (tickets with side-loaded metric_sets) from memory and
+compares the CPU time of decoding each page once, as `http.get_incremental_export` now does,
+with the previous behaviour of decoding it in `raise_for_error` and again in the caller.
+
+Usage: python benchmarks/bench_http_decode.py [number_of_pages] [tickets_per_page]
+"""
+import json
+import sys
+import time
+from unittest.mock import patch
+import requests
+from tap_zendesk import http
+
+
+def make_page(page_number, tickets_per_page, last):
+    tickets = []
+    for i in range(tickets_per_page):
+        ticket_id = page_number * tickets_per_page + i
+        tickets.append({
+            "id": ticket_id, "subject": "Ticket {}".format(ticket_id), "description": "x" * 400,
+            "status": "open", "tags": ["a", "b", "c"], "generated_timestamp": 1672531200 + ticket_id,
+            "custom_fields": [{"id": f, "value": "value {}".format(f)} for f in range(10)],
+            "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+            "metric_set": {"id": ticket_id, "ticket_id": ticket_id, "reopens": 0, "replies": 1,
+                           "reply_time_in_minutes": {"calendar": 10, "business": 5},
+                           "created_at": "2023-01-01T00:00:00Z"},
+        })
+    body = {"tickets": tickets, "after_cursor": "cursor{}".format(page_number), "end_of_stream": last}
+    return json.dumps(body).encode("utf-8")
+
+
+def make_response(content):
+    response = requests.models.Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response._content = content # pylint: disable=protected-access
+    return response
+
+
+def legacy_call_api(url, request_timeout, params, headers):
+    """ The previous call path: raise_for_error decoded the body, then the caller decoded it again. """
+    response, _ = http.request_json(url, request_timeout, params, headers)
+    return response.json()
+
+
+def run(pages, call_api_json):
+    responses = iter([make_response(content) for content in pages])
+    with patch("requests.Session.get", side_effect=lambda *args, **kwargs: next(responses)), \
+            patch("tap_zendesk.http.call_api_json", side_effect=call_api_json):
+        start = time.process_time()
+        for _ in http.get_incremental_export("https://acme.zendesk.com", "token", 300, 0, "metric_sets"):
+            pass
+        return time.process_time() - start
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tickets_per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    pages = [make_page(i, tickets_per_page, i == page_count - 1) for i in range(page_count)]
+    megabytes = sum(len(page) for page in pages) / 1024 / 1024
+
+    before = run(pages, legacy_call_api)
+    after = run(pages, http.call_api_json)
+    print("{} pages x {} tickets ({:.1f} MB): {:.2f}s CPU decoding twice, {:.2f}s CPU decoding once "
+          "({:.0%} saved)".format(page_count, tickets_per_page, megabytes, before, after, 1 - after / before))
+
+
+if __name__ == '__main__':
+    main()
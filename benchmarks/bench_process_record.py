@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for `tap_zendesk.sync.process_record`.
+
+Compares the direct Zenpy object converter against the JSON round-trip through
+ZendeskEncoder that was previously used for every record.
+
+Usage: python benchmarks/bench_process_record.py [number_of_records]
+"""
+import json
+import sys
+import time
+from zenpy.lib.api_objects import Organization, SlaPolicy, TicketMetricEvent
+from tap_zendesk.sync import process_record, ZendeskEncoder
+
+
+def json_round_trip(record):
+    return json.loads(json.dumps(record, cls=ZendeskEncoder))
+
+
+def make_records():
+    return {
+        'organizations': Organization(id=1, name="acme", tags=["a", "b", "c"],
+                                      domain_names=["acme.com"], details="", notes="",
+                                      organization_fields={"region": "emea", "tier": "gold"},
+                                      created_at="2020-01-01T00:00:00Z",
+                                      updated_at="2020-01-02T00:00:00Z",
+                                      url="https://acme.zendesk.com/api/v2/organizations/1.json"),
+        'ticket_metric_events': TicketMetricEvent(id=2, ticket_id=3, metric="reply_time",
+                                                  instance_id=1, type="measure",
+                                                  time="2020-01-01T00:00:00Z"),
+        'sla_policies': SlaPolicy(id=4, title="Urgent", description="", position=1,
+                                  filter={"all": [{"field": "type", "operator": "is",
+                                                   "value": "incident"}], "any": []},
+                                  policy_metrics=[{"priority": p, "metric": "first_reply_time",
+                                                   "target": 60, "business_hours": False}
+                                                  for p in ("low", "normal", "high", "urgent")]),
+    }
+
+
+def records_per_second(func, record, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func(record)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print("{:<24}{:>16}{:>16}{:>10}".format("stream", "round-trip/s", "direct/s", "speedup"))
+    for stream, record in make_records().items():
+        assert json_round_trip(record) == process_record(record)
+        before = records_per_second(json_round_trip, record, count)
+        after = records_per_second(process_record, record, count)
+        print("{:<24}{:>16,.0f}{:>16,.0f}{:>9.1f}x".format(stream, before, after, after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+End to end sync benchmark against the fake Zendesk API of `fake_zendesk.py`.
+
+Starts the fake API in a process of its own, then syncs each scenario (a stream, along with its
+sub-streams) through `tap_zendesk.main` in a fresh process, with the RECORD messages counted
+instead of written out. Reports records/s, requests/s (including 429s) and the peak RSS of the
+process for each scenario.
+
+Results can be stored as a baseline in benchmarks/baselines/<name>.json with --save-baseline and
+compared with a stored baseline with --compare, which exits with 1 when records/s dropped or peak
+RSS grew by more than --tolerance. Baselines are only comparable on the machine they were taken on.
+
+The tap's rate limits are off unless set with --config, e.g. --config rate_limit_per_minute=700.
+
+Usage: python benchmarks/bench_sync.py [--scenarios tickets,users] [--scale 1.0] [--latency-ms 0]
+                                       [--rate-limit-every 0] [--config key=value ...]
+                                       [--save-baseline name] [--compare name] [--tolerance 0.1]
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import re
+import resource
+import socket
+import sys
+import tempfile
+import time
+import requests
+import fake_zendesk
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+CONFIG = {
+    "subdomain": "acme",
+    "access_token": "token",
+    "start_date": "2023-01-01T00:00:00Z",
+    "rate_limit_per_minute": 0,
+    "ticket_audits_rate_limit_per_minute": 0,
+    "incremental_exports_rate_limit_per_minute": 0,
+}
+# scenario => streams selected
+SCENARIOS = {
+    "tickets": ["tickets", "ticket_audits", "ticket_comments", "ticket_metrics"],
+    "users": ["users"],
+    "organizations": ["organizations"],
+    "groups": ["groups"],
+    "group_memberships": ["group_memberships"],
+    "macros": ["macros"],
+    "tags": ["tags"],
+    "ticket_forms": ["ticket_forms"],
+    "sla_policies": ["sla_policies"],
+}
+RECORD_RE = re.compile(r'\{"type": ?"RECORD", ?"stream": ?"([^"]+)"')
+
+
+class RecordCounter(io.TextIOBase):
+    """ Stands in for stdout, counting the RECORD messages of each stream """
+    def __init__(self):
+        super().__init__()
+        self.records = {}
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        for line in text.splitlines():
+            match = RECORD_RE.match(line)
+            if match:
+                self.records[match.group(1)] = self.records.get(match.group(1), 0) + 1
+        return len(text)
+
+
+def build_catalog(selected, config):
+    from tap_zendesk.discover import load_shared_schema_refs
+    from tap_zendesk.streams import STREAMS
+    import singer
+
+    refs = load_shared_schema_refs()
+    streams = []
+    for name in selected:
+        stream = STREAMS[name](None, config)
+        mdata = stream.load_metadata()
+        for entry in mdata:
+            if entry['breadcrumb'] == ():
+                entry['metadata']['selected'] = True
+        streams.append({'stream': name, 'tap_stream_id': name, 'metadata': mdata,
+                        'schema': singer.resolve_schema_references(stream.load_schema(), refs)})
+    return {'streams': streams}
+
+
+def run_scenario(scenario, base_url, config, verbose, results):
+    """ Syncs `scenario` from the fake API at `base_url` and puts its measurements on `results` """
+    fake_zendesk.redirect(base_url)
+    if not verbose:
+        # The tap's logger writes to the stderr it was set up with
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 2)
+    import tap_zendesk
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, 'config.json')
+        catalog_path = os.path.join(directory, 'catalog.json')
+        with open(config_path, 'w', encoding='UTF-8') as f:
+            json.dump(config, f)
+        with open(catalog_path, 'w', encoding='UTF-8') as f:
+            json.dump(build_catalog(SCENARIOS[scenario], config), f)
+
+        requests.post(base_url + '/_reset', timeout=10)
+        sys.argv = ['tap-zendesk', '--config', config_path, '--catalog', catalog_path]
+        counter = RecordCounter()
+        stdout = sys.stdout
+        sys.stdout = counter
+        start = time.perf_counter()
+        try:
+            tap_zendesk.main()
+        finally:
+            sys.stdout = stdout
+        seconds = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    results.put({'seconds': seconds, 'records': counter.records,
+                 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return requests.get(base_url + '/_stats', timeout=1).json()
+        except requests.exceptions.ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def measure(context, scenario, base_url, config, verbose):
+    results = context.Queue()
+    process = context.Process(target=run_scenario, args=(scenario, base_url, config, verbose, results))
+    process.start()
+    result = results.get()
+    process.join()
+    stats = requests.get(base_url + '/_stats', timeout=10).json()
+    records = sum(result['records'].values())
+    return {'records': records,
+            'seconds': round(result['seconds'], 3),
+            'records_per_second': round(records / result['seconds'], 1),
+            'requests': stats['requests'],
+            'rate_limited': stats['rate_limited'],
+            'requests_per_second': round(stats['requests'] / result['seconds'], 1),
+            'peak_rss_mb': round(result['peak_rss_mb'], 1)}
+
+
+def compare(results, baseline, tolerance):
+    """ Prints how `results` differ from `baseline`, returning whether any of them regressed """
+    regressed = False
+    print("\n{:<20}{:>16}{:>16}".format("compared to", "records/s", "peak RSS"))
+    for scenario, result in results.items():
+        before = baseline['results'].get(scenario)
+        if not before:
+            continue
+        speed = result['records_per_second'] / before['records_per_second'] - 1
+        memory = result['peak_rss_mb'] / before['peak_rss_mb'] - 1
+        flags = []
+        if speed < -tolerance:
+            flags.append("slower")
+        if memory > tolerance:
+            flags.append("larger")
+        regressed = regressed or bool(flags)
+        print("{:<20}{:>+15.1%}{:>+16.1%}  {}".format(scenario, speed, memory, " ".join(flags)))
+    return regressed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync benchmark against a local fake Zendesk")
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS), help="Comma separated scenarios to run")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplies the number of generated records")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Latency added to every response")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Answer every Nth request with a 429")
+    parser.add_argument('--config', action='append', default=[], metavar='KEY=VALUE', help="Tap config to set")
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--verbose', action='store_true', help="Show the tap's logs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scenarios = args.scenarios.split(",")
+    config = dict(CONFIG, **dict(item.split("=", 1) for item in args.config))
+    options = {'records': {stream: max(1, int(count * args.scale)) for stream, count in fake_zendesk.DEFAULT_RECORDS.items()},
+               'latency': args.latency_ms / 1000, 'rate_limit_every': args.rate_limit_every}
+
+    context = multiprocessing.get_context('spawn')
+    port = free_port()
+    base_url = 'http://127.0.0.1:{}'.format(port)
+    server = context.Process(target=fake_zendesk.serve, args=(port,), kwargs=options, daemon=True)
+    server.start()
+    try:
+        wait_for_server(base_url)
+        results = {}
+        print("{:<20}{:>10}{:>10}{:>12}{:>10}{:>12}{:>8}{:>12}".format(
+            "scenario", "records", "seconds", "records/s", "requests", "requests/s", "429s", "peak RSS"))
+        for scenario in scenarios:
+            result = results[scenario] = measure(context, scenario, base_url, config, args.verbose)
+            print("{:<20}{records:>10}{seconds:>10.2f}{records_per_second:>12.1f}{requests:>10}"
+                  "{requests_per_second:>12.1f}{rate_limited:>8}{peak_rss_mb:>9.1f} MB".format(scenario, **result))
+    finally:
+        server.terminate()
+        server.join()
+
+    run = {'options': {'scale': args.scale, 'latency_ms': args.latency_ms,
+                       'rate_limit_every': args.rate_limit_every, 'config': args.config},
+           'results': results}
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(os.path.join(BASELINES_DIR, '{}.json'.format(args.save_baseline)), 'w', encoding='UTF-8') as f:
+            json.dump(run, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, '{}.json'.format(args.compare)), encoding='UTF-8') as f:
+            baseline = json.load(f)
+        if baseline['options'] != run['options']:
+            print("The baseline was taken with other options: {}".format(baseline['options']))
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
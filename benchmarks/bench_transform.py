@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for the per-stream TransformPlan used by `tap_zendesk.sync.sync_stream`.
+
+Compares the previous per-record work (`stream.schema.to_dict()`, `metadata.to_map(...)` and
+`Transformer.transform`) against a TransformPlan compiled once per stream.
+
+Usage: python benchmarks/bench_transform.py [number_of_records]
+"""
+import copy
+import json
+import sys
+import time
+import singer
+from singer import Transformer, metadata
+from singer.schema import Schema
+from tap_zendesk.discover import load_shared_schema_refs, get_abs_path
+from tap_zendesk.transform import TransformPlan
+
+AUDIT = {
+    "id": 1, "ticket_id": 2, "author_id": 3, "created_at": "2023-01-01T00:00:00Z",
+    "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+    "metadata": {"system": {"client": "Mozilla/5.0", "ip_address": "127.0.0.1",
+                            "location": "Somewhere", "latitude": 1.0, "longitude": 2.0},
+                 "custom": {}},
+    "events": [{"id": 10 + i, "type": "Change", "field_name": "status", "value": "open",
+                "previous_value": "new"} for i in range(8)] + [
+                    {"id": 20, "type": "Comment", "body": "Hi", "html_body": "<p>Hi</p>",
+                     "plain_body": "Hi", "public": True, "author_id": 3, "attachments": []}],
+}
+
+
+def load_stream(name):
+    with open(get_abs_path("schemas/{}.json".format(name)), encoding="UTF-8") as f:
+        schema = singer.resolve_schema_references(json.load(f), load_shared_schema_refs())
+    mdata = metadata.new()
+    for field_name in schema["properties"]:
+        mdata = metadata.write(mdata, ("properties", field_name), "inclusion", "available")
+    return Schema.from_dict(schema), metadata.to_list(mdata)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    schema, stream_metadata = load_stream("ticket_audits")
+    records = [copy.deepcopy(AUDIT) for _ in range(count)]
+
+    transformer = Transformer()
+    start = time.perf_counter()
+    for record in records:
+        transformer.transform(copy.copy(record), schema.to_dict(), metadata.to_map(stream_metadata))
+    before = count / (time.perf_counter() - start)
+
+    plan = TransformPlan(schema.to_dict(), metadata.to_map(stream_metadata), Transformer())
+    start = time.perf_counter()
+    for record in records:
+        plan.transform(copy.copy(record))
+    after = count / (time.perf_counter() - start)
+
+    print("ticket_audits: {:,.0f} records/s with Transformer, {:,.0f} records/s with "
+          "TransformPlan ({:.1f}x)".format(before, after, after / before))
+
+
+if __name__ == '__main__':
+    main()
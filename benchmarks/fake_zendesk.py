@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""
+A fake Zendesk API served locally with aiohttp, for the benchmarks to sync from.
+
+Serves generated records for the cursor based incremental exports of tickets (with side-loaded
+metric_sets) and users, the time based incremental export of organizations, the cursor paginated
+groups, group_memberships, macros and tags, the offset paginated ticket_forms and sla_policies,
+and the cursor paginated audits of each ticket. Anything else, such as the custom field
+definitions, gets an empty last page.
+
+Every response is delayed by `latency` seconds, and every `rate_limit_every`th request is
+answered with a 429 and a Retry-After. Next pages link to https://<subdomain>.zendesk.com as
+Zendesk's do, so the tap is pointed at the server with `redirect()`.
+
+Usage: python benchmarks/fake_zendesk.py [port] [latency_ms] [rate_limit_every]
+"""
+import asyncio
+import json
+import re
+import sys
+from urllib.parse import urlencode
+from aiohttp import ClientSession, web
+from requests.adapters import HTTPAdapter
+
+# Generated records of each stream
+DEFAULT_RECORDS = {
+    "tickets": 5000,
+    "users": 10000,
+    "organizations": 5000,
+    "groups": 1000,
+    "group_memberships": 2000,
+    "macros": 1000,
+    "tags": 2000,
+    "ticket_forms": 200,
+    "sla_policies": 200,
+}
+AUDITS_PER_TICKET = 2
+# Records per page of the incremental exports, Zendesk's fixed page size
+EXPORT_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+START_TIME = 1672531200  # 2023-01-01T00:00:00Z
+ZENDESK_URL_RE = re.compile(r'^https://[^/]+\.zendesk\.com')
+AUDITS_PATH_RE = re.compile(r'^/api/v2/tickets/(\d+)/audits\.json$')
+
+
+def timestamp(seconds):
+    return "2023-01-{:02d}T{:02d}:{:02d}:{:02d}Z".format(1 + seconds // 86400, seconds // 3600 % 24,
+                                                        seconds // 60 % 60, seconds % 60)
+
+
+def ticket(i):
+    custom_fields = [{"id": f, "value": "value {}".format(f)} for f in range(10)]
+    return {"id": i + 1, "subject": "Ticket {}".format(i), "description": "x" * 400, "status": "open",
+            "tags": ["a", "b", "c"], "generated_timestamp": START_TIME + i, "updated_at": timestamp(i),
+            "created_at": timestamp(i), "custom_fields": custom_fields, "fields": custom_fields,
+            "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+            "metric_set": {"id": i + 1, "ticket_id": i + 1, "reopens": 0, "replies": 1,
+                           "reply_time_in_minutes": {"calendar": 10, "business": 5},
+                           "created_at": timestamp(i), "updated_at": timestamp(i)}}
+
+
+def user(i):
+    return {"id": i + 1, "name": "User {}".format(i), "email": "user{}@example.com".format(i), "role": "end-user",
+            "active": True, "tags": ["a"], "user_fields": {}, "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def organization(i):
+    return {"id": i + 1, "name": "Organization {}".format(i), "domain_names": ["example.com"], "tags": ["a"],
+            "organization_fields": {}, "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def group(i):
+    return {"id": i + 1, "name": "Group {}".format(i), "deleted": False,
+            "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def group_membership(i):
+    return {"id": i + 1, "user_id": i + 1, "group_id": i % 10 + 1, "default": True,
+            "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def macro(i):
+    return {"id": i + 1, "title": "Macro {}".format(i), "active": True, "position": i,
+            "actions": [{"field": "status", "value": "solved"}], "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def tag(i):
+    return {"name": "tag{}".format(i), "count": i}
+
+
+def ticket_form(i):
+    return {"id": i + 1, "name": "Form {}".format(i), "position": i, "active": True, "default": False,
+            "ticket_field_ids": list(range(20)), "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def sla_policy(i):
+    return {"id": i + 1, "title": "Policy {}".format(i), "position": i,
+            "filter": {"all": [{"field": "type", "operator": "is", "value": "incident"}], "any": []},
+            "policy_metrics": [{"priority": p, "metric": "first_reply_time", "target": 60, "business_hours": False}
+                               for p in ("low", "normal", "high", "urgent")],
+            "created_at": timestamp(i), "updated_at": timestamp(i)}
+
+
+def audit(ticket_id, i):
+    return {"id": ticket_id * 100 + i, "ticket_id": ticket_id, "created_at": timestamp(i),
+            "via": {"channel": "web"}, "metadata": {"system": {}},
+            "events": [{"id": ticket_id * 1000 + i, "type": "Comment", "body": "Comment {}".format(i),
+                        "public": True, "author_id": 1},
+                       {"id": ticket_id * 1000 + 500 + i, "type": "Change", "field_name": "status", "value": "open"}]}
+
+
+# path => (stream, record factory, pagination)
+ROUTES = {
+    "/api/v2/incremental/tickets/cursor.json": ("tickets", ticket, "export"),
+    "/api/v2/incremental/users/cursor.json": ("users", user, "export"),
+    "/api/v2/incremental/organizations.json": ("organizations", organization, "time"),
+    "/api/v2/groups": ("groups", group, "cursor"),
+    "/api/v2/group_memberships": ("group_memberships", group_membership, "cursor"),
+    "/api/v2/macros": ("macros", macro, "cursor"),
+    "/api/v2/tags": ("tags", tag, "cursor"),
+    "/api/v2/ticket_forms": ("ticket_forms", ticket_form, "offset"),
+    "/api/v2/slas/policies": ("sla_policies", sla_policy, "offset"),
+}
+
+
+class FakeZendesk():
+    """
+    The state of the fake API: how many records each stream has, the latency and rate limit
+    to simulate, and the count of requests served since the last `reset`.
+    """
+    def __init__(self, records=None, latency=0.0, rate_limit_every=0, retry_after=1, subdomain="acme"):
+        self.records = dict(DEFAULT_RECORDS, **(records or {}))
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.base_url = "https://{}.zendesk.com".format(subdomain)
+        self.requests = 0
+        self.rate_limited = 0
+        # Encoded pages by url, as the same pages are requested by every run
+        self.pages = {}
+
+    def reset(self):
+        self.requests = 0
+        self.rate_limited = 0
+
+    def page_url(self, path, params):
+        return "{}{}?{}".format(self.base_url, path, urlencode(params))
+
+    def export_page(self, stream, factory, query):
+        start = int(query.get("cursor") or 0)
+        end = min(start + EXPORT_PAGE_SIZE, self.records[stream])
+        return {stream: [factory(i) for i in range(start, end)], "after_cursor": str(end),
+                "end_of_stream": end >= self.records[stream]}
+
+    def time_page(self, stream, factory, path, query):
+        start = max(0, int(float(query.get("start_time") or START_TIME)) - START_TIME)
+        end = min(start + EXPORT_PAGE_SIZE, self.records[stream])
+        last = end >= self.records[stream]
+        return {stream: [factory(i) for i in range(start, end)], "end_of_stream": last, "count": end - start,
+                "end_time": START_TIME + end,
+                "next_page": None if last else self.page_url(path, {"start_time": START_TIME + end})}
+
+    def cursor_page(self, item_key, total, factory, query):
+        size = int(query.get("page[size]") or DEFAULT_PAGE_SIZE)
+        start = int(query.get("page[after]") or 0)
+        end = min(start + size, total)
+        order = range(start, end)
+        # Newest first, as the tap asks for it on some streams
+        if query.get("sort", "").startswith("-") or query.get("sort_order") == "desc":
+            order = range(total - 1 - start, total - 1 - end, -1)
+        return {item_key: [factory(i) for i in order],
+                "meta": {"has_more": end < total, "after_cursor": str(end)}}
+
+    def offset_page(self, stream, factory, path, query):
+        size = int(query.get("per_page") or DEFAULT_PAGE_SIZE)
+        page = int(query.get("page") or 1)
+        start = (page - 1) * size
+        end = min(start + size, self.records[stream])
+        last = end >= self.records[stream]
+        return {stream: [factory(i) for i in range(start, end)], "count": self.records[stream],
+                "next_page": None if last else self.page_url(path, {"per_page": size, "page": page + 1})}
+
+    def body(self, path, query):
+        route = ROUTES.get(path)
+        if route:
+            stream, factory, pagination = route
+            if pagination == "export":
+                return self.export_page(stream, factory, query)
+            if pagination == "time":
+                return self.time_page(stream, factory, path, query)
+            if pagination == "cursor":
+                return self.cursor_page(stream, self.records[stream], factory, query)
+            return self.offset_page(stream, factory, path, query)
+        match = AUDITS_PATH_RE.match(path)
+        if match:
+            ticket_id = int(match.group(1))
+            return self.cursor_page("audits", AUDITS_PER_TICKET, lambda i: audit(ticket_id, i), query)
+        # An empty last page of whatever the path lists, e.g. `user_fields` for /user_fields.json
+        item_key = path.rstrip("/").rsplit("/", 1)[-1].split(".")[0]
+        return {item_key: [], "meta": {"has_more": False}, "next_page": None, "end_of_stream": True, "count": 0}
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            return web.json_response({"error": "APIRateLimitExceeded"}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        key = request.path_qs
+        content = self.pages.get(key)
+        if content is None:
+            content = self.pages[key] = json.dumps(self.body(request.path, request.query)).encode("utf-8")
+        return web.Response(body=content, content_type="application/json")
+
+    async def handle_stats(self, request): # pylint: disable=unused-argument
+        return web.json_response({"requests": self.requests, "rate_limited": self.rate_limited})
+
+    async def handle_reset(self, request): # pylint: disable=unused-argument
+        self.reset()
+        return web.json_response({})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/_stats", self.handle_stats)
+        app.router.add_post("/_reset", self.handle_reset)
+        app.router.add_route("GET", "/{path:.*}", self.handle)
+        return app
+
+
+def serve(port, **options):
+    """ Serves a FakeZendesk made with `options` on localhost:`port` until the process is stopped """
+    web.run_app(FakeZendesk(**options).app(), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def redirect(base_url):
+    """ Sends the requests made to https://<subdomain>.zendesk.com, through requests or aiohttp, to `base_url` """
+    send = HTTPAdapter.send
+    request = ClientSession._request # pylint: disable=protected-access
+
+    def redirected_send(self, prepared_request, **kwargs):
+        prepared_request.url = ZENDESK_URL_RE.sub(base_url, prepared_request.url, count=1)
+        return send(self, prepared_request, **kwargs)
+
+    def redirected_request(self, method, str_or_url, **kwargs):
+        return request(self, method, ZENDESK_URL_RE.sub(base_url, str(str_or_url), count=1), **kwargs)
+
+    HTTPAdapter.send = redirected_send
+    ClientSession._request = redirected_request # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8080,
+          latency=float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0,
+          rate_limit_every=int(sys.argv[3]) if len(sys.argv) > 3 else 0)
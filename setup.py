@@ -20,6 +20,9 @@ setup(name='tap-zendesk',
           'dev': [
               'ipdb',
           ],
+          'orjson': [
+              'orjson',
+          ],
           'test': [
               'pylint==3.0.3',
               'nose2',
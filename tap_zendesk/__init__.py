@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
 import sys
+import time
 
 from zenpy import Zenpy
 import requests
@@ -11,7 +12,13 @@ from urllib3.exceptions import ProtocolError
 import singer
 from singer import metadata, metrics as singer_metrics
 import backoff
+from tap_zendesk import custom_fields
+from tap_zendesk import http
 from tap_zendesk import metrics as zendesk_metrics
+from tap_zendesk import output
+from tap_zendesk import profiling
+from tap_zendesk import rate_limit
+from tap_zendesk import telemetry
 from tap_zendesk.discover import discover_streams
 from tap_zendesk.oauth import refresh_credentials
 from tap_zendesk.streams import STREAMS
@@ -37,7 +44,7 @@ API_TOKEN_CONFIG_KEYS = [
     "api_token",
 ]
 
-# patch Session.request to record HTTP request metrics
+# patch Session.request to pace requests and record HTTP request metrics
 request = Session.request
 
 
@@ -45,14 +52,23 @@ request = Session.request
                       (ConnectionError, ConnectionResetError, Timeout, ChunkedEncodingError,
                        ProtocolError),
                       max_tries=5,
-                      factor=2)
+                      factor=2,
+                      on_backoff=telemetry.backoff_handler(2))
 def request_metrics_patch(self, method, url, **kwargs):
-    with singer_metrics.http_request_timer(None):
-        response = request(self, method, url, **kwargs)
-        LOGGER.info("Request: %s, Response ETag: %s, Request Id: %s",
-                    url,
-                    response.headers.get('ETag', 'Not present'),
-                    response.headers.get('X-Request-Id', 'Not present'))
+    endpoint = telemetry.endpoint_template(url)
+    with rate_limit.limited(url) as outermost, singer_metrics.http_request_timer(endpoint):
+        start = time.monotonic()
+        response = profiling.timed('fetch', request)(self, method, url, **kwargs)
+        elapsed = time.monotonic() - start
+        rate_limit.LIMITER.observe(url, response.headers)
+        if outermost and response.status_code == 429 and response.headers.get('Retry-After'):
+            # Zenpy backs off on its own, hold back the tap's other requests meanwhile. The
+            # requests of http.request_json are limited around this call, their 429s are backed
+            # off in http.is_fatal.
+            rate_limit.LIMITER.pause(int(response.headers['Retry-After']))
+        # The body of a streamed response is counted as it is read
+        response_bytes = 0 if kwargs.get('stream') else len(response.content or b'')
+        telemetry.TELEMETRY.record_request(url, elapsed, response.status_code, response_bytes, response.headers)
         return response
 
 
@@ -123,51 +139,57 @@ def do_sync(client, catalog, state, config):
     populate_class_schemas(catalog, selected_stream_names)
     all_sub_stream_names = get_sub_stream_names()
 
-    for stream in catalog.streams:
-        stream_name = stream.tap_stream_id
-        mdata = metadata.to_map(stream.metadata)
-        if stream_name not in selected_stream_names:
-            LOGGER.info("%s: Skipping - not selected", stream_name)
-            continue
-
-        # if starting_stream:
-        #     if starting_stream == stream_name:
-        #         LOGGER.info("%s: Resuming", stream_name)
-        #         starting_stream = None
-        #     else:
-        #         LOGGER.info("%s: Skipping - already synced", stream_name)
-        #         continue
-        # else:
-        #     LOGGER.info("%s: Starting", stream_name)
-
-        key_properties = metadata.get(mdata, (), 'table-key-properties')
-        singer.write_schema(stream_name, stream.schema.to_dict(), key_properties)
-
-        sub_stream_names = SUB_STREAMS.get(stream_name)
-        if sub_stream_names:
-            for sub_stream_name in sub_stream_names:
-                if sub_stream_name not in selected_stream_names:
-                    continue
-                sub_stream = STREAMS[sub_stream_name].stream
-                sub_mdata = metadata.to_map(sub_stream.metadata)
-                sub_key_properties = metadata.get(sub_mdata, (), 'table-key-properties')
-                singer.write_schema(sub_stream.tap_stream_id, sub_stream.schema.to_dict(),
-                                    sub_key_properties)
-
-        # parent stream will sync sub stream
-        if stream_name in all_sub_stream_names:
-            continue
-
-        LOGGER.info("%s: Starting sync", stream_name)
-        instance = STREAMS[stream_name](client, config)
-        counter_value = sync_stream(state, config.get('start_date'), instance)
+    # All Singer messages are buffered and written in order, so STATE never precedes its records
+    with output.buffered_output(output.get_writer(config)):
+        for stream in catalog.streams:
+            stream_name = stream.tap_stream_id
+            mdata = metadata.to_map(stream.metadata)
+            if stream_name not in selected_stream_names:
+                LOGGER.info("%s: Skipping - not selected", stream_name)
+                continue
+
+            # if starting_stream:
+            #     if starting_stream == stream_name:
+            #         LOGGER.info("%s: Resuming", stream_name)
+            #         starting_stream = None
+            #     else:
+            #         LOGGER.info("%s: Skipping - already synced", stream_name)
+            #         continue
+            # else:
+            #     LOGGER.info("%s: Starting", stream_name)
+
+            key_properties = metadata.get(mdata, (), 'table-key-properties')
+            singer.write_schema(stream_name, stream.schema.to_dict(), key_properties)
+
+            sub_stream_names = SUB_STREAMS.get(stream_name)
+            if sub_stream_names:
+                for sub_stream_name in sub_stream_names:
+                    if sub_stream_name not in selected_stream_names:
+                        continue
+                    sub_stream = STREAMS[sub_stream_name].stream
+                    sub_mdata = metadata.to_map(sub_stream.metadata)
+                    sub_key_properties = metadata.get(sub_mdata, (), 'table-key-properties')
+                    singer.write_schema(sub_stream.tap_stream_id, sub_stream.schema.to_dict(),
+                                        sub_key_properties)
+
+            # parent stream will sync sub stream
+            if stream_name in all_sub_stream_names:
+                continue
+
+            LOGGER.info("%s: Starting sync", stream_name)
+            instance = STREAMS[stream_name](client, config)
+            with profiling.profile_stream(stream_name):
+                counter_value = sync_stream(state, config.get('start_date'), instance)
+            singer.write_state(state)
+            LOGGER.info("%s: Completed sync (%s rows)", stream_name, counter_value)
+            zendesk_metrics.log_aggregate_rates()
+
         singer.write_state(state)
-        LOGGER.info("%s: Completed sync (%s rows)", stream_name, counter_value)
-        zendesk_metrics.log_aggregate_rates()
 
-    singer.write_state(state)
     LOGGER.info("Finished sync")
     zendesk_metrics.log_aggregate_rates()
+    telemetry.TELEMETRY.log_summary()
+    profiling.log_summary()
 
 
 def oauth_auth(args):
@@ -197,18 +219,14 @@ def api_token_auth(args):
 
 def get_session(config):
     """ Add partner information to requests Session object if specified in the config. """
-    if not all(k in config for k in ["marketplace_name",
-                                     "marketplace_organization_id",
-                                     "marketplace_app_id"]):
+    headers = http.marketplace_headers(config)
+    if not headers:
         return None
     session = requests.Session()
     # Using Zenpy's default adapter args, following the method outlined here:
     # https://github.com/facetoe/zenpy/blob/master/docs/zenpy.rst#usage
     session.mount("https://", HTTPAdapter(**Zenpy.http_adapter_kwargs()))
-    session.headers["X-Zendesk-Marketplace-Name"] = config.get("marketplace_name", "")
-    session.headers["X-Zendesk-Marketplace-Organization-Id"] = str(
-        config.get("marketplace_organization_id", ""))
-    session.headers["X-Zendesk-Marketplace-App-Id"] = str(config.get("marketplace_app_id", ""))
+    session.headers.update(headers)
     return session
 
 
@@ -227,6 +245,13 @@ def main():
     else:
         request_timeout = REQUEST_TIMEOUT  # If value is 0, "0", "" or not passed then it sets default to 300 seconds.
 
+    rate_limit.configure(parsed_args.config)
+    http.configure_session(parsed_args.config)
+    custom_fields.configure(parsed_args.config)
+    zendesk_metrics.configure(parsed_args.config)
+    telemetry.configure(parsed_args.config)
+    profiling.configure(parsed_args.config)
+
     config_path = parsed_args.config_path
     parsed_args.config = refresh_credentials(parsed_args.config, config_path, dev_mode=dev_mode)
 
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import singer
+from tap_zendesk import http
+
+LOGGER = singer.get_logger()
+
+# Seconds a cached field list is used without asking Zendesk whether it changed
+DEFAULT_CACHE_TTL = 3600
+# Zendesk's max page size for the custom field endpoints
+PAGE_SIZE = 100
+ENDPOINT = 'https://{}.zendesk.com/api/v2/{}.json'
+# Parts of a field definition the schema is built from, the only ones kept in the cache
+FIELD_KEYS = ('key', 'title', 'type', 'custom_field_options')
+
+
+def field_definition(field):
+    definition = {key: field.get(key) for key in FIELD_KEYS}
+    if definition['custom_field_options']:
+        definition['custom_field_options'] = [{'value': option['value']} for option in definition['custom_field_options']]
+    return definition
+
+
+def fetch_pages(subdomain, field_type, headers, request_timeout, cached_pages=()):
+    """
+    Returns the pages of `field_type` (`user_fields` or `organization_fields`) and whether any of
+    them differs from `cached_pages`. A page that was cached is requested with the ETag it was
+    returned with, and kept as it is when Zendesk answers 304 Not Modified.
+    """
+    cached_by_url = {page['url']: page for page in cached_pages}
+    url = ENDPOINT.format(subdomain, field_type)
+    params = {'per_page': PAGE_SIZE}
+    pages = []
+    changed = False
+    while url:
+        cached = cached_by_url.get(url)
+        page_headers = dict(headers)
+        if cached and cached['etag']:
+            page_headers['If-None-Match'] = cached['etag']
+        response, response_json = http.request_json(url, request_timeout, params, page_headers)
+        if response.status_code == 304:
+            page = cached
+        else:
+            changed = True
+            page = {'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'next_page': response_json.get('next_page'),
+                    'fields': [field_definition(field) for field in response_json[field_type]]}
+        pages.append(page)
+        url = page['next_page']
+        params = None
+    return pages, changed or len(pages) != len(cached_by_url)
+
+
+class FieldCache():
+    """
+    Keeps the custom field definitions of each account in `directory`, one file per subdomain and
+    field type. Within `ttl` seconds of being fetched they are used as they are, after that every
+    page is revalidated with its ETag, so an unchanged field list costs a 304 per page.
+    Without a directory the fields are fetched every time.
+    """
+    def __init__(self, directory=None, ttl=DEFAULT_CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        ttl = config.get('custom_fields_cache_ttl')
+        return cls(config.get('custom_fields_cache_dir') or None,
+                   DEFAULT_CACHE_TTL if ttl in (None, "") else float(ttl))
+
+    def path(self, subdomain, field_type):
+        return os.path.join(self.directory, subdomain, '{}.json'.format(field_type))
+
+    def read(self, path):
+        try:
+            with open(path, encoding='UTF-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            LOGGER.warning("Ignoring the unreadable custom field cache %s: %s", path, e)
+            return None
+
+    def write(self, path, entry):
+        """ Caches `entry` in `path`. When it can't be written the sync carries on without caching. """
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written to a temporary file first so an interrupted run never leaves a partial cache
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='UTF-8') as f:
+                    json.dump(entry, f)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError as e:
+            LOGGER.warning("Not caching the custom fields in %s: %s", path, e)
+
+    def record(self, field_type, hit, outcome):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            LOGGER.info("Custom field cache %s for %s (hits: %s, misses: %s)",
+                        outcome, field_type, self.hits, self.misses)
+
+    def get_fields(self, subdomain, field_type, headers, request_timeout):
+        if self.directory is None:
+            pages, _ = fetch_pages(subdomain, field_type, headers, request_timeout)
+            return [field for page in pages for field in page['fields']]
+
+        path = self.path(subdomain, field_type)
+        entry = self.read(path)
+        if entry and time.time() - entry['fetched_at'] < self.ttl:
+            self.record(field_type, True, "hit")
+            pages = entry['pages']
+        else:
+            pages, changed = fetch_pages(subdomain, field_type, headers, request_timeout,
+                                         entry['pages'] if entry else ())
+            hit = entry is not None and not changed
+            self.record(field_type, hit, "hit after revalidation" if hit else "miss")
+            self.write(path, {'fetched_at': time.time(), 'pages': pages})
+        return [field for page in pages for field in page['fields']]
+
+
+CACHE = FieldCache()
+
+
+def configure(config):
+    global CACHE # pylint: disable=global-statement
+    CACHE = FieldCache.from_config(config)
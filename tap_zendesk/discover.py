@@ -1,5 +1,8 @@
 import os
 import json
+import collections
+import concurrent.futures
+import itertools
 import singer
 import zenpy
 from tap_zendesk.streams import STREAMS
@@ -7,6 +10,9 @@ from tap_zendesk.http import ZendeskForbiddenError
 
 LOGGER = singer.get_logger()
 
+# Number of streams whose access is checked at the same time (config param `discovery_concurrency`)
+DEFAULT_DISCOVERY_CONCURRENCY = 8
+
 def get_abs_path(path):
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
 
@@ -24,45 +30,69 @@ def load_shared_schema_refs():
 
     return shared_schema_refs
 
+def load_and_check_stream(stream, refs):
+    """
+    Resolve the schema of a stream and check that the account can read it. A forbidden error of
+    the check is returned along with the schema, to be handled in the order of the streams.
+    """
+    schema = singer.resolve_schema_references(stream.load_schema(), refs)
+    try:
+        # Call check_access to verify the account has read permission for this stream.
+        stream.check_access()
+    except (ZendeskForbiddenError, zenpy.lib.exception.APIException) as e:
+        return schema, e
+    return schema, None
+
 def discover_streams(client, config):
     streams = []
     error_list = []
     refs = load_shared_schema_refs()
 
-    for stream in STREAMS.values():
-        # for each stream in the `STREAMS` check if the user has the permission to access the data of that stream
-        stream = stream(client, config)
-        schema = singer.resolve_schema_references(stream.load_schema(), refs)
-        try:
-            # Call check_access to verify the account has read permission for this stream.
-            stream.check_access()
-        except ZendeskForbiddenError:
-            if stream.is_optional:
-                # This stream depends on a plan tier or paid add-on that is not available
-                # for this account (e.g. Talk, SLA Policies, Ticket Forms, Satisfaction Ratings).
-                # Per Option B: exclude it from the catalog so it does not appear in the
-                # stream selection list, rather than failing the connection.
-                LOGGER.warning(
-                    "Stream '%s' is not available for this account (plan tier or add-on not "
-                    "provisioned). It will be excluded from the available streams.", stream.name)
-                continue  # Do NOT append to streams list
-            # Essential stream: collect name; reported at the end of discovery.
-            error_list.append(stream.name)
-        except zenpy.lib.exception.APIException as e:
-            args0 = json.loads(e.args[0])
-            err = args0.get('error')
+    # for each stream in the `STREAMS` check if the user has the permission to access the data of that stream
+    instances = [stream(client, config) for stream in STREAMS.values()]
+    # The checks run concurrently but their results are handled in the order of `STREAMS`, so the
+    # catalog, the warnings and the error raised are the same as when they run one at a time.
+    concurrency = int(config.get('discovery_concurrency') or DEFAULT_DISCOVERY_CONCURRENCY)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    # No more than `concurrency` checks are started ahead of the stream being handled, so with
+    # a concurrency of 1 the streams after an error are not checked at all.
+    pending = collections.deque()
+    to_check = iter(instances)
+    try:
+        for stream in instances:
+            for next_stream in itertools.islice(to_check, concurrency - len(pending)):
+                pending.append(executor.submit(load_and_check_stream, next_stream, refs))
+            schema, error = pending.popleft().result()
+            if isinstance(error, ZendeskForbiddenError):
+                if stream.is_optional:
+                    # This stream depends on a plan tier or paid add-on that is not available
+                    # for this account (e.g. Talk, SLA Policies, Ticket Forms, Satisfaction Ratings).
+                    # Per Option B: exclude it from the catalog so it does not appear in the
+                    # stream selection list, rather than failing the connection.
+                    LOGGER.warning(
+                        "Stream '%s' is not available for this account (plan tier or add-on not "
+                        "provisioned). It will be excluded from the available streams.", stream.name)
+                    continue  # Do NOT append to streams list
+                # Essential stream: collect name; reported at the end of discovery.
+                error_list.append(stream.name)
+            elif error is not None:
+                args0 = json.loads(error.args[0])
+                err = args0.get('error')
 
-            # check if the error is of type dictionary and the message retrieved from the dictionary
-            # is the expected message. If so, only then print the logger message and return the schema
-            if isinstance(err, dict):
-                if err.get('message', None) == "Access to this resource is restricted. Please contact the account administrator for assistance.":
+                # check if the error is of type dictionary and the message retrieved from the dictionary
+                # is the expected message. If so, only then print the logger message and return the schema
+                if isinstance(err, dict):
+                    if err.get('message', None) == "Access to this resource is restricted. Please contact the account administrator for assistance.":
+                        error_list.append(stream.name)
+                elif args0.get('description') == "Missing the following required scopes: read":
                     error_list.append(stream.name)
-            elif args0.get('description') == "Missing the following required scopes: read":
-                error_list.append(stream.name)
-            else:
-                raise e from None # raise error if it is other than 403 forbidden error
+                else:
+                    raise error from None # raise error if it is other than 403 forbidden error
 
-        streams.append({'stream': stream.name, 'tap_stream_id': stream.name, 'schema': schema, 'metadata': stream.load_metadata()})
+            streams.append({'stream': stream.name, 'tap_stream_id': stream.name, 'schema': schema, 'metadata': stream.load_metadata()})
+    finally:
+        # Drop the checks that have not started when an error is raised
+        executor.shutdown(wait=True, cancel_futures=True)
 
     if error_list:
         # Use only essential (non-optional) streams as the threshold for the hard-fail check,
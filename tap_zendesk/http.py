@@ -1,11 +1,22 @@
+import time
 from time import sleep
+import asyncio
+import collections
+import concurrent.futures
+import queue
+import threading
 from asyncio import sleep as async_sleep
 import backoff
 import requests
 import singer
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout, HTTPError, ChunkedEncodingError, ConnectionError
-from aiohttp import ContentTypeError
+from aiohttp import ClientSession, ContentTypeError, TCPConnector
 from urllib3.exceptions import ProtocolError
+from tap_zendesk import json_stream
+from tap_zendesk import profiling
+from tap_zendesk import rate_limit
+from tap_zendesk import telemetry
 
 
 LOGGER = singer.get_logger()
@@ -13,6 +24,37 @@ LOGGER = singer.get_logger()
 DEFAULT_WAIT = 60
 # Default wait time for backoff for conflict error
 DEFAULT_WAIT_FOR_CONFLICT_ERROR = 10
+# Connection pool of the session used by call_api
+DEFAULT_POOL_SIZE = 10
+
+# Config param => header sent with every request to identify a Zendesk marketplace app
+MARKETPLACE_HEADERS = {
+    "marketplace_name": "X-Zendesk-Marketplace-Name",
+    "marketplace_organization_id": "X-Zendesk-Marketplace-Organization-Id",
+    "marketplace_app_id": "X-Zendesk-Marketplace-App-Id",
+}
+
+# Size of the chunks an incremental export page is read in, and the number of times a page is
+# requested when the connection drops while it is read
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_PAGE_MAX_TRIES = 5
+# Seconds behind now at which a time based export is caught up, the same margin Zenpy used
+TIME_BASED_EXPORT_LAG = 300
+# Number of records of exports read in parallel held until they are read
+DEFAULT_MERGED_BUFFERED_RECORDS = 1000
+
+# Defaults for the pooled connector used by the async (ticket audits) requests
+DEFAULT_ASYNC_CONNECTION_LIMIT = 100
+DEFAULT_ASYNC_KEEPALIVE_TIMEOUT = 60
+DEFAULT_ASYNC_DNS_CACHE_TTL = 300
+# Number of items of streamed async generators held until they are read
+DEFAULT_ASYNC_BUFFERED_RESULTS = 100
+
+# Marks the end of the items of a streamed async generator or of an export read in parallel
+STREAM_END = object()
+# Yielded by `stream_incremental_export` after the records of each page when asked for page ends.
+# `after_cursor` is where the export continues after the page.
+ExportPageEnd = collections.namedtuple('ExportPageEnd', ['after_cursor', 'end_of_stream'])
 
 class ZendeskError(Exception):
     def __init__(self, message=None, response=None):
@@ -108,8 +150,13 @@ def is_fatal(exception):
 
     if status_code == 429:
         sleep_time = int(exception.response.headers['Retry-After'])
-        LOGGER.info("Caught HTTP 429, retrying request in %s seconds", sleep_time)
-        sleep(sleep_time)
+        # Only the first request to hit the rate limit backs off, the others wait behind it in the rate limiter
+        paused_until = rate_limit.LIMITER.pause(sleep_time)
+        if paused_until:
+            LOGGER.info("Caught HTTP 429, retrying request in %s seconds", sleep_time)
+            profiling.timed('rate_limit_sleep', sleep)(sleep_time)
+            telemetry.TELEMETRY.record_backoff(getattr(exception.response, 'url', None), sleep_time, retry=False)
+            rate_limit.LIMITER.resume(paused_until)
         return False
 
     if status_code == 409:
@@ -121,38 +168,118 @@ def is_fatal(exception):
 def raise_for_error(response):
     """ Error handling method which throws custom error. Class for each error defined above which extends `ZendeskError`.
     This method map the status code with `ERROR_CODE_EXCEPTION_MAPPING` dictionary and accordingly raise the error.
-    If status_code is 200 then simply return json response.
+    If status_code is 200 then simply return json response, a body that isn't JSON raises the decode error. The
+    body is decoded only once here, so callers should use the returned value rather than calling `response.json()`
+    again. A 204, or a 304 for a conditional request, has no body and returns {}.
     """
+    if response.status_code in (204, 304):
+        return {}
+    if response.status_code == 200:
+        return profiling.timed('decode', response.json)()
     try:
-        response_json = response.json()
+        response_json = profiling.timed('decode', response.json)()
     except Exception: # pylint: disable=broad-except
         response_json = {}
-    if response.status_code != 200:
-        if response_json.get('error'):
-            message = "HTTP-error-code: {}, Error: {}".format(response.status_code, response_json.get('error'))
-        else:
-            message = "HTTP-error-code: {}, Error: {}".format(
-                response.status_code,
-                response_json.get("message", ERROR_CODE_EXCEPTION_MAPPING.get(
-                    response.status_code, {}).get("message", "Unknown Error")))
-        exc = ERROR_CODE_EXCEPTION_MAPPING.get(
-            response.status_code, {}).get("raise_exception", ZendeskError)
-        raise exc(message, response) from None
+    if response_json.get('error'):
+        message = "HTTP-error-code: {}, Error: {}".format(response.status_code, response_json.get('error'))
+    else:
+        message = "HTTP-error-code: {}, Error: {}".format(
+            response.status_code,
+            response_json.get("message", ERROR_CODE_EXCEPTION_MAPPING.get(
+                response.status_code, {}).get("message", "Unknown Error")))
+    exc = ERROR_CODE_EXCEPTION_MAPPING.get(
+        response.status_code, {}).get("raise_exception", ZendeskError)
+    raise exc(message, response) from None
+
+
+def marketplace_headers(config):
+    """ The marketplace headers to send, if all of the marketplace params are in the config. """
+    if not all(key in config for key in MARKETPLACE_HEADERS):
+        return {}
+    return {header: str(config[key]) for key, header in MARKETPLACE_HEADERS.items()}
+
+
+def build_session(config):
+    """
+    Build the keep-alive session shared by every call_api request, so that connections and TLS
+    sessions are reused across pages and streams instead of being set up for every request.
+    """
+    pool_size = int(config.get('http_pool_size') or DEFAULT_POOL_SIZE)
+
+    session = requests.Session()
+    # Nothing is retried by the adapter: every retry goes through the backoff of call_api, so it
+    # waits for the rate limiter and is given up on by is_fatal
+    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0))
+    session.headers.update(marketplace_headers(config))
+    return session
+
+
+SESSION = None
+
+
+def configure_session(config):
+    global SESSION # pylint: disable=global-statement
+    if SESSION is not None:
+        SESSION.close()
+    SESSION = build_session(config)
+
+
+def get_session():
+    if SESSION is None:
+        configure_session({})
+    return SESSION
 
 
 @backoff.on_exception(backoff.expo,
                       (HTTPError, ZendeskError), # Added support of backoff for all unhandled status codes.
                       max_tries=10,
-                      giveup=is_fatal)
+                      giveup=is_fatal,
+                      on_backoff=telemetry.backoff_handler(0))
 @backoff.on_exception(backoff.expo,
                     (ConnectionError, ConnectionResetError, Timeout, ChunkedEncodingError, ProtocolError),#As ConnectionError error and timeout error does not have attribute status_code,
                     max_tries=5, # here we added another backoff expression.
-                    factor=2)
-def call_api(url, request_timeout, params, headers):
-    response = requests.get(url, params=params, headers=headers, timeout=request_timeout) # Pass request timeout
-    raise_for_error(response)
+                    factor=2,
+                    on_backoff=telemetry.backoff_handler(0))
+def request_json(url, request_timeout, params, headers):
+    """
+    Perform a GET request and return the response along with its JSON body, decoded exactly once
+    """
+    with rate_limit.limited(url):
+        response = get_session().get(url, params=params, headers=headers, timeout=request_timeout) # Pass request timeout
+    rate_limit.LIMITER.observe(url, response.headers)
+    response_json = raise_for_error(response)
+    return response, response_json
+
+@backoff.on_exception(backoff.expo,
+                      (HTTPError, ZendeskError), # Added support of backoff for all unhandled status codes.
+                      max_tries=10,
+                      giveup=is_fatal,
+                      on_backoff=telemetry.backoff_handler(0))
+@backoff.on_exception(backoff.expo,
+                    (ConnectionError, ConnectionResetError, Timeout, ChunkedEncodingError, ProtocolError),
+                    max_tries=5,
+                    factor=2,
+                    on_backoff=telemetry.backoff_handler(0))
+def request_stream(url, request_timeout, params, headers):
+    """
+    Perform a GET request whose body is read as it arrives. Only error responses are decoded here.
+    """
+    with rate_limit.limited(url):
+        response = get_session().get(url, params=params, headers=headers, timeout=request_timeout, stream=True)
+    rate_limit.LIMITER.observe(url, response.headers)
+    if response.status_code != 200:
+        try:
+            raise_for_error(response)
+        finally:
+            response.close()
     return response
 
+def call_api(url, request_timeout, params, headers):
+    return request_json(url, request_timeout, params, headers)[0]
+
+def call_api_json(url, request_timeout, params, headers):
+    return request_json(url, request_timeout, params, headers)[1]
+
 def get_cursor_based(url, access_token, request_timeout, page_size, cursor=None, **kwargs):
     headers = {
         'Content-Type': 'application/json',
@@ -168,8 +295,7 @@ def get_cursor_based(url, access_token, request_timeout, page_size, cursor=None,
 
     if cursor:
         params['page[after]'] = cursor
-    response = call_api(url, request_timeout, params=params, headers=headers)
-    response_json = response.json()
+    response_json = call_api_json(url, request_timeout, params=params, headers=headers)
 
     yield response_json
 
@@ -179,8 +305,7 @@ def get_cursor_based(url, access_token, request_timeout, page_size, cursor=None,
         cursor = response_json['meta']['after_cursor']
         params['page[after]'] = cursor
 
-        response = call_api(url, request_timeout, params=params, headers=headers)
-        response_json = response.json()
+        response_json = call_api_json(url, request_timeout, params=params, headers=headers)
 
         yield response_json
         has_more = response_json['meta']['has_more']
@@ -198,21 +323,61 @@ def get_offset_based(url, access_token, request_timeout, page_size, **kwargs):
         **kwargs.get('params', {})
     }
 
-    response = call_api(url, request_timeout, params=params, headers=headers)
-    response_json = response.json()
+    response_json = call_api_json(url, request_timeout, params=params, headers=headers)
 
     yield response_json
 
     next_url = response_json.get('next_page')
 
     while next_url:
-        response = call_api(next_url, request_timeout, params=None, headers=headers)
-        response_json = response.json()
+        response_json = call_api_json(next_url, request_timeout, params=None, headers=headers)
 
         yield response_json
         next_url = response_json.get('next_page')
 
 
+def next_cursor_page(url, params, page):
+    """ The (url, params) of the page after a cursor based `page`, None after the last page """
+    if not page['meta']['has_more']:
+        return None
+    return url, {**params, 'page[after]': page['meta']['after_cursor']}
+
+def next_offset_page(url, params, page): # pylint: disable=unused-argument
+    """ The (url, params) of the page after an offset based `page`, None after the last page """
+    if not page.get('next_page'):
+        return None
+    return page['next_page'], None
+
+def get_conditionally(url, access_token, request_timeout, params, validators, next_page): # pylint: disable=too-many-arguments
+    """
+    Walk the pages from `url`, requesting each with the ETag it had in `validators`, a {page key:
+    validator} map kept from the previous walk. Yields (page key, validator, page), where page is None
+    when Zendesk answered 304 Not Modified. The validator also holds the request of the next page,
+    computed with `next_page(url, params, page)`, so the walk goes on past unchanged pages.
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Authorization': 'Bearer {}'.format(access_token),
+    }
+    next_request = (url, params)
+    while next_request:
+        url, params = next_request
+        key = requests.Request('GET', url, params=params).prepare().url
+        validator = validators.get(key)
+        page_headers = dict(headers)
+        if validator and validator['etag']:
+            page_headers['If-None-Match'] = validator['etag']
+
+        response, response_json = request_json(url, request_timeout, params=params, headers=page_headers)
+        if response.status_code == 304:
+            yield key, validator, None
+        else:
+            validator = {'etag': response.headers.get('ETag'), 'next': next_page(url, params, response_json)}
+            yield key, validator, response_json
+        next_request = validator['next']
+
+
 async def raise_for_error_for_async(response):
     """
     Error handling method which throws custom error. Class for each error defined above which extends `ZendeskError`.
@@ -228,9 +393,15 @@ async def raise_for_error_for_async(response):
     elif response.status == 429 or response.status >= 500:
         # Get the 'Retry-After' header value, defaulting to 60 seconds if not present.
         retry_after = int(response.headers.get("Retry-After", "0")) or DEFAULT_WAIT
-        LOGGER.warning("Caught HTTP %s, retrying request in %s seconds", response.status, retry_after)
-        # Wait for the specified time before retrying the request.
-        await async_sleep(int(retry_after))
+        # Only the first request to hit the rate limit backs off, the others wait behind it in the rate limiter
+        paused_until = rate_limit.LIMITER.pause(retry_after) if response.status == 429 else None
+        if response.status != 429 or paused_until:
+            LOGGER.warning("Caught HTTP %s, retrying request in %s seconds", response.status, retry_after)
+            # Wait for the specified time before retrying the request.
+            await async_sleep(int(retry_after))
+            telemetry.TELEMETRY.record_backoff(response.url, int(retry_after), retry=False)
+            if paused_until:
+                rate_limit.LIMITER.resume(paused_until)
     elif response.status == 409:
         LOGGER.warning(
             "Caught HTTP 409, retrying request in %s seconds",
@@ -238,6 +409,7 @@ async def raise_for_error_for_async(response):
         )
         # Wait for the specified time before retrying the request.
         await async_sleep(DEFAULT_WAIT_FOR_CONFLICT_ERROR)
+        telemetry.TELEMETRY.record_backoff(response.url, DEFAULT_WAIT_FOR_CONFLICT_ERROR, retry=False)
 
     # Prepare the error message and raise the appropriate exception.
     if response_json.get("error"):
@@ -266,7 +438,8 @@ async def raise_for_error_for_async(response):
     backoff.constant,
     ZendeskBackoffError,
     max_tries=5,
-    interval=0
+    interval=0,
+    on_backoff=telemetry.backoff_handler(1)
 )
 @backoff.on_exception(
     backoff.expo,
@@ -279,22 +452,136 @@ async def raise_for_error_for_async(response):
     ),
     max_tries=5,
     factor=2,
+    on_backoff=telemetry.backoff_handler(1)
 )
 async def call_api_async(session, url, request_timeout, params, headers):
     """
     Perform an asynchronous GET request
     """
+    await rate_limit.LIMITER.wait_async(url)
+    start = time.monotonic()
     async with session.get(
         url, params=params, headers=headers, timeout=request_timeout
     ) as response:
+        body = await response.read()
+        elapsed = time.monotonic() - start
+        profiling.record('fetch', elapsed)
+        telemetry.TELEMETRY.record_request(url, elapsed, response.status, len(body), response.headers)
+        rate_limit.LIMITER.observe(url, response.headers)
         response_json = await raise_for_error_for_async(response)
 
         return response_json
 
 
+class AsyncSessionRunner(): # pylint: disable=too-many-instance-attributes
+    """
+    Runs coroutines on one long-lived event loop with one pooled aiohttp ClientSession, so that
+    connections, TLS sessions and DNS lookups are reused across every async request made during
+    a stream's sync instead of being set up again for each `asyncio.run`.
+
+    The loop runs in a background thread, so coroutines submitted with `submit()`, and async
+    generators run with `stream()`, keep making progress while the caller does other work, such
+    as reading the next page of tickets. The loop and session are created on first use and closed
+    by `close()`, or on leaving the `with` block, which cancels anything still in flight.
+    """
+
+    def __init__(self, config, max_buffered_results=DEFAULT_ASYNC_BUFFERED_RESULTS):
+        self.max_buffered_results = max_buffered_results
+        self.connection_limit = int(config.get('async_connection_limit') or DEFAULT_ASYNC_CONNECTION_LIMIT)
+        self.keepalive_timeout = float(config.get('async_keepalive_timeout') or DEFAULT_ASYNC_KEEPALIVE_TIMEOUT)
+        self.dns_cache_ttl = int(config.get('async_dns_cache_ttl') or DEFAULT_ASYNC_DNS_CACHE_TTL)
+        self.loop = None
+        self.session = None
+        self.results = None
+        self.thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def _create_session(self):
+        # aiohttp requires the connector and session to be created inside the running loop
+        connector = TCPConnector(limit=self.connection_limit,
+                                 keepalive_timeout=self.keepalive_timeout,
+                                 ttl_dns_cache=self.dns_cache_ttl)
+        return ClientSession(connector=connector)
+
+    async def _shutdown(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.session.close()
+        await asyncio.get_running_loop().shutdown_asyncgens()
+
+    def _start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='tap-zendesk-async', daemon=True)
+        self.thread.start()
+        self.session = asyncio.run_coroutine_threadsafe(self._create_session(), self.loop).result()
+        self.results = asyncio.run_coroutine_threadsafe(self._create_results(), self.loop).result()
+
+    async def _create_results(self):
+        return asyncio.Queue(maxsize=self.max_buffered_results)
+
+    async def _stream(self, key, agen_function, args):
+        try:
+            async for item in agen_function(self.session, *args):
+                await self.results.put((key, item))
+        except Exception as exc: # pylint: disable=broad-except
+            await self.results.put((key, exc))
+            return
+        await self.results.put((key, STREAM_END))
+
+    def stream(self, key, agen_function, *args):
+        """
+        Runs the async generator `agen_function(session, *args)` on the shared loop. Every item it
+        yields is handed over as `(key, item)` by `next_result()`, followed by `(key, STREAM_END)`
+        once it is exhausted. Once `max_buffered_results` items are waiting to be read, the
+        generators are held back until the caller catches up.
+        """
+        if self.loop is None:
+            self._start()
+        asyncio.run_coroutine_threadsafe(self._stream(key, agen_function, args), self.loop)
+
+    def next_result(self):
+        """ Waits for the next `(key, item)` of the streamed generators, raising the error a generator failed with. """
+        key, item = asyncio.run_coroutine_threadsafe(self.results.get(), self.loop).result()
+        if isinstance(item, Exception):
+            raise item
+        return key, item
+
+    def submit(self, coro_function, *args):
+        """ Schedules `coro_function(session, *args)` on the shared loop and returns a
+        `concurrent.futures.Future` for its result. """
+        if self.loop is None:
+            self._start()
+        return asyncio.run_coroutine_threadsafe(coro_function(self.session, *args), self.loop)
+
+    def run(self, coro_function, *args):
+        """ Runs `coro_function(session, *args)` to completion on the shared loop and returns its result. """
+        return self.submit(coro_function, *args).result()
+
+    def close(self):
+        if self.loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.session = None
+            self.results = None
+            self.thread = None
+
+
 async def paginate_ticket_audits(session, url, access_token, request_timeout, page_size, **kwargs):
     """
-    Paginate through the ticket audits API endpoint and return the aggregated results
+    Paginate through the ticket audits API endpoint, yielding each page as soon as it arrives
     """
     headers = {
         'Content-Type': 'application/json',
@@ -308,31 +595,25 @@ async def paginate_ticket_audits(session, url, access_token, request_timeout, pa
         **kwargs.get('params', {})
     }
 
-    initial_response = await call_api_async(session, url, request_timeout, params=params, headers=headers)
+    response = await call_api_async(session, url, request_timeout, params=params, headers=headers)
 
-    has_more = initial_response['meta']['has_more']
+    yield response
 
-    if has_more:
-        cursor = initial_response['meta']['after_cursor']
-        params['page[after]'] = cursor
+    has_more = response['meta']['has_more']
 
     while has_more:
+        try:
+            cursor = response['meta']['after_cursor']
+            params['page[after]'] = cursor
+        except KeyError:
+            LOGGER.info("Cursor not found, stopping pagination.")
+            return
 
         response = await call_api_async(session, url, request_timeout, params=params, headers=headers)
 
-        initial_response["audits"].extend(response["audits"])
+        yield response
         has_more = response['meta']['has_more']
 
-        if has_more:
-            try:
-                cursor = response['meta']['after_cursor']
-                params['page[after]'] = cursor
-            except KeyError:
-                LOGGER.info("Cursor not found, stopping pagination.")
-                has_more = False
-
-    return initial_response
-
 def get_incremental_export(url, access_token, request_timeout, start_time, side_load):
     headers = {
         'Content-Type': 'application/json',
@@ -346,8 +627,7 @@ def get_incremental_export(url, access_token, request_timeout, start_time, side_
         params = {'start_time': start_time.timestamp()}
     params['include'] = side_load
 
-    response = call_api(url, request_timeout, params=params, headers=headers)
-    response_json = response.json()
+    response_json = call_api_json(url, request_timeout, params=params, headers=headers)
 
     yield response_json
 
@@ -362,10 +642,159 @@ def get_incremental_export(url, access_token, request_timeout, start_time, side_
         # response.raise_for_status()
         # Because it doing the same as call_api. So, now error handling will work properly with backoff
         # as earlier backoff was not possible
-        response = call_api(url, request_timeout, params=params, headers=headers)
-
-        response_json = response.json()
+        response_json = call_api_json(url, request_timeout, params=params, headers=headers)
 
         yield response_json
 
         end_of_stream = response_json.get('end_of_stream')
+
+def counted(url, chunks):
+    """ Yields `chunks`, counting their bytes as those of the response from `url` """
+    for chunk in chunks:
+        telemetry.TELEMETRY.record_bytes(url, len(chunk))
+        yield chunk
+
+def stream_export_page(url, request_timeout, params, headers, item_key, fields): # pylint: disable=too-many-arguments
+    """
+    Yield the records of an incremental export page as they are parsed, adding the page's other
+    fields to `fields`. If the connection drops part way through, the page is requested again
+    and the records already yielded are skipped.
+    """
+    yielded = 0
+    for attempt in range(1, EXPORT_PAGE_MAX_TRIES + 1):
+        response = request_stream(url, request_timeout, params, headers)
+        try:
+            chunks = counted(url, profiling.timed_iter('fetch', response.iter_content(chunk_size=EXPORT_CHUNK_SIZE)))
+            records = profiling.timed_iter('decode', json_stream.iter_items(chunks, item_key, fields))
+            for index, record in enumerate(records):
+                if index >= yielded:
+                    yielded += 1
+                    yield record
+            return
+        except (ConnectionError, ChunkedEncodingError, ProtocolError, Timeout) as e:
+            if attempt == EXPORT_PAGE_MAX_TRIES:
+                raise
+            LOGGER.warning("Connection lost while reading %s, requesting the page again: %s", url, e)
+            fields.clear()
+        finally:
+            response.close()
+
+def stream_incremental_export(url, access_token, request_timeout, start_time, side_load, item_key, # pylint: disable=too-many-arguments
+                              cursor=None, page_ends=False):
+    """
+    Page through an incremental export like `get_incremental_export`, but yield the `item_key`
+    records of each page as they arrive rather than once the whole page has been loaded, so
+    that at most about one record is held in memory at a time.
+
+    The export starts from `cursor` rather than `start_time` when one is given, and with
+    `page_ends` an `ExportPageEnd` follows the records of each page.
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Authorization': 'Bearer {}'.format(access_token),
+    }
+
+    if cursor:
+        params = {'cursor': cursor}
+    elif not isinstance(start_time, int):
+        params = {'start_time': start_time.timestamp()}
+    else:
+        params = {'start_time': start_time}
+    params['include'] = side_load
+
+    while True:
+        fields = {}
+        yield from stream_export_page(url, request_timeout, params, headers, item_key, fields)
+
+        if page_ends:
+            yield ExportPageEnd(fields.get('after_cursor'), bool(fields.get('end_of_stream')))
+        if fields.get('end_of_stream'):
+            return
+
+        params = {'cursor': fields['after_cursor'], "include": side_load}
+
+def merge_exports(exports, max_workers, max_buffered_records=DEFAULT_MERGED_BUFFERED_RECORDS):
+    """
+    Read the `exports` iterables in parallel, `max_workers` at a time, yielding `(index, record)`
+    for each record of `exports[index]` as it arrives and `(index, STREAM_END)` once that export
+    has been read to the end. Once `max_buffered_records` records are waiting to be read, the
+    exports are held back until the caller catches up. An error reading an export is raised here.
+    """
+    results = queue.Queue(maxsize=max_buffered_records)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(index, export):
+        try:
+            for record in export:
+                if not put((index, record)):
+                    return
+        except Exception as exc: # pylint: disable=broad-except
+            put((index, exc))
+            return
+        put((index, STREAM_END))
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tap-zendesk-export')
+    try:
+        for index, export in enumerate(exports):
+            executor.submit(read, index, export)
+        remaining = len(exports)
+        while remaining:
+            index, item = results.get()
+            if isinstance(item, Exception):
+                raise item
+            if item is STREAM_END:
+                remaining -= 1
+            yield index, item
+    finally:
+        # Stop the exports still being read when the caller stops early or fails
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def time_based_export_done(page, previous_end_time):
+    """
+    Whether a time based export has no page after `page`. Besides `end_of_stream`, some exports,
+    such as ticket metric events, never send it and always link to a next page, so like Zenpy the
+    export also stops once `end_time` is within `TIME_BASED_EXPORT_LAG` of now or stops advancing.
+    """
+    if page.get('end_of_stream') or not page.get('next_page'):
+        return True
+    end_time = page.get('end_time')
+    if end_time is None:
+        return False
+    if end_time >= time.time() - TIME_BASED_EXPORT_LAG:
+        return True
+    return previous_end_time is not None and end_time <= previous_end_time
+
+def get_time_based_export(url, access_token, request_timeout, start_time, side_load):
+    """
+    Page through a time based incremental export, such as ticket events, which has no cursor
+    based version. Each page links to the next one until `time_based_export_done`.
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Authorization': 'Bearer {}'.format(access_token),
+    }
+
+    params = {'start_time': start_time, 'include': side_load}
+
+    response_json = call_api_json(url, request_timeout, params=params, headers=headers)
+
+    yield response_json
+
+    end_time = None
+    while not time_based_export_done(response_json, end_time):
+        end_time = response_json.get('end_time')
+        response_json = call_api_json(response_json['next_page'], request_timeout, params=None, headers=headers)
+
+        yield response_json
@@ -0,0 +1,92 @@
+import codecs
+import json
+import re
+
+DECODER = json.JSONDecoder()
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class ChunkReader():
+    """
+    Decodes JSON values one at a time from an iterable of byte chunks, only keeping the
+    unconsumed part of the input in memory.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """ Appends the next chunk to the buffer. Returns False once the input is exhausted. """
+        if self.eof:
+            return False
+        try:
+            text = self.decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.eof = True
+            text = self.decoder.decode(b'', final=True)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Skips whitespace and returns the next character, or '' at the end of the input. """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError("Expecting one of {!r}".format(chars), self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value is not complete yet
+                if self.fill():
+                    continue
+                raise
+            # A number at the end of the buffer may go on in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_items(chunks, item_key, fields):
+    """
+    Yields the items of the `item_key` array of the JSON object read from `chunks` as soon as
+    each one has been read, without loading the whole object into memory. The object's other
+    fields are added to the `fields` dict as they are read, so fields that follow the array,
+    such as `after_cursor` or `end_of_stream`, are only there once all items have been yielded.
+    """
+    reader = ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == item_key and reader.peek() == '[':
+            reader.pos += 1
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            fields[key] = reader.value()
+        if reader.expect(',}') == '}':
+            return
@@ -1,99 +1,148 @@
-import logging
-from statistics import mean
-from collections import defaultdict
+import threading
+import time
+from collections import defaultdict, deque
 from datetime import datetime
 import singer
 
-# Defines the window (in seconds) over which we will collect raw metrics.
-# After this much time has elapsed we'll capture a compressed datapoint
-# and log the current results.
-capture_rate = 300              # 5 minutes of seconds
-
-metrics_data = {
-    # The utc datetime that the most recent window of caputure started on
-    'window_start_time': None,
-    # This will be a dict of metric => number of datapoints captured since
-    # last aggregation
-    'aggregate_rates': defaultdict(list),
-    # This will be a dict of metric => [capture_window_datapoint1, …,
-    # capture_window_datapointn]
-    'window_counts': defaultdict(int)
-}
+# Defines the window (in seconds) over which we will collect raw metrics
+# (config param `metrics_window_seconds`). After this much time has elapsed
+# we'll capture a compressed datapoint and, with snapshots on, log the
+# current results.
+DEFAULT_CAPTURE_RATE = 300      # 5 minutes of seconds
+# Number of the latest windows the percentiles are computed over, a day of 5 minute windows
+ROLLING_WINDOWS = 288
+PERCENTILES = (50, 95)
 
 LOGGER = singer.get_logger()
-LOGGER.setLevel(logging.DEBUG)
-
-def _seconds_since_datetime(dt):
-    "Returns the number of seconds since DT"
-    return (datetime.utcnow() - dt).seconds
-
-def _log_aggregate_rates(current_capture_rate, aggregate_rates):
-    """Logs the aggregate rates"""
-    if not list(aggregate_rates.items()):
-        LOGGER.info("No zendesk metrics were captured")
-    else:
-        for metric, value in aggregate_rates.items():
-            LOGGER.info("Synced average of %s %ss per %s seconds",
-                        mean(value),
-                        metric,
-                        current_capture_rate)
-            LOGGER.info("Synced minimum of %s %ss per %s seconds",
-                        min(value),
-                        metric,
-                        current_capture_rate)
-            LOGGER.info("Synced max of %s %ss per %s seconds",
-                        max(value),
-                        metric,
-                        current_capture_rate)
-            LOGGER.info("Synced total of %s %ss in %s seconds",
-                        sum(value),
-                        metric,
-                        # Slightly idealized view of how long we've been
-                        # capturing metrics for.
-                        current_capture_rate * len(value))
-
-
-def _aggregate_rates(current_capture_rate, current_metrics_data):
-    """Captures the aggregate rates, resets the capture window, and logs the
-    new aggregate rates"""
-    LOGGER.debug(
-        "Computing aggregate metrics over the previous %d seconds",
-        current_capture_rate)
-    window_counts = current_metrics_data['window_counts']
-    aggregate_rates = current_metrics_data['aggregate_rates']
-    for metric in list(window_counts.keys()):
-        aggregate_rates[metric] += [window_counts.pop(metric)]
-    current_metrics_data['window_start_time'] = datetime.utcnow()
-    _log_aggregate_rates(current_capture_rate, current_metrics_data['aggregate_rates'])
-
-def _maybe_aggregate_rates(current_capture_rate, current_metrics_data):
-    """Takes metrics_data and aggregates it into the current aggregated rates
-    if enough time has passed. If an aggregation happens it the new
-    aggregate values are logged.
 
+
+class RateStats():
+    """
+    Counts per window of one metric: running totals over every window, and the latest
+    `ROLLING_WINDOWS` counts for the percentiles, so memory stays the same however long the sync.
+    """
+    __slots__ = ('windows', 'total', 'minimum', 'maximum', 'recent')
+
+    def __init__(self):
+        self.windows = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.recent = deque(maxlen=ROLLING_WINDOWS)
+
+    def add(self, count):
+        self.windows += 1
+        self.total += count
+        self.minimum = count if self.minimum is None else min(self.minimum, count)
+        self.maximum = count if self.maximum is None else max(self.maximum, count)
+        self.recent.append(count)
+
+    def mean(self):
+        # Whole means are logged as integers, as `statistics.mean` does
+        return self.total // self.windows if self.total % self.windows == 0 else self.total / self.windows
+
+    def percentile(self, percent):
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, len(ordered) * percent // 100)]
+
+
+class Metrics():
+    """
+    Counts captures of each metric in windows of `capture_rate` seconds, measured on the monotonic
+    clock. A capture only increments a counter and compares the clock with the end of the window.
+    Captures may come from several threads, e.g. the parallel windows of a backfill, so the counts
+    are only touched under `lock`; logging happens outside of it.
     """
-    if current_capture_rate <= _seconds_since_datetime(
-            current_metrics_data['window_start_time']):
-        _aggregate_rates(current_capture_rate, current_metrics_data)
+    def __init__(self, capture_rate=DEFAULT_CAPTURE_RATE, snapshots=True):
+        self.capture_rate = capture_rate
+        self.snapshots = snapshots
+        self.window_counts = defaultdict(int)
+        self.rates = defaultdict(RateStats)
+        # The first capture starts the first window
+        self.window_end = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        snapshots = config.get('metrics_snapshots')
+        return cls(float(config.get('metrics_window_seconds') or DEFAULT_CAPTURE_RATE),
+                   snapshots in (None, "") or str(snapshots).lower() == 'true')
+
+    def capture(self, metric):
+        started = lines = None
+        with self.lock:
+            self.window_counts[metric] += 1
+            if self.window_end is None:
+                self.window_end = time.monotonic() + self.capture_rate
+                started = True
+            elif time.monotonic() >= self.window_end:
+                self._close_window()
+                if self.snapshots:
+                    lines = self._rate_lines()
+        if started:
+            LOGGER.info('Starting metrics capture at %s', datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+        if lines:
+            self._log(lines)
+
+    def aggregate_rates(self, log=True):
+        """Captures the counts of the window into the aggregate rates, starts a new window, and logs the
+        aggregate rates"""
+        with self.lock:
+            self._close_window()
+            lines = self._rate_lines() if log else None
+        if log:
+            self._log(lines)
+
+    def log_aggregate_rates(self):
+        """Logs the aggregate rates"""
+        with self.lock:
+            lines = self._rate_lines()
+        self._log(lines)
+
+    def _close_window(self):
+        for metric, count in self.window_counts.items():
+            self.rates[metric].add(count)
+        self.window_counts.clear()
+        self.window_end = time.monotonic() + self.capture_rate
+
+    def _rate_lines(self):
+        """The log lines of the aggregate rates, as (message, *args), taken under the lock"""
+        capture_rate = self.capture_rate
+        lines = []
+        for metric, stats in self.rates.items():
+            lines.append(("Synced average of %s %ss per %s seconds", stats.mean(), metric, capture_rate))
+            lines.append(("Synced minimum of %s %ss per %s seconds", stats.minimum, metric, capture_rate))
+            lines.append(("Synced max of %s %ss per %s seconds", stats.maximum, metric, capture_rate))
+            lines.append(("Synced total of %s %ss in %s seconds",
+                          stats.total,
+                          metric,
+                          # Slightly idealized view of how long we've been
+                          # capturing metrics for.
+                          capture_rate * stats.windows))
+            lines.append(("Synced %s of %ss per %s seconds over the last %s windows",
+                          ", ".join("p{} {}".format(percent, stats.percentile(percent)) for percent in PERCENTILES),
+                          metric, capture_rate, len(stats.recent)))
+        return lines
+
+    @staticmethod
+    def _log(lines):
+        if not lines:
+            LOGGER.info("No zendesk metrics were captured")
+        for line in lines:
+            LOGGER.info(*line)
+
+METRICS = Metrics()
+
+
+def configure(config):
+    global METRICS # pylint: disable=global-statement
+    METRICS = Metrics.from_config(config)
 
-def _capture_raw(current_metrics_data, metric):
-    """Adds one to METRIC in WINDOW_COUNTS defaultdict"""
-    current_metrics_data['window_counts'][metric] += 1
-    LOGGER.debug('Raw count for metric %s is %d',
-                 metric,
-                 current_metrics_data['window_counts'][metric])
 
 def capture(metric):
-    # Start the metrics window timer if this is the first time capture has
-    # been called
-    if not metrics_data['window_start_time']:
-        metrics_data['window_start_time'] = datetime.utcnow()
-        LOGGER.info('Starting metrics capture at %s',
-                    datetime.strftime(metrics_data['window_start_time'], '%Y-%m-%dT%H:%M:%SZ'))
+    METRICS.capture(metric)
 
-    _capture_raw(metrics_data, metric)
-    _maybe_aggregate_rates(capture_rate, metrics_data)
 
 def log_aggregate_rates():
     """Forces a log of the aggregate rates for the internal datastructures"""
-    _aggregate_rates(capture_rate, metrics_data)
+    METRICS.aggregate_rates()
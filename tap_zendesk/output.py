@@ -0,0 +1,107 @@
+import sys
+import time
+from contextlib import contextmanager
+import singer
+from singer import messages
+from tap_zendesk import profiling
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOGGER = singer.get_logger()
+
+# Default flush policy: whichever limit is reached first
+DEFAULT_BUFFER_BYTES = 1024 * 1024
+DEFAULT_BUFFER_MESSAGES = 5000
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+def singer_encoder(message):
+    """ Encodes a message exactly as singer.write_message does. """
+    return messages.format_message(message)
+
+
+def orjson_encoder(message):
+    """ Encodes a message with orjson, falling back to singer's encoder for values orjson does not
+    support (e.g. Decimal, non-string keys or integers wider than 64 bits). """
+    try:
+        return orjson.dumps(message.asdict()).decode('utf-8') # pylint: disable=no-member
+    except TypeError:
+        return messages.format_message(message)
+
+
+ENCODERS = {
+    'singer': singer_encoder,
+    'orjson': orjson_encoder,
+}
+
+
+class MessageWriter():
+    """
+    Buffers encoded Singer messages and writes them to stdout in batches.
+
+    Every message, whatever its type, goes through the same buffer in the order it was written,
+    so a STATE message can never reach stdout ahead of the RECORD messages written before it.
+    The buffer is flushed once it holds `max_bytes` characters or `max_messages` messages, or
+    when a message is written more than `flush_interval` seconds after the last flush.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUFFER_BYTES, max_messages=DEFAULT_BUFFER_MESSAGES,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, encoder=singer_encoder):
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.flush_interval = flush_interval
+        self.encoder = encoder
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.last_flush = time.monotonic()
+
+    def write_message(self, message):
+        line = self.encoder(message) + '\n'
+        self.buffer.append(line)
+        self.buffered_bytes += len(line)
+        if (self.buffered_bytes >= self.max_bytes
+                or len(self.buffer) >= self.max_messages
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            sys.stdout.write(''.join(self.buffer))
+            sys.stdout.flush()
+            self.buffer = []
+            self.buffered_bytes = 0
+        self.last_flush = time.monotonic()
+
+
+def get_writer(config):
+    """ Builds a MessageWriter from the `output_*` config params. """
+    encoder_name = config.get('output_json_encoder') or 'singer'
+    if encoder_name not in ENCODERS:
+        raise ValueError("Unsupported output_json_encoder '{}', expected one of: {}".format(
+            encoder_name, ", ".join(ENCODERS)))
+    if encoder_name == 'orjson' and orjson is None:
+        LOGGER.warning("orjson is not installed, falling back to the default JSON encoder.")
+        encoder_name = 'singer'
+
+    return MessageWriter(
+        max_bytes=int(config.get('output_buffer_bytes') or DEFAULT_BUFFER_BYTES),
+        max_messages=int(config.get('output_buffer_messages') or DEFAULT_BUFFER_MESSAGES),
+        flush_interval=float(config.get('output_flush_interval') or DEFAULT_FLUSH_INTERVAL),
+        encoder=profiling.timed('serialize', ENCODERS[encoder_name]))
+
+
+@contextmanager
+def buffered_output(writer):
+    """ Routes singer.write_record/write_state/write_schema through `writer` and flushes whatever
+    is left in the buffer on exit. """
+    # patch singer's write_message, which every singer.write_* function goes through
+    write_message = messages.write_message
+    messages.write_message = writer.write_message
+    try:
+        yield writer
+    finally:
+        messages.write_message = write_message
+        writer.flush()
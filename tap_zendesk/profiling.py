@@ -0,0 +1,163 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+import singer
+
+LOGGER = singer.get_logger()
+
+# Stages of the sync a stream's time is split into, in the order they are logged. `read` is the
+# time spent getting the next record that is not part of another stage, such as paginating,
+# filtering on bookmarks and building Zenpy's objects.
+STAGES = ('fetch', 'decode', 'read', 'convert', 'transform', 'serialize', 'write', 'rate_limit_sleep')
+# Functions of the slowest stream's cProfile stats logged at the end of the sync
+DEFAULT_TOP_FUNCTIONS = 25
+
+
+class Profiler(): # pylint: disable=too-many-instance-attributes
+    """
+    Times the stages of each stream's sync. A stage is timed exclusive of the stages timed within
+    it on the same thread, e.g. `read` leaves out the `fetch` of the pages it reads. Stages run on
+    other threads, such as the async ticket audit requests, overlap with the stream's wall time.
+
+    With an `output_dir`, each stream is also run under cProfile, which only follows the thread
+    the stream is synced on, and its stats are written to `<output_dir>/<stream>.prof`.
+    """
+    def __init__(self, output_dir=None, top_functions=DEFAULT_TOP_FUNCTIONS):
+        self.output_dir = output_dir
+        self.top_functions = top_functions
+        self.stream = None
+        # stream => {stage => [seconds, calls]}
+        self.stages = {}
+        # stream => seconds it took to sync
+        self.wall_times = {}
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @classmethod
+    def from_config(cls, config):
+        """ A Profiler if the `profile` config param is true, otherwise None """
+        if str(config.get('profile', '')).lower() != 'true':
+            return None
+        return cls(config.get('profile_output_dir') or None,
+                   int(config.get('profile_top_functions') or DEFAULT_TOP_FUNCTIONS))
+
+    def add(self, stage, seconds):
+        with self.lock:
+            stages = self.stages.setdefault(self.stream or 'other', {})
+            totals = stages.get(stage)
+            if totals is None:
+                totals = stages[stage] = [0.0, 0]
+            totals[0] += seconds
+            totals[1] += 1
+
+    def measure(self, stage, func, *args, **kwargs):
+        local = self.local
+        outer = getattr(local, 'nested', 0.0)
+        local.nested = 0.0
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(stage, elapsed - local.nested)
+            local.nested = outer + elapsed
+
+    @contextmanager
+    def profile_stream(self, stream):
+        self.stream = stream
+        profile = cProfile.Profile() if self.output_dir else None
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                os.makedirs(self.output_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.output_dir, '{}.prof'.format(stream)))
+                self.profiles[stream] = profile
+            self.wall_times[stream] = self.wall_times.get(stream, 0.0) + time.perf_counter() - start
+            self.stream = None
+
+    def log_summary(self):
+        for stream in sorted(self.wall_times, key=self.wall_times.get, reverse=True):
+            stages = self.stages.get(stream, {})
+            LOGGER.info("Profile of %s: %.2f seconds; %s", stream, self.wall_times[stream],
+                        ", ".join("{} {:.2f}s in {} calls".format(stage, *stages[stage])
+                                  for stage in STAGES if stage in stages) or "no stages timed")
+        if self.profiles:
+            hot_stream = max(self.profiles, key=self.wall_times.get)
+            output = io.StringIO()
+            stats = pstats.Stats(self.profiles[hot_stream], stream=output)
+            stats.sort_stats('cumulative').print_stats(self.top_functions)
+            LOGGER.info("Slowest stream %s, profile written to %s:\n%s", hot_stream,
+                        os.path.join(self.output_dir, '{}.prof'.format(hot_stream)), output.getvalue())
+
+
+# Profiling is off unless `configure()` is called with the `profile` config param set
+PROFILER = None
+
+
+def configure(config):
+    global PROFILER # pylint: disable=global-statement
+    PROFILER = Profiler.from_config(config)
+
+
+def timed(stage, func):
+    """ `func`, timed as `stage` when profiling, or as it is otherwise """
+    profiler = PROFILER
+    if profiler is None:
+        return func
+
+    def timed_func(*args, **kwargs):
+        return profiler.measure(stage, func, *args, **kwargs)
+    return timed_func
+
+
+def timed_iter(stage, iterable):
+    """ `iterable`, with the time taken to get each item timed as `stage` when profiling """
+    profiler = PROFILER
+    if profiler is None:
+        return iterable
+
+    def timed_items():
+        iterator = iter(iterable)
+        try:
+            while True:
+                try:
+                    item = profiler.measure(stage, next, iterator)
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            # Closes a generator left part way through, as the caller would have without profiling
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+    return timed_items()
+
+
+def record(stage, seconds):
+    """ Adds `seconds` to `stage` when profiling, for stages timed on another event loop or thread """
+    if PROFILER is not None:
+        PROFILER.add(stage, seconds)
+
+
+@contextmanager
+def profile_stream(stream):
+    if PROFILER is None:
+        yield
+        return
+    with PROFILER.profile_stream(stream):
+        yield
+
+
+def log_summary():
+    if PROFILER is not None:
+        PROFILER.log_summary()
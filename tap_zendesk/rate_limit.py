@@ -0,0 +1,273 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from contextlib import contextmanager
+from tap_zendesk import profiling
+
+# Requests per minute allowed across the whole account. Unless configured, requests are only held
+# back across the account once the quota headers show it has run out.
+DEFAULT_ACCOUNT_RATE_LIMIT = None
+
+# Zendesk's account-wide quota headers, newest first
+LIMIT_HEADERS = ('ratelimit-limit', 'x-rate-limit')
+REMAINING_HEADERS = ('ratelimit-remaining', 'x-rate-limit-remaining')
+RESET_HEADER = 'ratelimit-reset'
+# Endpoint quotas, e.g. `Zendesk-RateLimit-Ticket-Audits: total=450; remaining=449; resets=20`
+ENDPOINT_HEADER_PREFIX = 'zendesk-ratelimit-'
+ENDPOINT_HEADER_RE = re.compile(r'(total|remaining|resets)=(\d+)')
+
+# Length of Zendesk's rate limit window, used when a response does not say when the quota resets
+QUOTA_WINDOW = 60
+
+
+def parse_quota(headers):
+    """
+    Returns the (remaining, resets in seconds) account quota and a {lowercased endpoint header
+    suffix: (remaining, resets in seconds)} map of the endpoint quotas found in the response
+    headers. Values a response does not carry are None.
+    """
+    if not isinstance(headers, Mapping):
+        headers = {}
+    headers = {str(key).lower(): value for key, value in headers.items()}
+
+    def first(names):
+        for name in names:
+            if headers.get(name) not in (None, ""):
+                return float(headers[name])
+        return None
+
+    endpoint_quotas = {}
+    for key, value in headers.items():
+        if key.startswith(ENDPOINT_HEADER_PREFIX):
+            fields = dict(ENDPOINT_HEADER_RE.findall(str(value)))
+            if 'remaining' in fields:
+                endpoint_quotas[key[len(ENDPOINT_HEADER_PREFIX):]] = (
+                    float(fields['remaining']), float(fields['resets']) if 'resets' in fields else None)
+    return (first(REMAINING_HEADERS), first((RESET_HEADER,))), endpoint_quotas
+
+
+class TokenBucket():
+    """
+    Allows `per_minute` requests a minute, spread evenly: tokens refill continuously at
+    `per_minute / 60` a second, and at most `capacity` (by default one second's worth) build up
+    while no requests are made.
+
+    `reserve()` takes a token straight away and returns how long the caller has to wait before
+    using it, so that callers on different threads or event loops queue up without holding the
+    lock while they wait.
+
+    `adapt()` slows the bucket down to spread the quota Zendesk reports as remaining over the
+    time left until it resets, so that requests made by other clients of the account are
+    accounted for. The bucket never goes faster than `per_minute`.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.per_minute = per_minute
+        self.max_rate = per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = capacity or max(1, int(self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def adapt(self, remaining, resets):
+        resets = max(resets or QUOTA_WINDOW, 1)
+        with self.lock:
+            self.rate = min(self.max_rate, max(remaining, 1) / resets)
+
+    @property
+    def saturation(self):
+        """ The current rate as a fraction of the configured one. """
+        return self.rate / self.max_rate
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+
+class MinuteWindowBucket(TokenBucket):
+    """
+    Allows `per_minute` requests in any minute without spreading them, for endpoints whose quota
+    is too small to spread evenly: a burst of up to `per_minute` requests is sent straight away,
+    then each request waits until the one `per_minute` requests before it is a minute old.
+
+    `adapt()` slows it down as it does a `TokenBucket`, by allowing fewer requests a minute.
+    """
+
+    def __init__(self, per_minute):
+        super().__init__(per_minute)
+        # When each of the latest requests is sent, in the order they were reserved
+        self.sent = deque(maxlen=max(1, int(per_minute)))
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            # Requests allowed a minute at the current rate
+            allowed = min(self.sent.maxlen, max(1, int(self.rate * QUOTA_WINDOW)))
+            start = now
+            if len(self.sent) >= allowed:
+                start = max(now, self.sent[-allowed] + QUOTA_WINDOW)
+            self.sent.append(start)
+            return start - now
+
+
+# Endpoint classes with a limit of their own, as (name, url pattern, default requests per minute,
+# bucket class).
+# https://developer.zendesk.com/api-reference/introduction/rate-limits/
+ENDPOINT_CLASSES = [
+    ('ticket_audits', re.compile(r'/tickets/\d+/audits'), 450, TokenBucket),
+    # Spread evenly, 10 a minute would put 6 seconds between every export request, discovery's too
+    ('incremental_exports', re.compile(r'/incremental/'), 10, MinuteWindowBucket),
+]
+
+
+class RateLimiter():
+    """
+    Paces requests with one account-wide bucket plus one bucket per endpoint class. A request
+    waits until it has a token from the account bucket and from the bucket of its endpoint class.
+
+    The buckets adapt to the quota headers of every response passed to `observe()`. Without an
+    account bucket, a response showing the account quota has run out pauses every request until
+    it resets. On a 429,
+    `pause()` holds back every request until the Retry-After has passed: the request that got
+    the 429 first does the backing off, and the others wait behind it in the limiter rather than
+    each sleeping and retrying on its own.
+    """
+
+    def __init__(self, account_bucket=None, endpoint_buckets=None):
+        self.account_bucket = account_bucket
+        # [(endpoint class name, url pattern, bucket)]
+        self.endpoint_buckets = endpoint_buckets or []
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Builds the limiter from the `rate_limit_per_minute` and `<endpoint class>_rate_limit_per_minute`
+        config params. A limit of 0 turns that bucket off. There is no account bucket unless
+        `rate_limit_per_minute` is set.
+        """
+        def bucket(key, default, bucket_class=TokenBucket):
+            per_minute = config.get(key)
+            per_minute = default if per_minute in (None, "") else float(per_minute)
+            return bucket_class(per_minute) if per_minute else None
+
+        endpoint_buckets = []
+        for name, pattern, default, bucket_class in ENDPOINT_CLASSES:
+            endpoint_bucket = bucket('{}_rate_limit_per_minute'.format(name), default, bucket_class)
+            if endpoint_bucket:
+                endpoint_buckets.append((name, pattern, endpoint_bucket))
+        return cls(bucket('rate_limit_per_minute', DEFAULT_ACCOUNT_RATE_LIMIT), endpoint_buckets)
+
+    def delay(self, url):
+        """ Reserves the tokens for a request to `url` and returns the seconds to wait before sending it. """
+        delays = [0, self.paused_until - time.monotonic()]
+        if self.account_bucket:
+            delays.append(self.account_bucket.reserve())
+        endpoint_bucket = self._endpoint_bucket(url)
+        if endpoint_bucket:
+            delays.append(endpoint_bucket.reserve())
+        return max(delays)
+
+    def _endpoint_bucket(self, url):
+        for _, pattern, bucket in self.endpoint_buckets:
+            if pattern.search(url):
+                return bucket
+        return None
+
+    def observe(self, url, headers):
+        """ Adapts the pace of the buckets for `url` to the quota reported in a response's headers. """
+        (remaining, resets), endpoint_quotas = parse_quota(headers)
+        if self.account_bucket and remaining is not None:
+            self.account_bucket.adapt(remaining, resets)
+        elif remaining is not None and remaining < 1:
+            self.pause(resets or QUOTA_WINDOW)
+        endpoint_bucket = self._endpoint_bucket(url)
+        if endpoint_bucket and endpoint_quotas:
+            # A response only reports the quota of the endpoint it came from
+            endpoint_bucket.adapt(*min(endpoint_quotas.values(), key=lambda quota: quota[0]))
+
+    def pause(self, seconds):
+        """
+        Holds back every request for `seconds`. Returns the end of the pause when this call
+        started it, in which case the caller does the backing off and calls `resume()` with it
+        once done, or None when a pause was already in progress.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return None
+            self.paused_until = now + seconds
+            return self.paused_until
+
+    def resume(self, paused_until):
+        with self.lock:
+            if self.paused_until == paused_until:
+                self.paused_until = 0
+
+    def concurrency(self, name, maximum):
+        """
+        Scales `maximum` concurrent requests to endpoint class `name` down by as much as its
+        buckets have been slowed, down to one request while paused.
+        """
+        if self.paused_until > time.monotonic():
+            return 1
+        saturation = 1
+        buckets = [bucket for bucket_name, _, bucket in self.endpoint_buckets if bucket_name == name]
+        for bucket in [self.account_bucket] + buckets:
+            if bucket:
+                saturation = min(saturation, bucket.saturation)
+        return max(1, int(round(maximum * saturation)))
+
+    def wait(self, url):
+        delay = self.delay(url)
+        if delay:
+            profiling.timed('rate_limit_sleep', time.sleep)(delay)
+
+    async def wait_async(self, url):
+        delay = self.delay(url)
+        if delay:
+            await asyncio.sleep(delay)
+            profiling.record('rate_limit_sleep', delay)
+
+
+# The limiter shared by every request the tap makes. Requests are not paced until `configure()`
+# is called with the tap's config.
+LIMITER = RateLimiter()
+
+_LOCAL = threading.local()
+
+
+def configure(config):
+    global LIMITER # pylint: disable=global-statement
+    LIMITER = RateLimiter.from_config(config)
+
+
+@contextmanager
+def limited(url):
+    """
+    Waits for the tokens of a request to `url` before running the block. Requests made from
+    within the block on the same thread, such as `requests.get` going through the patched
+    `Session.request`, are not counted again. Yields whether this is the outermost block, i.e.
+    whether the request's errors are left to the code running it rather than to an enclosing
+    block.
+    """
+    if getattr(_LOCAL, 'active', False):
+        yield False
+        return
+    LIMITER.wait(url)
+    _LOCAL.active = True
+    try:
+        yield True
+    finally:
+        _LOCAL.active = False
@@ -1,18 +1,21 @@
+# pylint: disable=too-many-lines
+import abc
 import os
 import json
+import copy
 import datetime
-import asyncio
+import collections
+import itertools
 import time
 import pytz
-import requests
-from zenpy.lib.exception import APIException
-from aiohttp import ClientSession
 import singer
 from singer import metadata
 from singer import utils
 from singer.metrics import Point
 from tap_zendesk import metrics as zendesk_metrics
+from tap_zendesk import custom_fields
 from tap_zendesk import http
+from tap_zendesk import rate_limit
 
 
 LOGGER = singer.get_logger()
@@ -21,13 +24,29 @@ KEY_PROPERTIES = ['id']
 DEFAULT_PAGE_SIZE = 100
 REQUEST_TIMEOUT = 300
 CONCURRENCY_LIMIT = 20
-# Reference: https://developer.zendesk.com/api-reference/introduction/rate-limits/#endpoint-rate-limits:~:text=List%20Audits%20for,requests%20per%20minute
-AUDITS_REQUEST_PER_MINUTE = 450
 START_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
-HEADERS = {
-    'Content-Type': 'application/json',
-    'Accept': 'application/json',
-}
+# Where ticket_audits and ticket_comments are read from: the audits of each ticket, or the
+# ticket events export (config param `ticket_audits_source`)
+AUDITS_SOURCE_PER_TICKET = "per_ticket"
+AUDITS_SOURCE_TICKET_EVENTS = "ticket_events"
+TICKET_EVENTS_BOOKMARK_KEY = "ticket_events_end_time"
+# Length of the time windows of a backfill (config param `<stream>_backfill_window_days`)
+DEFAULT_BACKFILL_WINDOW_DAYS = 30
+BACKFILL_BOOKMARK_KEY = "backfill"
+# Bookmark of the ETag of each page of the streams synced with `conditional_requests`
+VALIDATORS_BOOKMARK_KEY = "validators"
+# Bookmark of the time of the last full scan of the streams read newest first
+FULL_SCAN_BOOKMARK_KEY = "last_full_scan"
+# Hours between those full scans (config param `full_scan_interval_hours`)
+DEFAULT_FULL_SCAN_INTERVAL_HOURS = 24
+# Bookmark of the cursor an interrupted incremental export resumes from
+CURSOR_BOOKMARK_KEY = "after_cursor"
+# Seconds between checkpoints of that cursor (config param `checkpoint_interval_seconds`)
+DEFAULT_CHECKPOINT_INTERVAL_SECONDS = 60
+# Keys of ticket events export child events that ticket audit events don't have
+TICKET_EVENT_ONLY_KEYS = {'event_type', 'via_reference_id', 'comment_present', 'comment_public'}
+# Keys of ticket audit events other than the changed field of a `Create` or `Change` event
+AUDIT_EVENT_KEYS = {'id', 'type', 'audit_id', 'via', 'previous_value', 'field_name', 'value'}
 CUSTOM_TYPES = {
     'text': 'string',
     'textarea': 'string',
@@ -43,18 +62,26 @@ CUSTOM_TYPES = {
 def get_abs_path(path):
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
 
+def request_headers(access_token):
+    """ Headers of a request to the Zendesk API, built per call so concurrent checks don't share them. """
+    return {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Authorization': 'Bearer {}'.format(access_token),
+    }
+
 def process_custom_field(field):
     """ Take a custom field description and return a schema for it. """
-    if field.type not in CUSTOM_TYPES:
+    if field['type'] not in CUSTOM_TYPES:
         LOGGER.critical("Discovered unsupported type for custom field %s (key: %s): %s",
-                        field.title, field.key, field.type)
+                        field['title'], field['key'], field['type'])
 
-    json_type = CUSTOM_TYPES.get(field.type, "string")
+    json_type = CUSTOM_TYPES.get(field['type'], "string")
     field_schema = {'type': [json_type, 'null']}
-    if field.type == 'date':
+    if field['type'] == 'date':
         field_schema['format'] = 'datetime'
-    if field.type == 'dropdown':
-        field_schema['enum'] = [o.value for o in field.custom_field_options]
+    if field['type'] == 'dropdown':
+        field_schema['enum'] = [o['value'] for o in field['custom_field_options']]
 
     return field_schema
 
@@ -65,8 +92,11 @@ class Stream():
     key_properties = KEY_PROPERTIES
     stream = None
     endpoint = None
+    item_key = None
     request_timeout = None
     page_size = None
+    # Streams whose pages are requested with the ETag of the last sync when `conditional_requests` is set
+    supports_conditional_requests = False
     # Streams with is_optional=True depend on a specific plan tier or paid add-on.
     # A 403 on these during discovery excludes them from the catalog rather than
     # blocking connection creation.
@@ -92,6 +122,8 @@ class Stream():
         else:
             self.page_size = DEFAULT_PAGE_SIZE
 
+        self._schema = None
+
     def get_bookmark(self, state):
         return utils.strptime_with_tz(singer.get_bookmark(state, self.name, self.replication_key))
 
@@ -102,14 +134,36 @@ class Stream():
 
 
     def load_schema(self):
-        schema_file = "schemas/{}.json".format(self.name)
-        with open(get_abs_path(schema_file), encoding='UTF-8') as f:
-            schema = json.load(f)
-        return self._add_custom_fields(schema)
+        # The custom fields are fetched from the API, so the schema is only built once per
+        # stream instance. Callers get a copy they are free to modify.
+        if self._schema is None:
+            schema_file = "schemas/{}.json".format(self.name)
+            with open(get_abs_path(schema_file), encoding='UTF-8') as f:
+                schema = json.load(f)
+            self._schema = self._add_custom_fields(schema)
+        return copy.deepcopy(self._schema)
 
     def _add_custom_fields(self, schema):
         return schema
 
+    def _load_custom_fields(self, schema, field_type):
+        """ Add the custom fields of `field_type` (`user_fields` or `organization_fields`) to the schema. """
+        try:
+            fields = custom_fields.CACHE.get_fields(self.config['subdomain'], field_type,
+                                                    request_headers(self.config['access_token']),
+                                                    self.request_timeout)
+        except http.ZendeskForbiddenError:
+            # There are multiple tiers of Zendesk accounts. Some of them have
+            # access to `custom_fields` and some do not.
+            LOGGER.warning("The account credentials supplied do not have access to `%s` custom fields.",
+                           self.name)
+            return schema
+        schema['properties'][field_type]['properties'] = {}
+        for field in fields:
+            schema['properties'][field_type]['properties'][field['key']] = process_custom_field(field)
+
+        return schema
+
     def load_metadata(self):
         schema = self.load_schema()
         mdata = metadata.new()
@@ -135,13 +189,38 @@ class Stream():
         Check whether the permission was given to access stream resources or not.
         '''
         url = self.endpoint.format(self.config['subdomain'])
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
 
-        http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=HEADERS)
+        http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=request_headers(self.config['access_token']))
+
+    def uses_conditional_requests(self):
+        return self.supports_conditional_requests and str(self.config.get('conditional_requests', '')).lower() == 'true'
+
+    def get_objects_conditionally(self, state, params, next_page):
+        '''
+        Retrieve the objects of the pages that changed since the last sync. Each page is requested
+        with the ETag it had then, and the objects of a page answered with 304 Not Modified are not
+        emitted again. The ETags are kept in the state once every page was read.
+        '''
+        url = self.endpoint.format(self.config['subdomain'])
+        validators = singer.get_bookmark(state, self.name, VALIDATORS_BOOKMARK_KEY) or {}
+        seen = {}
+        unchanged = 0
+        for key, validator, page in http.get_conditionally(url, self.config['access_token'], self.request_timeout,
+                                                           params, validators, next_page):
+            if page is None:
+                unchanged += 1
+            else:
+                yield from page[self.item_key]
+            seen[key] = validator
+        LOGGER.info("%s: %s of %s pages unchanged since the last sync", self.name, unchanged, len(seen))
+        singer.write_bookmark(state, self.name, VALIDATORS_BOOKMARK_KEY, seen)
+        singer.write_state(state)
 
 class CursorBasedStream(Stream):
     item_key = None
     endpoint = None
+    # Params that list the objects of the endpoint by `updated_at`, newest first
+    newest_first_params = None
 
     def get_objects(self, **kwargs):
         '''
@@ -152,83 +231,307 @@ class CursorBasedStream(Stream):
         for page in http.get_cursor_based(url, self.config['access_token'], self.request_timeout, self.page_size, **kwargs):
             yield from page[self.item_key]
 
+    def get_changed_objects(self, state):
+        if not self.uses_conditional_requests():
+            return self.get_objects()
+        return self.get_objects_conditionally(state, {'page[size]': self.page_size}, http.next_cursor_page)
+
+    def full_scan_due(self, state):
+        last_full_scan = singer.get_bookmark(state, self.name, FULL_SCAN_BOOKMARK_KEY)
+        if not last_full_scan:
+            return True
+        hours = self.config.get('full_scan_interval_hours')
+        hours = DEFAULT_FULL_SCAN_INTERVAL_HOURS if hours in (None, "") else float(hours)
+        return utils.now() - utils.strptime_with_tz(last_full_scan) >= datetime.timedelta(hours=hours)
+
+    def get_updated_objects(self, state):
+        '''
+        Retrieve the objects that may have been updated since the bookmark. Streams whose endpoint
+        lists objects newest first stop at the first page whose objects are all older than the
+        bookmark. As updates are not always listed in order, every page is still read once every
+        `full_scan_interval_hours`, or as soon as objects are found out of order. An endpoint that
+        rejects the params listing its objects newest first is read in full.
+        '''
+        if not self.newest_first_params:
+            yield from self.get_changed_objects(state)
+            return
+        if self.full_scan_due(state):
+            LOGGER.info("%s: Reading every page for the periodic full scan", self.name)
+            yield from self.get_changed_objects(state)
+            singer.write_bookmark(state, self.name, FULL_SCAN_BOOKMARK_KEY, utils.strftime(utils.now()))
+            return
+
+        bookmark = self.get_bookmark(state)
+        url = self.endpoint.format(self.config['subdomain'])
+        in_order = True
+        previous = None
+        pages = http.get_cursor_based(url, self.config['access_token'], self.request_timeout, self.page_size,
+                                      params=self.newest_first_params)
+        try:
+            first_page = next(pages, None)
+        except (http.ZendeskBadRequestError, http.ZendeskUnprocessableEntityError) as e:
+            LOGGER.warning("%s: Objects can't be listed newest first, reading every page: %s", self.name, e)
+            yield from self.get_changed_objects(state)
+            return
+        for page in itertools.chain([first_page] if first_page else [], pages):
+            older_page = bool(page[self.item_key])
+            for obj in page[self.item_key]:
+                updated_at = obj['updated_at'] and utils.strptime_with_tz(obj['updated_at'])
+                if updated_at and previous and updated_at > previous and in_order:
+                    LOGGER.warning("%s: Objects are not listed newest first, reading every page", self.name)
+                    in_order = False
+                previous = updated_at or previous
+                older_page = older_page and bool(updated_at) and updated_at < bookmark
+                yield obj
+            if older_page and in_order:
+                LOGGER.info("%s: Stopping at a page older than the bookmark", self.name)
+                pages.close()
+                return
+
+class OffsetBasedStream(Stream):
+    item_key = None
+    endpoint = None
+
+    def get_objects(self, **kwargs):
+        '''
+        Retrieve objects from endpoints that follow `next_page` links, or aren't paginated at all
+        '''
+        url = self.endpoint.format(self.config['subdomain'])
+        for page in http.get_offset_based(url, self.config['access_token'], self.request_timeout, self.page_size, **kwargs):
+            yield from page[self.item_key]
+
+    def get_changed_objects(self, state):
+        if not self.uses_conditional_requests():
+            return self.get_objects()
+        return self.get_objects_conditionally(state, {'per_page': self.page_size}, http.next_offset_page)
+
+class CheckpointInterval():
+    """
+    Tells when the cursor of an export is due to be checkpointed: once `checkpoint_interval_seconds`
+    have passed or `checkpoint_interval_records` records were read since the last checkpoint,
+    whichever comes first. Either is turned off by setting it to 0.
+    """
+    def __init__(self, config):
+        seconds = config.get('checkpoint_interval_seconds')
+        self.seconds = DEFAULT_CHECKPOINT_INTERVAL_SECONDS if seconds in (None, "") else float(seconds)
+        self.records = int(config.get('checkpoint_interval_records') or 0)
+        self.last_checkpoint = time.monotonic()
+        self.count = 0
+
+    def add(self):
+        self.count += 1
+
+    def due(self):
+        due = ((self.seconds and time.monotonic() - self.last_checkpoint >= self.seconds) or
+               (self.records and self.count >= self.records))
+        if due:
+            self.last_checkpoint = time.monotonic()
+            self.count = 0
+        return bool(due)
+
 class CursorBasedExportStream(Stream):
     endpoint = None
     item_key = None
 
-    def get_objects(self, start_time, side_load=None):
+    def get_objects(self, start_time, side_load=None, cursor=None, page_ends=False):
         '''
         Retrieve objects from the incremental exports endpoint using cursor based pagination
         '''
         url = self.endpoint.format(self.config['subdomain'])
-        # Pass `request_timeout` parameter
-        for page in http.get_incremental_export(url, self.config['access_token'], self.request_timeout, start_time, side_load):
+        # Pass `request_timeout` parameter. Records are yielded as each page is read.
+        yield from http.stream_incremental_export(url, self.config['access_token'], self.request_timeout,
+                                                  start_time, side_load, self.item_key,
+                                                  cursor=cursor, page_ends=page_ends)
+
+    def get_resumable_objects(self, state, side_load=None):
+        '''
+        Retrieve objects from the bookmark, or from the cursor checkpointed by a sync that was
+        interrupted. An `http.ExportPageEnd` follows the objects of each page. A cursor Zendesk
+        no longer accepts, e.g. once it has expired, is dropped and the export starts from the
+        bookmark instead.
+        '''
+        bookmark = self.get_bookmark(state)
+        cursor = singer.get_bookmark(state, self.name, CURSOR_BOOKMARK_KEY)
+        if not cursor:
+            yield from self.get_objects(bookmark, side_load=side_load, cursor=None, page_ends=True)
+            return
+
+        LOGGER.info("Resuming the %s export from the cursor of the interrupted sync", self.name)
+        objects = self.get_objects(bookmark, side_load=side_load, cursor=cursor, page_ends=True)
+        try:
+            first = next(objects)
+        except StopIteration:
+            return
+        except (http.ZendeskBadRequestError, http.ZendeskUnprocessableEntityError) as e:
+            LOGGER.warning("The %s export rejected the cursor of the interrupted sync, starting from the bookmark "
+                           "instead: %s", self.name, e)
+            singer.clear_bookmark(state, self.name, CURSOR_BOOKMARK_KEY)
+            singer.write_state(state)
+            objects = self.get_objects(bookmark, side_load=side_load, cursor=None, page_ends=True)
+        else:
+            yield first
+        yield from objects
+
+    def checkpoint(self, state, page_end, interval):
+        '''
+        Keep where the export continues after a page whose objects have all been emitted, if a
+        checkpoint is due. The cursor is dropped once the export has been read to the end, so the
+        next sync starts from the bookmark again.
+        '''
+        if page_end.end_of_stream:
+            singer.clear_bookmark(state, self.name, CURSOR_BOOKMARK_KEY)
+        elif interval.due():
+            singer.write_bookmark(state, self.name, CURSOR_BOOKMARK_KEY, page_end.after_cursor)
+            singer.write_state(state)
+
+class TimeBasedExportStream(Stream):
+    endpoint = None
+    item_key = None
+
+    def get_objects(self, start_time, side_load=None):
+        '''
+        Retrieve objects from an incremental export endpoint that only supports time based pagination
+        '''
+        url = self.endpoint.format(self.config['subdomain'])
+        for page in http.get_time_based_export(url, self.config['access_token'], self.request_timeout, start_time, side_load):
             yield from page[self.item_key]
 
 
-def raise_or_log_zenpy_apiexception(schema, stream, e):
-    # There are multiple tiers of Zendesk accounts. Some of them have
-    # access to `custom_fields` and some do not. This is the specific
-    # error that appears to be return from the API call in the event that
-    # it doesn't have access.
-    if not isinstance(e, APIException):
-        raise ValueError("Called with a bad exception type") from e
+# A time window of a backfill, as ISO 8601 strings
+BackfillWindow = collections.namedtuple('BackfillWindow', ['start', 'end'])
 
-    #If read permission is not available in OAuth access_token, then it returns the below error.
-    if json.loads(e.args[0]).get('description') == "Missing the following required scopes: read":
-        LOGGER.warning("The account credentials supplied do not have access to `%s` custom fields.",
-                       stream)
-        return schema
-    error = json.loads(e.args[0]).get('error')
-    # check if the error is of type dictionary and the message retrieved from the dictionary
-    # is the expected message. If so, only then print the logger message and return the schema
-    if isinstance(error, dict) and error.get('message', None) == "Access to this resource is restricted. Please contact the account administrator for assistance.":
-        LOGGER.warning("The account credentials supplied do not have access to `%s` custom fields.",
-                       stream)
-        return schema
-    else:
-        raise e
 
+class WindowedExport(Stream, abc.ABC):
+    """
+    Backfill of an incremental export stream in time windows that are exported in parallel.
+
+    A backfill starts when the bookmark is more than a window (`<stream>_backfill_window_days`)
+    behind and `<stream>_backfill_concurrency` is set. The windows still to be exported are kept
+    in the state, and the bookmark only moves to the start of the earliest unfinished window, so
+    a sync that stops part way through only exports the unfinished windows again. Records of a
+    window are in the export's order, but those of different windows are interleaved.
+
+    Streams implement `export_from(start_time)`, their export from `start_time` in epoch
+    seconds, and `record_time(record)`, the epoch time the export is ordered by.
+    """
+
+    @abc.abstractmethod
+    def export_from(self, start_time):
+        """ The records of the export from `start_time`, in epoch seconds, in the export's order """
+
+    @abc.abstractmethod
+    def record_time(self, record):
+        """ The epoch time of `record` the export is ordered by """
+
+    def backfill_concurrency(self):
+        return int(self.config.get('{}_backfill_concurrency'.format(self.name)) or 0)
+
+    def _backfill_windows(self, state, bookmark):
+        """
+        Time windows still to be exported, either those of an unfinished backfill or, when the
+        bookmark is more than a window behind, those from the bookmark to now.
+        """
+        backfill = singer.get_bookmark(state, self.name, BACKFILL_BOOKMARK_KEY)
+        if not self.backfill_concurrency():
+            if backfill:
+                # The bookmark is at the start of the earliest unfinished window, so an
+                # unfinished backfill is simply carried on by the incremental export
+                singer.clear_bookmark(state, self.name, BACKFILL_BOOKMARK_KEY)
+            return []
+
+        if not backfill:
+            window = datetime.timedelta(days=float(self.config.get('{}_backfill_window_days'.format(self.name))
+                                                   or DEFAULT_BACKFILL_WINDOW_DAYS))
+            now = utils.now().replace(microsecond=0)
+            if now - bookmark <= window:
+                return []
+            windows = []
+            start = bookmark
+            while start < now:
+                end = min(start + window, now)
+                windows.append([utils.strftime(start), utils.strftime(end)])
+                start = end
+            backfill = {'end': utils.strftime(now), 'windows': windows}
+            singer.write_bookmark(state, self.name, BACKFILL_BOOKMARK_KEY, backfill)
+            singer.write_state(state)
+        else:
+            LOGGER.info("Resuming the %s backfill up to %s", self.name, backfill['end'])
+
+        LOGGER.info("Backfilling %s in %s time windows...", self.name, len(backfill['windows']))
+        return [BackfillWindow(*window) for window in backfill['windows']]
+
+    def _backfill_records(self, windows):
+        """
+        Export the records of every window in parallel, followed by each window itself once all
+        of its records have been read.
+        """
+        exports = [self._window_records(window) for window in windows]
+        for index, record in http.merge_exports(exports, self.backfill_concurrency()):
+            yield windows[index] if record is http.STREAM_END else record
+
+    def _window_records(self, window):
+        end = utils.strptime_with_tz(window.end).timestamp()
+        start = int(utils.strptime_with_tz(window.start).timestamp())
+        for record in self.export_from(start):
+            # Later records belong to the next window
+            if self.record_time(record) >= end:
+                return
+            yield record
+
+    def _complete_backfill_window(self, state, window):
+        backfill = singer.get_bookmark(state, self.name, BACKFILL_BOOKMARK_KEY)
+        backfill['windows'].remove(list(window))
+        # Every record before the earliest unfinished window has been emitted
+        if backfill['windows']:
+            self.update_bookmark(state, min(start for start, _ in backfill['windows']))
+        else:
+            self.update_bookmark(state, backfill['end'])
+            singer.clear_bookmark(state, self.name, BACKFILL_BOOKMARK_KEY)
+            LOGGER.info("Finished the %s backfill up to %s", self.name, backfill['end'])
+        singer.write_state(state)
+
+    def backfill(self, state, windows):
+        """
+        Emit the records of every window, completing each window as soon as its last record has
+        been emitted.
+        """
+        for record in self._backfill_records(windows):
+            if isinstance(record, BackfillWindow):
+                self._complete_backfill_window(state, record)
+            else:
+                yield (self.stream, record)
 
-class Organizations(Stream):
+
+class Organizations(TimeBasedExportStream):
     name = "organizations"
     replication_method = "INCREMENTAL"
     replication_key = "updated_at"
-    endpoint = 'https://{}.zendesk.com/api/v2/organizations'
+    # NB: Organizations have no cursor based incremental export
+    endpoint = 'https://{}.zendesk.com/api/v2/incremental/organizations.json'
     item_key = 'organizations'
 
     def _add_custom_fields(self, schema):
-        endpoint = self.client.organizations.endpoint
-        # NB: Zenpy doesn't have a public endpoint for this at time of writing
-        #     Calling into underlying query method to grab all fields
-        try:
-            field_gen = self.client.organizations._query_zendesk(endpoint.organization_fields, # pylint: disable=protected-access
-                                                                 'organization_field')
-        except APIException as e:
-            return raise_or_log_zenpy_apiexception(schema, self.name, e)
-        schema['properties']['organization_fields']['properties'] = {}
-        for field in field_gen:
-            schema['properties']['organization_fields']['properties'][field.key] = process_custom_field(field)
-
-        return schema
+        return self._load_custom_fields(schema, 'organization_fields')
 
     def sync(self, state):
         bookmark = self.get_bookmark(state)
-        organizations = self.client.organizations.incremental(start_time=bookmark)
+        organizations = self.get_objects(int(bookmark.timestamp()))
         for organization in organizations:
-            self.update_bookmark(state, organization.updated_at)
+            self.update_bookmark(state, organization['updated_at'])
             yield (self.stream, organization)
 
     def check_access(self):
         '''
         Check whether the permission was given to access stream resources or not.
         '''
-        # Convert datetime object to standard format with timezone. Used utcnow to reduce API call burden at discovery time.
+        url = self.endpoint.format(self.config['subdomain'])
+        # Used the current time to reduce API call burden at discovery time.
         # Because API will return records from now which will be very less
-        start_time = datetime.datetime.utcnow().strftime(START_DATE_FORMAT)
-        self.client.organizations.incremental(start_time=start_time)
+        start_time = int(utils.now().timestamp())
+
+        http.call_api(url, self.request_timeout, params={'start_time': start_time}, headers=request_headers(self.config['access_token']))
 
-class Users(CursorBasedExportStream):
+class Users(WindowedExport, CursorBasedExportStream):
     name = "users"
     replication_method = "INCREMENTAL"
     replication_key = "updated_at"
@@ -236,22 +539,25 @@ class Users(CursorBasedExportStream):
     endpoint = "https://{}.zendesk.com/api/v2/incremental/users/cursor.json"
 
     def _add_custom_fields(self, schema):
-        try:
-            field_gen = self.client.user_fields()
-        except APIException as e:
-            return raise_or_log_zenpy_apiexception(schema, self.name, e)
-        schema['properties']['user_fields']['properties'] = {}
-        for field in field_gen:
-            schema['properties']['user_fields']['properties'][field.key] = process_custom_field(field)
+        return self._load_custom_fields(schema, 'user_fields')
 
-        return schema
+    def export_from(self, start_time):
+        return self.get_objects(start_time)
 
-    def sync(self, state):
-        bookmark = self.get_bookmark(state)
-        epoch_bookmark = int(bookmark.timestamp())
-        users = self.get_objects(epoch_bookmark)
+    def record_time(self, record):
+        return utils.strptime_with_tz(record['updated_at']).timestamp()
 
-        for user in users:
+    def sync(self, state):
+        backfill_windows = self._backfill_windows(state, self.get_bookmark(state))
+        if backfill_windows:
+            yield from self.backfill(state, backfill_windows)
+
+        interval = CheckpointInterval(self.config)
+        for user in self.get_resumable_objects(state):
+            if isinstance(user, http.ExportPageEnd):
+                self.checkpoint(state, user, interval)
+                continue
+            interval.add()
             self.update_bookmark(state, user["updated_at"])
             yield (self.stream, user)
 
@@ -267,7 +573,7 @@ class Users(CursorBasedExportStream):
         start_time = datetime.datetime.utcnow().strftime(START_DATE_FORMAT)
         self.client.search("", updated_after=start_time, updated_before='2000-01-02T00:00:00Z', type="user")
 
-class Tickets(CursorBasedExportStream):
+class Tickets(WindowedExport, CursorBasedExportStream):
     name = "tickets"
     replication_method = "INCREMENTAL"
     replication_key = "generated_timestamp"
@@ -277,10 +583,7 @@ class Tickets(CursorBasedExportStream):
     def sync(self, state): #pylint: disable=too-many-statements
 
         bookmark = self.get_bookmark(state)
-
-        # Fetch tickets with side loaded metrics
-        # https://developer.zendesk.com/documentation/ticketing/using-the-zendesk-api/side_loading/#supported-endpoints
-        tickets = self.get_objects(bookmark, side_load='metric_sets')
+        backfill_windows = self._backfill_windows(state, bookmark)
 
         audits_stream = TicketAudits(self.client, self.config)
         metrics_stream = TicketMetrics(self.client, self.config)
@@ -294,81 +597,138 @@ class Tickets(CursorBasedExportStream):
                                                  tags={'endpoint':sub_stream.stream.tap_stream_id}))
                 sub_stream.count = 0
 
-        if audits_stream.is_selected():
+        audits_source = self.config.get('ticket_audits_source') or AUDITS_SOURCE_PER_TICKET
+        if audits_source not in (AUDITS_SOURCE_PER_TICKET, AUDITS_SOURCE_TICKET_EVENTS):
+            raise ValueError("Unsupported ticket_audits_source '{}', expected '{}' or '{}'".format(
+                audits_source, AUDITS_SOURCE_PER_TICKET, AUDITS_SOURCE_TICKET_EVENTS))
+        per_ticket_audits = audits_source == AUDITS_SOURCE_PER_TICKET
+        events_audits = not per_ticket_audits and (audits_stream.is_selected() or comments_stream.is_selected())
+
+        if audits_stream.is_selected() and per_ticket_audits:
             LOGGER.info("Syncing ticket_audits per ticket...")
+        if events_audits and not singer.get_bookmark(state, audits_stream.name, TICKET_EVENTS_BOOKMARK_KEY):
+            # The tickets export moves the tickets bookmark on, so the events export has to keep
+            # where it starts in case the sync is interrupted before it finishes
+            singer.write_bookmark(state, audits_stream.name, TICKET_EVENTS_BOOKMARK_KEY, utils.strftime(bookmark))
+            singer.write_state(state)
+
+        max_window = int(self.config.get('audit_concurrency') or CONCURRENCY_LIMIT)
+        with http.AsyncSessionRunner(self.config, max_buffered_results=max_window) as async_runner:
+            if backfill_windows:
+                yield from self._sync_tickets(state, self._backfill_records(backfill_windows), audits_stream,
+                                              metrics_stream, comments_stream, async_runner, per_ticket_audits,
+                                              backfill=True)
+
+            # Fetch tickets with side loaded metrics
+            # https://developer.zendesk.com/documentation/ticketing/using-the-zendesk-api/side_loading/#supported-endpoints
+            tickets = self.get_resumable_objects(state, side_load='metric_sets')
+            yield from self._sync_tickets(state, tickets, audits_stream, metrics_stream,
+                                          comments_stream, async_runner, per_ticket_audits)
+
+        if events_audits:
+            LOGGER.info("Syncing ticket_audits and ticket_comments from the ticket events export...")
+            yield from audits_stream.sync_ticket_events(state, bookmark, comments_stream)
 
-        ticket_ids = []
-        counter = 0
-        start_time = time.time()
+        emit_sub_stream_metrics(audits_stream)
+        emit_sub_stream_metrics(metrics_stream)
+        emit_sub_stream_metrics(comments_stream)
+        singer.write_state(state)
+
+    def export_from(self, start_time):
+        return self.get_objects(start_time, side_load='metric_sets')
+
+    def record_time(self, record):
+        return record['generated_timestamp']
+
+    def _sync_tickets(self, state, tickets, audits_stream, metrics_stream, comments_stream, async_runner, per_ticket_audits=True, backfill=False): # pylint: disable=too-many-arguments
+        fetch_audits = per_ticket_audits and (audits_stream.is_selected() or comments_stream.is_selected())
+        # Number of tickets whose audits are fetched at the same time, lowered while Zendesk
+        # reports the quota is running out
+        max_window = int(self.config.get('audit_concurrency') or CONCURRENCY_LIMIT)
+        pending_bookmarks = PendingBookmarks()
+        # Key of a ticket whose audits are being fetched => the ticket's pending bookmark
+        in_flight = {}
+        keys = itertools.count()
+        released = 0
+        interval = CheckpointInterval(self.config)
         for ticket in tickets:
+            if isinstance(ticket, (BackfillWindow, http.ExportPageEnd)):
+                # Every ticket of the window or page has been read. It is complete once they
+                # have all been released.
+                pending_bookmarks.complete(pending_bookmarks.add(ticket))
+                released += self._release_bookmarks(state, pending_bookmarks, interval)
+                continue
+
             zendesk_metrics.capture('ticket')
+            interval.add()
 
             generated_timestamp_dt = datetime.datetime.utcfromtimestamp(ticket.get('generated_timestamp')).replace(tzinfo=pytz.UTC)
-
-            self.update_bookmark(state, utils.strftime(generated_timestamp_dt))
+            # NB: The bookmark only moves past this ticket once its audits and comments, and
+            # those of every ticket before it, have been emitted. Tickets of a backfill arrive
+            # out of order, so the bookmark only moves as whole windows complete.
+            bookmark = pending_bookmarks.add(None if backfill else utils.strftime(generated_timestamp_dt))
 
             ticket.pop('fields') # NB: Fields is a duplicate of custom_fields, remove before emitting
             # yielding stream name with record in a tuple as it is used for obtaining only the parent records while sync
             yield (self.stream, ticket)
 
             # Skip deleted tickets because they don't have audits or comments
-            if ticket.get('status') == 'deleted':
-                continue
+            if ticket.get('status') != 'deleted':
+                if metrics_stream.is_selected() and ticket.get('metric_set'):
+                    zendesk_metrics.capture('ticket_metric')
+                    metrics_stream.count+=1
+                    yield (metrics_stream.stream, ticket["metric_set"])
+
+                if fetch_audits:
+                    key = next(keys)
+                    async_runner.stream(key, audits_stream.sync, ticket["id"], comments_stream)
+                    in_flight[key] = bookmark
+                else:
+                    pending_bookmarks.complete(bookmark)
+            else:
+                pending_bookmarks.complete(bookmark)
+
+            # Keep `window` fetches in flight, emitting each ticket's records as soon as they arrive
+            window = rate_limit.LIMITER.concurrency('ticket_audits', max_window)
+            while len(in_flight) >= window:
+                yield from self._emit_next(async_runner, in_flight, pending_bookmarks)
 
-            if metrics_stream.is_selected() and ticket.get('metric_set'):
-                zendesk_metrics.capture('ticket_metric')
-                metrics_stream.count+=1
-                yield (metrics_stream.stream, ticket["metric_set"])
-
-            # Check if the number of ticket IDs has reached the batch size.
-            ticket_ids.append(ticket["id"])
-            if len(ticket_ids) >= CONCURRENCY_LIMIT:
-                # Process audits and comments in batches
-                records = self.sync_ticket_audits_and_comments(
-                    comments_stream, audits_stream, ticket_ids)
-                for audits, comments in records:
-                    for audit in audits:
-                        yield audit
-                    for comment in comments:
-                        yield comment
-                # Reset the list of ticket IDs after processing the batch.
-                ticket_ids = []
-                # Write state after processing the batch.
+            released += self._release_bookmarks(state, pending_bookmarks, interval)
+            if released >= max_window:
+                # Write state once a window's worth of tickets is complete.
                 singer.write_state(state)
-                counter += CONCURRENCY_LIMIT
-
-                # Check if the number of records processed in a minute has reached the limit.
-                if counter >= AUDITS_REQUEST_PER_MINUTE:
-                    # Calculate elapsed time
-                    elapsed_time = time.time() - start_time
-
-                    # Calculate remaining time until the next minute, plus buffer of 2 more seconds
-                    remaining_time = max(0, 60 - elapsed_time + 2)
-
-                    # Sleep for the calculated time
-                    time.sleep(remaining_time)
-                    start_time = time.time()
-                    counter = 0
-
-        # Check if there are any remaining ticket IDs after the loop.
-        if ticket_ids:
-            records = self.sync_ticket_audits_and_comments(comments_stream, audits_stream, ticket_ids)
-            for audits, comments in records:
-                for audit in audits:
-                    yield audit
-                for comment in comments:
-                    yield comment
+                released = 0
 
-        emit_sub_stream_metrics(audits_stream)
-        emit_sub_stream_metrics(metrics_stream)
-        emit_sub_stream_metrics(comments_stream)
-        singer.write_state(state)
+        # Wait for the remaining fetches after the loop.
+        while in_flight:
+            yield from self._emit_next(async_runner, in_flight, pending_bookmarks)
+        self._release_bookmarks(state, pending_bookmarks, interval)
 
-    def sync_ticket_audits_and_comments(self, comments_stream, audits_stream, ticket_ids):
-        if comments_stream.is_selected() or audits_stream.is_selected():
-            return asyncio.run(audits_stream.sync_in_bulk(ticket_ids, comments_stream))
-        # Return empty list of audits and comments if not selected
-        return [([], [])]
+    @staticmethod
+    def _emit_next(async_runner, in_flight, pending_bookmarks):
+        """
+        Emit the next page of audits and comments to arrive, whichever ticket it belongs to
+        """
+        key, page = async_runner.next_result()
+        if page is http.STREAM_END:
+            pending_bookmarks.complete(in_flight.pop(key))
+            return
+        audits, comments = page
+        yield from audits
+        yield from comments
+
+    def _release_bookmarks(self, state, pending_bookmarks, interval):
+        released = 0
+        for value in pending_bookmarks.pop_completed():
+            if isinstance(value, BackfillWindow):
+                self._complete_backfill_window(state, value)
+            elif isinstance(value, http.ExportPageEnd):
+                # The page's tickets, audits and comments have all been emitted
+                self.checkpoint(state, value, interval)
+            elif value:
+                self.update_bookmark(state, value)
+            released += 1
+        return released
 
     def check_access(self):
         '''
@@ -377,9 +737,71 @@ class Tickets(CursorBasedExportStream):
         url = self.endpoint.format(self.config['subdomain'])
         # Convert start_date parameter to timestamp to pass with request param
         start_time = datetime.datetime.strptime(self.config['start_date'], START_DATE_FORMAT).timestamp()
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
 
-        http.call_api(url, self.request_timeout, params={'start_time': start_time, 'per_page': 1}, headers=HEADERS)
+        http.call_api(url, self.request_timeout, params={'start_time': start_time, 'per_page': 1}, headers=request_headers(self.config['access_token']))
+
+
+class PendingBookmarks():
+    """
+    Bookmark values of tickets in the order they were exported. A value is released by
+    `pop_completed` only once it and every value added before it have been completed, so the
+    bookmark never moves past a ticket whose audits or comments are still being fetched.
+    """
+
+    def __init__(self):
+        self.entries = collections.deque()
+
+    def add(self, value):
+        entry = [value, False]
+        self.entries.append(entry)
+        return entry
+
+    @staticmethod
+    def complete(entry):
+        entry[1] = True
+
+    def pop_completed(self):
+        while self.entries and self.entries[0][1]:
+            yield self.entries.popleft()[0]
+
+
+def audit_from_ticket_event(ticket_event):
+    """
+    Convert an `Audit` event of the ticket events export to the shape of a ticket audit.
+
+    The export names fields differently (`updater_id`, `child_events`, `event_type`), reports
+    `via` as the channel's name rather than an object, and gives a changed field as a key of
+    its own on the child event rather than as `field_name` and `value`.
+    """
+    def to_via(via):
+        return via if isinstance(via, dict) or via is None else {'channel': via}
+
+    metadata_ = dict(ticket_event.get('metadata') or {})
+    if ticket_event.get('system') and 'system' not in metadata_:
+        metadata_['system'] = ticket_event['system']
+
+    events = []
+    for child_event in ticket_event.get('child_events') or []:
+        event = {key: value for key, value in child_event.items() if key not in TICKET_EVENT_ONLY_KEYS}
+        event['type'] = child_event.get('event_type')
+        event['via'] = to_via(child_event.get('via'))
+        event['audit_id'] = ticket_event['id']
+        if event['type'] in ('Create', 'Change') and 'field_name' not in event:
+            changed_fields = [key for key in event if key not in AUDIT_EVENT_KEYS]
+            if len(changed_fields) == 1:
+                event['field_name'] = changed_fields[0]
+                event['value'] = event.pop(changed_fields[0])
+        events.append(event)
+
+    return {
+        'id': ticket_event['id'],
+        'ticket_id': ticket_event['ticket_id'],
+        'created_at': ticket_event['created_at'],
+        'author_id': ticket_event.get('updater_id'),
+        'via': to_via(ticket_event.get('via')),
+        'metadata': metadata_,
+        'events': events,
+    }
 
 
 class TicketAudits(Stream):
@@ -388,60 +810,90 @@ class TicketAudits(Stream):
     count = 0
     endpoint='https://{}.zendesk.com/api/v2/tickets/{}/audits.json'
     item_key='audits'
+    events_endpoint = 'https://{}.zendesk.com/api/v2/incremental/ticket_events.json'
+    events_item_key = 'ticket_events'
 
-    async def sync_in_bulk(self, ticket_ids, comments_stream):
+    async def get_objects(self, session, ticket_id):
         """
-        Asynchronously fetch ticket audits for multiple tickets
+        Yield the ticket audits of a ticket a page at a time
         """
-        # Create an asynchronous HTTP session
-        async with ClientSession() as session:
-            tasks = [self.sync(session, ticket_id, comments_stream)
-                     for ticket_id in ticket_ids]
-            # Run all tasks concurrently and wait for them to complete
-            return await asyncio.gather(*tasks)
-
-    async def get_objects(self, session, ticket_id):
         url = self.endpoint.format(self.config['subdomain'], ticket_id)
         # Fetch the ticket audits using pagination
-        records = await http.paginate_ticket_audits(session, url, self.config['access_token'], self.request_timeout, self.page_size)
-
-        return records[self.item_key]
+        async for page in http.paginate_ticket_audits(session, url, self.config['access_token'], self.request_timeout, self.page_size):
+            yield page[self.item_key]
 
     async def sync(self, session, ticket_id, comments_stream):
         """
         Fetch ticket audits for a single ticket. Also exctract comments for each audit.
+        Yields the audit and comment records of each page of audits as soon as it arrives.
         """
-        audit_records, comment_records = [], []
         try:
             # Fetch ticket audits for the given ticket ID
-            ticket_audits = await self.get_objects(session, ticket_id)
-            for ticket_audit in ticket_audits:
+            async for ticket_audits in self.get_objects(session, ticket_id):
+                audit_records, comment_records = [], []
+                for ticket_audit in ticket_audits:
+                    if self.is_selected():
+                        zendesk_metrics.capture('ticket_audit')
+                        self.count += 1
+                        audit_records.append((self.stream, ticket_audit))
+
+                    if comments_stream.is_selected():
+                        zendesk_metrics.capture('ticket_comments')
+                        for ticket_comment in self.get_comments(ticket_audit, ticket_id):
+                            comments_stream.count += 1
+                            comment_records.append(
+                                (comments_stream.stream, ticket_comment))
+                yield audit_records, comment_records
+        except http.ZendeskNotFoundError:
+            return
+
+    @staticmethod
+    def get_comments(ticket_audit, ticket_id):
+        """
+        Extract the comments of a ticket audit
+        """
+        for event in ticket_audit['events']:
+            if event['type'] == 'Comment':
+                # Update the comment with additional information
+                event.update({
+                    'created_at': ticket_audit['created_at'],
+                    'via': ticket_audit['via'],
+                    'metadata': ticket_audit['metadata'],
+                    'ticket_id': ticket_id
+                })
+                yield event
+
+    def sync_ticket_events(self, state, start, comments_stream):
+        """
+        Build ticket audits and their comments from the ticket events export, which returns
+        the audits of many tickets per page, instead of fetching the audits of each ticket.
+        The export has a bookmark of its own, starting from the tickets bookmark `start`.
+        """
+        bookmark = singer.get_bookmark(state, self.name, TICKET_EVENTS_BOOKMARK_KEY)
+        start_time = utils.strptime_with_tz(bookmark) if bookmark else start
+        url = self.events_endpoint.format(self.config['subdomain'])
+
+        for page in http.get_time_based_export(url, self.config['access_token'], self.request_timeout,
+                                               int(start_time.timestamp()), 'comment_events'):
+            for ticket_event in page[self.events_item_key]:
+                if ticket_event.get('event_type') != 'Audit':
+                    continue
+                ticket_audit = audit_from_ticket_event(ticket_event)
                 if self.is_selected():
                     zendesk_metrics.capture('ticket_audit')
                     self.count += 1
-                    audit_records.append((self.stream, ticket_audit))
+                    yield (self.stream, ticket_audit)
 
                 if comments_stream.is_selected():
-                    # Extract comments from ticket audit
-                    ticket_comments = (
-                        event for event in ticket_audit['events'] if event['type'] == 'Comment')
                     zendesk_metrics.capture('ticket_comments')
-                    for ticket_comment in ticket_comments:
-                        # Update the comment with additional information
-                        ticket_comment.update({
-                            'created_at': ticket_audit['created_at'],
-                            'via': ticket_audit['via'],
-                            'metadata': ticket_audit['metadata'],
-                            'ticket_id': ticket_id
-                        })
-
+                    for ticket_comment in self.get_comments(ticket_audit, ticket_audit['ticket_id']):
                         comments_stream.count += 1
-                        comment_records.append(
-                            (comments_stream.stream, ticket_comment))
-        except http.ZendeskNotFoundError:
-            return audit_records, comment_records
+                        yield (comments_stream.stream, ticket_comment)
 
-        return audit_records, comment_records
+            if page.get('end_time'):
+                end_time = datetime.datetime.utcfromtimestamp(page['end_time']).replace(tzinfo=pytz.UTC)
+                singer.write_bookmark(state, self.name, TICKET_EVENTS_BOOKMARK_KEY, utils.strftime(end_time))
+                singer.write_state(state)
 
     def check_access(self):
         '''
@@ -449,9 +901,8 @@ class TicketAudits(Stream):
         '''
 
         url = self.endpoint.format(self.config['subdomain'], '1')
-        HEADERS['Authorization'] = 'Bearer {}'.format(self.config["access_token"])
         try:
-            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=HEADERS)
+            http.call_api(url, self.request_timeout, params={'per_page': 1}, headers=request_headers(self.config['access_token']))
         except http.ZendeskNotFoundError:
             #Skip 404 ZendeskNotFoundError error as goal is just to check whether TicketComments have read permission or not
             pass
@@ -468,30 +919,45 @@ class TicketMetrics(CursorBasedStream):
         # We load metrics as side load of tickets, so we don't need to check access
         return
 
-class TicketMetricEvents(Stream):
+class TicketMetricEvents(WindowedExport, TimeBasedExportStream):
     name = "ticket_metric_events"
     replication_method = "INCREMENTAL"
     replication_key = "time"
+    item_key = "ticket_metric_events"
+    endpoint = "https://{}.zendesk.com/api/v2/incremental/ticket_metric_events.json"
     count = 0
 
+    def export_from(self, start_time):
+        return self.get_objects(start_time)
+
+    def record_time(self, record):
+        return utils.strptime_with_tz(record['time']).timestamp()
+
     def sync(self, state):
+        backfill_windows = self._backfill_windows(state, self.get_bookmark(state))
+        if backfill_windows:
+            for record in self.backfill(state, backfill_windows):
+                self.count += 1
+                yield record
+
         bookmark = self.get_bookmark(state)
         start = bookmark - datetime.timedelta(seconds=1)
 
         epoch_start = int(start.timestamp())
         parsed_start = singer.strftime(start, "%Y-%m-%dT%H:%M:%SZ")
-        ticket_metric_events = self.client.tickets.metrics_incremental(start_time=epoch_start)
+        ticket_metric_events = self.get_objects(epoch_start)
         for event in ticket_metric_events:
             self.count += 1
-            if bookmark < utils.strptime_with_tz(event.time):
-                self.update_bookmark(state, event.time)
-            if parsed_start <= event.time:
+            if bookmark < utils.strptime_with_tz(event['time']):
+                self.update_bookmark(state, event['time'])
+            if parsed_start <= event['time']:
                 yield (self.stream, event)
 
     def check_access(self):
+        url = self.endpoint.format(self.config['subdomain'])
         try:
             epoch_start = int(utils.now().timestamp())
-            self.client.tickets.metrics_incremental(start_time=epoch_start)
+            http.call_api(url, self.request_timeout, params={'start_time': epoch_start}, headers=request_headers(self.config['access_token']))
         except http.ZendeskNotFoundError:
             #Skip 404 ZendeskNotFoundError error as goal is just to check whether TicketComments have read permission or not
             pass
@@ -508,39 +974,23 @@ class TicketComments(Stream):
         # We load comments as side load of ticket_audits, so we don't need to check access
         return
 
-class TalkPhoneNumbers(Stream):
+class TalkPhoneNumbers(OffsetBasedStream):
     name = 'talk_phone_numbers'
     replication_method = "FULL_TABLE"
+    endpoint = 'https://{}.zendesk.com/api/v2/channels/voice/phone_numbers.json'
+    item_key = 'phone_numbers'
     is_optional = True
 
     def sync(self, state): # pylint: disable=unused-argument
-        for phone_number in self.client.talk.phone_numbers():
+        for phone_number in self.get_objects():
             yield (self.stream, phone_number)
 
     def check_access(self):
         try:
-            self.client.talk.phone_numbers()
+            super().check_access()
         except http.ZendeskNotFoundError:
             # Skip 404 as goal is to check whether TalkPhoneNumbers have read permission
             pass
-        except requests.exceptions.HTTPError as e:
-            # Zenpy's Talk API raises requests.HTTPError directly for certain HTTP errors.
-            # Convert 403 Forbidden to ZendeskForbiddenError for consistent handling in discover.py.
-            if e.response is not None and e.response.status_code == 403:
-                raise http.ZendeskForbiddenError(str(e)) from None
-            raise
-        except APIException as e:
-            # Handle Zenpy APIException 403 with various message formats
-            try:
-                args0 = json.loads(e.args[0])
-                err = args0.get('error')
-                description = args0.get('description', '')
-            except (json.JSONDecodeError, ValueError, IndexError) as exc:
-                raise e from exc
-            if (isinstance(err, dict) and err.get('message') == "Access to this resource is restricted. Please contact the account administrator for assistance.") \
-                    or description == "Missing the following required scopes: read":
-                raise http.ZendeskForbiddenError(str(e)) from None
-            raise
 
 class SatisfactionRatings(CursorBasedStream):
     name = "satisfaction_ratings"
@@ -567,11 +1017,12 @@ class Groups(CursorBasedStream):
     replication_key = "updated_at"
     endpoint = 'https://{}.zendesk.com/api/v2/groups'
     item_key = 'groups'
+    newest_first_params = {'sort': '-updated_at'}
 
     def sync(self, state):
         bookmark = self.get_bookmark(state)
 
-        groups = self.get_objects()
+        groups = self.get_updated_objects(state)
         for group in groups:
             if utils.strptime_with_tz(group['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
@@ -586,11 +1037,13 @@ class Macros(CursorBasedStream):
     replication_key = "updated_at"
     endpoint = 'https://{}.zendesk.com/api/v2/macros'
     item_key = 'macros'
+    supports_conditional_requests = True
+    newest_first_params = {'sort_by': 'updated_at', 'sort_order': 'desc'}
 
     def sync(self, state):
         bookmark = self.get_bookmark(state)
 
-        macros = self.get_objects()
+        macros = self.get_updated_objects(state)
         for macro in macros:
             if utils.strptime_with_tz(macro['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
@@ -605,9 +1058,10 @@ class Tags(CursorBasedStream):
     key_properties = ["name"]
     endpoint = 'https://{}.zendesk.com/api/v2/tags'
     item_key = 'tags'
+    supports_conditional_requests = True
 
-    def sync(self, state): # pylint: disable=unused-argument
-        tags = self.get_objects()
+    def sync(self, state):
+        tags = self.get_changed_objects(state)
 
         for tag in tags:
             yield (self.stream, tag)
@@ -618,11 +1072,13 @@ class TicketFields(CursorBasedStream):
     replication_key = "updated_at"
     endpoint = 'https://{}.zendesk.com/api/v2/ticket_fields'
     item_key = 'ticket_fields'
+    supports_conditional_requests = True
 
     def sync(self, state):
         bookmark = self.get_bookmark(state)
 
-        fields = self.get_objects()
+        # NB: Ticket fields can't be listed by `updated_at`, so every page is read
+        fields = self.get_updated_objects(state)
         for field in fields:
             if utils.strptime_with_tz(field['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
@@ -631,53 +1087,38 @@ class TicketFields(CursorBasedStream):
                 self.update_bookmark(state, field['updated_at'])
                 yield (self.stream, field)
 
-class TicketForms(Stream):
+class TicketForms(OffsetBasedStream):
     name = "ticket_forms"
     replication_method = "INCREMENTAL"
     replication_key = "updated_at"
+    endpoint = 'https://{}.zendesk.com/api/v2/ticket_forms'
+    item_key = 'ticket_forms'
+    supports_conditional_requests = True
     is_optional = True
 
     def sync(self, state):
         bookmark = self.get_bookmark(state)
 
-        forms = self.client.ticket_forms()
+        forms = self.get_changed_objects(state)
         for form in forms:
-            if utils.strptime_with_tz(form.updated_at) >= bookmark:
+            if utils.strptime_with_tz(form['updated_at']) >= bookmark:
                 # NB: We don't trust that the records come back ordered by
                 # updated_at (we've observed out-of-order records),
                 # so we can't save state until we've seen all records
-                self.update_bookmark(state, form.updated_at)
+                self.update_bookmark(state, form['updated_at'])
                 yield (self.stream, form)
 
-    def check_access(self):
-        '''
-        Check whether the permission was given to access stream resources or not.
-        '''
-        try:
-            self.client.ticket_forms()
-        except APIException as e:
-            try:
-                args0 = json.loads(e.args[0])
-                err = args0.get('error')
-                description = args0.get('description', '')
-            except (json.JSONDecodeError, ValueError, IndexError) as exc:
-                raise e from exc
-            if (isinstance(err, dict) and err.get('message') == "Access to this resource is restricted. Please contact the account administrator for assistance.") \
-                    or description == "Missing the following required scopes: read":
-                raise http.ZendeskForbiddenError(str(e)) from None
-            raise
-
 class GroupMemberships(CursorBasedStream):
     name = "group_memberships"
     replication_method = "INCREMENTAL"
     replication_key = "updated_at"
     endpoint = 'https://{}.zendesk.com/api/v2/group_memberships'
     item_key = 'group_memberships'
-
+    newest_first_params = {'sort': '-updated_at'}
 
     def sync(self, state):
         bookmark = self.get_bookmark(state)
-        memberships = self.get_objects()
+        memberships = self.get_updated_objects(state)
 
         for membership in memberships:
             # some group memberships come back without an updated_at
@@ -696,33 +1137,18 @@ class GroupMemberships(CursorBasedStream):
                 else:
                     LOGGER.info('Received group_membership record with no id or updated_at, skipping...')
 
-class SLAPolicies(Stream):
+class SLAPolicies(OffsetBasedStream):
     name = "sla_policies"
     replication_method = "FULL_TABLE"
+    endpoint = 'https://{}.zendesk.com/api/v2/slas/policies'
+    item_key = 'sla_policies'
+    supports_conditional_requests = True
     is_optional = True
 
-    def sync(self, state): # pylint: disable=unused-argument
-        for policy in self.client.sla_policies():
+    def sync(self, state):
+        for policy in self.get_changed_objects(state):
             yield (self.stream, policy)
 
-    def check_access(self):
-        '''
-        Check whether the permission was given to access stream resources or not.
-        '''
-        try:
-            self.client.sla_policies()
-        except APIException as e:
-            try:
-                args0 = json.loads(e.args[0])
-                err = args0.get('error')
-                description = args0.get('description', '')
-            except (json.JSONDecodeError, ValueError, IndexError) as exc:
-                raise e from exc
-            if (isinstance(err, dict) and err.get('message') == "Access to this resource is restricted. Please contact the account administrator for assistance.") \
-                    or description == "Missing the following required scopes: read":
-                raise http.ZendeskForbiddenError(str(e)) from None
-            raise
-
 STREAMS = {
     "tickets": Tickets,
     "groups": Groups,
@@ -1,4 +1,5 @@
 import json
+from datetime import date, datetime
 from zenpy.lib.api_objects import BaseObject
 from zenpy.lib.proxy import ProxyList
 
@@ -6,14 +7,66 @@ import singer
 from singer import metrics
 from singer import metadata
 from singer import Transformer
+from tap_zendesk import profiling
+from tap_zendesk.transform import TransformPlan
 
 LOGGER = singer.get_logger()
 
+# Attributes Zenpy keeps on every object for its own dirty tracking
+ZENPY_INTERNAL_ATTRIBUTES = frozenset(('api', '_dirty_attributes', '_always_dirty', '_dirty_callback', '_dirty'))
+PLAIN_TYPES = (str, int, float, bool, type(None))
+
+# Zenpy class => {attribute name => output key, or None if the attribute is dropped}
+_ZENPY_LAYOUTS = {}
+
+def _output_key(layout, key):
+    if key in ZENPY_INTERNAL_ATTRIBUTES:
+        out_key = None
+    # Zenpy prefixes reserved words with an underscore, remove it here.
+    elif key.startswith('_'):
+        out_key = key[1:]
+    else:
+        out_key = key
+    layout[key] = out_key
+    return out_key
+
+def zenpy_to_dict(obj):
+    """ Converts a Zenpy object into a plain dict, the same way `BaseObject.to_dict` followed by
+    ZendeskEncoder would, without serializing it to JSON. """
+    layout = _ZENPY_LAYOUTS.setdefault(type(obj), {})
+    obj_dict = {}
+    for key, value in vars(obj).items():
+        try:
+            out_key = layout[key]
+        except KeyError:
+            out_key = _output_key(layout, key)
+        if out_key is None or callable(value):
+            continue
+        obj_dict[out_key] = to_plain(value)
+    return obj_dict
+
+def to_plain(value):
+    """ Recursively converts Zenpy objects and proxies into plain Python values. """
+    if isinstance(value, PLAIN_TYPES):
+        return value
+    if isinstance(value, BaseObject):
+        return zenpy_to_dict(value)
+    # ProxyDict and ProxyList subclass dict and list
+    if isinstance(value, dict):
+        return {str(k): to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    if isinstance(value, date):
+        # Zenpy prints datetimes as their date component
+        return (value.date() if isinstance(value, datetime) else value).isoformat()
+    return json.loads(json.dumps(value, cls=ZendeskEncoder))
+
 def process_record(record):
-    """ Serializes Zenpy's internal classes into Python objects via ZendeskEncoder. """
-    rec_str = json.dumps(record, cls=ZendeskEncoder)
-    rec_dict = json.loads(rec_str)
-    return rec_dict
+    """ Converts Zenpy's internal classes into plain Python objects. Records which are
+    already plain dicts, as returned by the direct HTTP streams, are passed through as-is. """
+    if type(record) is dict: # pylint: disable=unidiomatic-typecheck
+        return record
+    return to_plain(record)
 
 def sync_stream(state, start_date, instance):
     stream = instance.stream
@@ -27,17 +80,27 @@ def sync_stream(state, start_date, instance):
                               start_date)
 
     parent_stream = stream
+    # tap_stream_id => transform of the TransformPlan compiled on the first record of each (sub-)stream
+    transforms = {}
+    # Each stage is timed when profiling, otherwise these are the functions themselves
+    convert = profiling.timed('convert', process_record)
+    write_record = profiling.timed('write', singer.write_record)
     with metrics.record_counter(stream.tap_stream_id) as counter, Transformer() as transformer:
-        for (stream, record) in instance.sync(state):
+        for (stream, record) in profiling.timed_iter('read', instance.sync(state)):
             # NB: Only count parent records in the case of sub-streams
             if stream.tap_stream_id == parent_stream.tap_stream_id:
                 counter.increment()
 
-            rec = process_record(record)
+            transform = transforms.get(stream.tap_stream_id)
+            if transform is None:
+                plan = TransformPlan(stream.schema.to_dict(), metadata.to_map(stream.metadata), transformer)
+                transform = transforms[stream.tap_stream_id] = profiling.timed('transform', plan.transform)
+
+            rec = convert(record)
             # SCHEMA_GEN: Comment out transform
-            rec = transformer.transform(rec, stream.schema.to_dict(), metadata.to_map(stream.metadata))
+            rec = transform(rec)
 
-            singer.write_record(stream.tap_stream_id, rec)
+            write_record(stream.tap_stream_id, rec)
             # NB: We will only write state at the end of a stream's sync:
             #  We may find out that there exists a sync that takes too long and can never emit a bookmark
             #  but we don't know if we can guarentee the order of emitted records.
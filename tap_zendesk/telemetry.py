@@ -0,0 +1,139 @@
+import bisect
+import re
+import threading
+from collections.abc import Mapping
+from urllib.parse import urlsplit
+import singer
+
+LOGGER = singer.get_logger()
+
+# A request to each endpoint is logged once every this many requests to it
+DEFAULT_REQUEST_LOG_INTERVAL = 100
+# Upper bounds (in milliseconds) of the buckets of the latency histograms, the last one is open
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# Ids, such as ticket ids, are replaced in the endpoint a request is counted under
+ID_RE = re.compile(r'/\d+(?=/|\.json|$)')
+
+
+def endpoint_template(url):
+    """ The path of `url` with its ids replaced, e.g. `/api/v2/tickets/{id}/audits.json` """
+    if not url:
+        return 'unknown'
+    return ID_RE.sub('/{id}', urlsplit(str(url)).path) or '/'
+
+
+class EndpointStats(): # pylint: disable=too-many-instance-attributes
+    """ What the requests to one endpoint cost, with their latencies counted in `LATENCY_BUCKETS`. """
+    __slots__ = ('requests', 'errors', 'rate_limited', 'retries', 'backoff_seconds', 'bytes',
+                 'latency_seconds', 'max_latency', 'latencies')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.bytes = 0
+        self.latency_seconds = 0.0
+        self.max_latency = 0.0
+        self.latencies = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add_request(self, seconds, status):
+        self.requests += 1
+        if status == 429:
+            self.rate_limited += 1
+        elif status >= 400:
+            self.errors += 1
+        self.latency_seconds += seconds
+        self.max_latency = max(self.max_latency, seconds)
+        self.latencies[bisect.bisect_left(LATENCY_BUCKETS, seconds * 1000)] += 1
+
+    def latency_percentile(self, percent):
+        """ The upper bound of the bucket holding the `percent`th percentile latency, in milliseconds """
+        rank = self.requests * percent / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latencies):
+            seen += count
+            if seen >= rank:
+                return bound
+        return round(self.max_latency * 1000)
+
+
+class Telemetry():
+    """
+    Counts the requests, response bytes, retries, backoff and 429s of each endpoint, for every
+    request the tap makes, whether through Zenpy, `http.request_json` or `http.call_api_async`.
+    Requests are logged once every `request_log_interval` requests to an endpoint, and every
+    endpoint is summed up by `log_summary()`.
+    """
+    def __init__(self, request_log_interval=DEFAULT_REQUEST_LOG_INTERVAL):
+        self.request_log_interval = request_log_interval
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(int(config.get('http_request_log_interval') or DEFAULT_REQUEST_LOG_INTERVAL))
+
+    def _stats(self, url):
+        endpoint = endpoint_template(url)
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+        return stats
+
+    def record_request(self, url, seconds, status, response_bytes, headers=None): # pylint: disable=too-many-arguments
+        """ Counts a response to `url` received `seconds` after sending the request. """
+        with self.lock:
+            stats = self._stats(url)
+            stats.add_request(seconds, status)
+            stats.bytes += response_bytes
+            requests = stats.requests
+        if (requests - 1) % self.request_log_interval == 0:
+            if not isinstance(headers, Mapping):
+                headers = {}
+            LOGGER.info("Request: %s, Response ETag: %s, Request Id: %s (request %s to %s)",
+                        url,
+                        headers.get('ETag', 'Not present'),
+                        headers.get('X-Request-Id', 'Not present'),
+                        requests,
+                        endpoint_template(url))
+
+    def record_bytes(self, url, response_bytes):
+        """ Counts the bytes of a response body read after it was recorded, such as a streamed one. """
+        with self.lock:
+            self._stats(url).bytes += response_bytes
+
+    def record_backoff(self, url, seconds, retry=True):
+        """ Counts `seconds` spent waiting to retry a request to `url`, and the retry unless `retry` is False. """
+        with self.lock:
+            stats = self._stats(url)
+            stats.retries += 1 if retry else 0
+            stats.backoff_seconds += seconds
+
+    def log_summary(self):
+        with self.lock:
+            endpoints = sorted(self.endpoints.items(), key=lambda item: item[1].latency_seconds, reverse=True)
+            for endpoint, stats in endpoints:
+                LOGGER.info("HTTP %s: %s requests in %.1f seconds, latency p50 <= %sms, p95 <= %sms, max %.0fms, "
+                            "%s bytes, %s errors, %s 429s, %s retries after %.1f seconds of backoff",
+                            endpoint, stats.requests, stats.latency_seconds,
+                            stats.latency_percentile(50), stats.latency_percentile(95), stats.max_latency * 1000,
+                            stats.bytes, stats.errors, stats.rate_limited, stats.retries, stats.backoff_seconds)
+
+
+def backoff_handler(url_position):
+    """ An `on_backoff` handler counting the retries of a function whose url is its `url_position`th argument """
+    def on_backoff(details):
+        args = details['args']
+        url = args[url_position] if len(args) > url_position else details['kwargs'].get('url')
+        TELEMETRY.record_backoff(url, details['wait'])
+    return on_backoff
+
+
+TELEMETRY = Telemetry()
+
+
+def configure(config):
+    global TELEMETRY # pylint: disable=global-statement
+    TELEMETRY = Telemetry.from_config(config)
@@ -0,0 +1,244 @@
+import copy
+import datetime
+import re
+from singer import metadata
+from singer.transform import breadcrumb_path, NO_INTEGER_DATETIME_PARSING
+
+# Marker returned by a type handler when the value does not match the type
+NO_MATCH = object()
+
+
+def materialize_path(path):
+    """ Expands a (parent, key) linked path into the list singer's Transformer reports. """
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(key)
+    keys.reverse()
+    return keys
+
+
+# The format Zendesk returns timestamps in, e.g. 2023-01-01T00:00:00Z
+ZENDESK_DATETIME_RE = re.compile(r'([1-9]\d{3})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)Z')
+
+
+def fast_datetime(value):
+    """ Returns the singer-formatted datetime for a UTC Zendesk timestamp, or None when the value
+    needs singer's full parser. """
+    match = ZENDESK_DATETIME_RE.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        return None
+    try:
+        datetime.datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+    return value[:-1] + ".000000Z"
+
+
+def _null(data):
+    if data is None or data == "":
+        return None
+    return NO_MATCH
+
+
+def _string(data):
+    if data is None:
+        return NO_MATCH
+    try:
+        return str(data)
+    except Exception: # pylint: disable=broad-except
+        return NO_MATCH
+
+
+def _integer(data):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return int(data)
+    except Exception: # pylint: disable=broad-except
+        return NO_MATCH
+
+
+def _number(data):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return float(data)
+    except Exception: # pylint: disable=broad-except
+        return NO_MATCH
+
+
+def _boolean(data):
+    if isinstance(data, str) and data.lower() == "false":
+        return False
+    try:
+        return bool(data)
+    except Exception: # pylint: disable=broad-except
+        return NO_MATCH
+
+
+SCALAR_HANDLERS = {
+    'null': _null,
+    'string': _string,
+    'integer': _integer,
+    'number': _number,
+    'boolean': _boolean,
+}
+
+
+class TransformPlan():
+    """
+    A stream's schema and metadata compiled once into a tree of closures.
+
+    Applying the plan to a record gives the same output and `removed`/`filtered` paths as
+    `singer.Transformer.transform(record, schema, metadata)`, without walking the schema dict
+    again for every record. Parts of the schema the plan does not specialise (anyOf,
+    patternProperties, singer.decimal) are handed to the Transformer, as are records that do not
+    match the schema so that the SchemaMismatch raised is the Transformer's own.
+    """
+
+    def __init__(self, schema, mdata, transformer):
+        self.transformer = transformer
+        self.mdata = mdata
+        # The Transformer reorders types in the schema it is given, so keep a pristine copy
+        self.schema = copy.deepcopy(schema)
+        # Nested metadata is rare enough that singer's own filter handles it
+        self.nested_metadata = any(len(breadcrumb) > 2 for breadcrumb in mdata)
+        self.filtered_fields = {}
+        for breadcrumb in mdata:
+            if len(breadcrumb) != 2:
+                continue
+            inclusion = metadata.get(mdata, breadcrumb, 'inclusion')
+            if inclusion == 'automatic':
+                continue
+            if metadata.get(mdata, breadcrumb, 'selected') is False or inclusion == 'unsupported':
+                self.filtered_fields[breadcrumb[1]] = breadcrumb_path(breadcrumb)
+        self.root = self._compile(schema)
+
+    def transform(self, data):
+        data = self._filter(data)
+        value = self.root(data, None)
+        if value is NO_MATCH:
+            # Let singer's Transformer report the mismatch
+            return self.transformer.transform(data, copy.deepcopy(self.schema), self.mdata)
+        return value
+
+    def _filter(self, data):
+        if self.nested_metadata:
+            return self.transformer.filter_data_by_metadata(data, self.mdata)
+        if self.filtered_fields and isinstance(data, dict):
+            for field_name, path in self.filtered_fields.items():
+                if field_name in data:
+                    data.pop(field_name)
+                    self.transformer.filtered.add(path)
+        return data
+
+    def _delegate(self, schema):
+        """ Falls back to singer's Transformer for this part of the schema. """
+        transformer = self.transformer
+
+        def node(data, path):
+            success, value = transformer.transform_recur(data, schema, materialize_path(path))
+            return value if success else NO_MATCH
+        return node
+
+    def _compile(self, schema):
+        if "anyOf" in schema:
+            return self._delegate(schema)
+
+        if "type" not in schema:
+            # No typing information so the value passes through untouched
+            return lambda data, path: data
+
+        types = schema["type"]
+        if not isinstance(types, list):
+            types = [types]
+        # 'null' is always tried last
+        types = [typ for typ in types if typ != "null"] + (["null"] if "null" in types else [])
+
+        handlers = [self._compile_type(typ, schema) for typ in types]
+        if len(handlers) == 1:
+            return handlers[0]
+
+        def union_node(data, path):
+            for handler in handlers:
+                value = handler(data, path)
+                if value is not NO_MATCH:
+                    return value
+            return NO_MATCH
+        return union_node
+
+    def _compile_type(self, typ, schema):
+        if typ == "null":
+            return lambda data, path: _null(data)
+
+        if schema.get("format") == "date-time":
+            transform_datetime = self.transformer._transform_datetime # pylint: disable=protected-access
+            parse_fast = self.transformer.integer_datetime_fmt == NO_INTEGER_DATETIME_PARSING
+
+            def datetime_handler(data, path): # pylint: disable=unused-argument
+                value = (parse_fast and fast_datetime(data)) or transform_datetime(data)
+                return NO_MATCH if value is None else value
+            return datetime_handler
+
+        if (schema.get("format") == "singer.decimal" or schema.get("patternProperties")
+                or typ not in SCALAR_HANDLERS and typ not in ("object", "array")):
+            transform = self.transformer._transform # pylint: disable=protected-access
+
+            def generic_handler(data, path):
+                success, value = transform(data, typ, schema, materialize_path(path))
+                return value if success else NO_MATCH
+            return generic_handler
+
+        if typ == "object":
+            return self._compile_object(schema.get("properties", {}))
+
+        if typ == "array":
+            return self._compile_array(schema["items"])
+
+        handler = SCALAR_HANDLERS[typ]
+        return lambda data, path: handler(data)
+
+    def _compile_object(self, properties):
+        if properties == {}:
+            # Don't touch an empty schema
+            return lambda data, path: data if isinstance(data, dict) else NO_MATCH
+
+        children = {key: self._compile(sub_schema) for key, sub_schema in properties.items()}
+        removed = self.transformer.removed
+
+        def object_handler(data, path):
+            if not isinstance(data, dict):
+                return NO_MATCH
+            result = {}
+            success = True
+            for key, value in data.items():
+                child = children.get(key)
+                if child is None:
+                    # Not in the schema, tracked the same way singer's Transformer does
+                    removed.add(".".join(map(str, materialize_path((path, key)))))
+                    continue
+                value = child(value, (path, key))
+                if value is NO_MATCH:
+                    success = False
+                    value = None
+                result[key] = value
+            return result if success else NO_MATCH
+        return object_handler
+
+    def _compile_array(self, items):
+        child = self._compile(items)
+
+        def array_handler(data, path):
+            if not isinstance(data, list):
+                return NO_MATCH
+            result = []
+            success = True
+            for i, row in enumerate(data):
+                value = child(row, (path, i))
+                if value is NO_MATCH:
+                    success = False
+                    value = None
+                result.append(value)
+            return result if success else NO_MATCH
+        return array_handler
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 import asyncio
@@ -21,7 +23,7 @@ class TestASyncTicketAudits(unittest.TestCase):
 
         # Mock the responses for get_objects
         async def mock_get_objects(session, ticket_id):
-            return [
+            yield [
                 {
                     "id": ticket_id,
                     "events": [{"type": "Comment", "id": f"comment_{ticket_id}"}],
@@ -40,9 +42,10 @@ class TestASyncTicketAudits(unittest.TestCase):
                 streams.TicketAudits, "get_objects", side_effect=mock_get_objects
             ):
                 async with ClientSession() as session:
-                    audit_records, comment_records = await instance.sync(
+                    pages = [page async for page in instance.sync(
                         session, ticket_id, comments_stream
-                    )
+                    )]
+                    [(audit_records, comment_records)] = pages
 
                     # Assertions
                     self.assertEqual(len(audit_records), 1)
@@ -73,7 +76,7 @@ class TestASyncTicketAudits(unittest.TestCase):
 
         # Mock the responses for get_objects
         async def mock_get_objects(session, ticket_id):
-            return [
+            yield [
                 {
                     "id": ticket_id,
                     "events": [{"type": "Comment", "id": f"comment_{ticket_id}"}],
@@ -91,9 +94,10 @@ class TestASyncTicketAudits(unittest.TestCase):
                 streams.TicketAudits, "get_objects", side_effect=mock_get_objects
             ):
                 async with ClientSession() as session:
-                    audit_records, comment_records = await instance.sync(
+                    pages = [page async for page in instance.sync(
                         session, ticket_id, comments_stream
-                    )
+                    )]
+                    [(audit_records, comment_records)] = pages
 
                     # Assertions
                     self.assertEqual(len(audit_records), 0)
@@ -114,7 +118,7 @@ class TestASyncTicketAudits(unittest.TestCase):
 
         # Mock the responses for get_objects
         async def mock_get_objects(session, ticket_id):
-            return [
+            yield [
                 {
                     "id": ticket_id,
                     "events": [{"type": "Comment", "id": f"comment_{ticket_id}"}],
@@ -133,9 +137,10 @@ class TestASyncTicketAudits(unittest.TestCase):
                 streams.TicketAudits, "get_objects", side_effect=mock_get_objects
             ):
                 async with ClientSession() as session:
-                    audit_records, comment_records = await instance.sync(
+                    pages = [page async for page in instance.sync(
                         session, ticket_id, comments_stream
-                    )
+                    )]
+                    [(audit_records, comment_records)] = pages
 
                     # Assertions
                     self.assertEqual(len(audit_records), 1)
@@ -187,7 +192,8 @@ class TestASyncTicketAudits(unittest.TestCase):
         # Assertions
         self.assertEqual(len(result), 2)
 
-    @patch('tap_zendesk.streams.time.sleep')
+    @patch("tap_zendesk.streams.TicketAudits.sync")
+    @patch("tap_zendesk.streams.TicketAudits.stream", MagicMock(tap_stream_id="ticket_audits"))
     @patch("tap_zendesk.streams.Tickets.update_bookmark")
     @patch("tap_zendesk.streams.Tickets.get_bookmark")
     @patch("tap_zendesk.streams.Tickets.get_objects")
@@ -204,10 +210,10 @@ class TestASyncTicketAudits(unittest.TestCase):
         mock_get_objects,
         mock_get_bookmark,
         mock_update_bookmark,
-        mock_sleep
+        mock_audits_sync
     ):
         """
-        Test that sync does not extract records for audits and comments when both of them are not selected.
+        Test that sync does not fetch audits and comments for deleted tickets.
         """
         # Mock the necessary data
         state = {}
@@ -220,25 +226,27 @@ class TestASyncTicketAudits(unittest.TestCase):
         ]
         mock_get_bookmark.return_value = bookmark
         mock_get_objects.return_value = tickets
-        streams.AUDITS_REQUEST_PER_MINUTE = 4
-        streams.CONCURRENCY_LIMIT = 2
+
+        async def mock_audits(session, ticket_id, comments_stream):
+            yield ([("ticket_audits", {"ticket_id": ticket_id})] * ticket_id,
+                   [("ticket_comments", {"ticket_id": ticket_id})])
+        mock_audits_sync.side_effect = mock_audits
 
         # Create an instance of the Tickets class
-        instance = streams.Tickets(None, {})
-        instance.sync_ticket_audits_and_comments = MagicMock(return_value=[
-            (['audit1', 'audit2'], ['comment1', 'comment2']),
-            (['audit3'], ['comment3']),
-        ])
+        instance = streams.Tickets(None, {"audit_concurrency": 2})
 
         # Run the sync method
         result = list(instance.sync(state))
 
         # Assertions
-        self.assertEqual(mock_write_state.call_count, 2)
-        # 4 tickets, 3 audits, 3 comments
-        self.assertEqual(len(result), 10)
-
-    @patch('tap_zendesk.streams.time.sleep')
+        self.assertEqual([2, 4], sorted(call.args[1] for call in mock_audits_sync.call_args_list))
+        # 4 tickets, 6 audits, 2 comments
+        self.assertEqual(len(result), 12)
+        self.assertEqual(mock_update_bookmark.call_count, 4)
+        self.assertTrue(mock_write_state.called)
+
+    @patch("tap_zendesk.streams.TicketAudits.sync")
+    @patch("tap_zendesk.streams.TicketAudits.stream", MagicMock(tap_stream_id="ticket_audits"))
     @patch("tap_zendesk.streams.Tickets.update_bookmark")
     @patch("tap_zendesk.streams.Tickets.get_bookmark")
     @patch("tap_zendesk.streams.Tickets.get_objects")
@@ -255,43 +263,124 @@ class TestASyncTicketAudits(unittest.TestCase):
         mock_get_objects,
         mock_get_bookmark,
         mock_update_bookmark,
-        mock_sleep
+        mock_audits_sync
     ):
         """
-        Test that sync does not extract records for audits and comments when both of them are not selected.
+        Test that sync fetches the audits of every ticket with a window smaller than the number of tickets.
         """
         # Mock the necessary data
         state = {}
         bookmark = "2023-01-01T00:00:00Z"
-        tickets = [
-            {"id": 1, "generated_timestamp": 1672531200, "fields": "duplicate"},
-            {"id": 2, "generated_timestamp": 1672531300, "fields": "duplicate"},
-            {"id": 3, "generated_timestamp": 1672531200, "fields": "duplicate"},
-            {"id": 4, "generated_timestamp": 1672531300, "fields": "duplicate"},
-            {"id": 5, "generated_timestamp": 1672531300, "fields": "duplicate"},
-            {"id": 6, "generated_timestamp": 1672531300, "fields": "duplicate"},
-            {"id": 7, "generated_timestamp": 1672531300, "fields": "duplicate"},
-            {"id": 8, "generated_timestamp": 1672531300, "fields": "duplicate"},
-            {"id": 9, "generated_timestamp": 1672531300, "fields": "duplicate"}
-        ]
+        tickets = [{"id": i, "generated_timestamp": 1672531200 + i, "fields": "duplicate"} for i in range(1, 10)]
         mock_get_bookmark.return_value = bookmark
         mock_get_objects.return_value = tickets
-        streams.AUDITS_REQUEST_PER_MINUTE = 4
-        streams.CONCURRENCY_LIMIT = 2
+
+        async def mock_audits(session, ticket_id, comments_stream):
+            yield [("ticket_audits", {"ticket_id": ticket_id})], [("ticket_comments", {"ticket_id": ticket_id})]
+        mock_audits_sync.side_effect = mock_audits
 
         # Create an instance of the Tickets class
-        instance = streams.Tickets(None, {})
-        instance.sync_ticket_audits_and_comments = MagicMock(return_value=[
-            (['audit1', 'audit2'], ['comment1', 'comment2']),
-            (['audit3', 'audit4'], ['comment3', 'comment4']),
-        ])
+        instance = streams.Tickets(None, {"audit_concurrency": 2})
 
         # Run the sync method
         result = list(instance.sync(state))
 
         # Assertions
-        self.assertEqual(mock_write_state.call_count, 5)
-        self.assertEqual(mock_sleep.call_count, 2)
+        # 9 tickets, 9 audits, 9 comments
+        self.assertEqual(len(result), 27)
+        self.assertEqual(mock_audits_sync.call_count, 9)
+
+    @patch("tap_zendesk.streams.TicketAudits.sync")
+    @patch("tap_zendesk.streams.TicketAudits.stream", MagicMock(tap_stream_id="ticket_audits"))
+    @patch("tap_zendesk.streams.Tickets.update_bookmark")
+    @patch("tap_zendesk.streams.Tickets.get_bookmark")
+    @patch("tap_zendesk.streams.Tickets.get_objects")
+    @patch("tap_zendesk.streams.Tickets.check_access")
+    @patch("tap_zendesk.streams.singer.write_state")
+    @patch("tap_zendesk.streams.zendesk_metrics.capture")
+    @patch("tap_zendesk.streams.LOGGER.info")
+    def test_bookmark_waits_for_slow_audits(
+        self,
+        mock_info,
+        mock_capture,
+        mock_write_state,
+        mock_check_access,
+        mock_get_objects,
+        mock_get_bookmark,
+        mock_update_bookmark,
+        mock_audits_sync
+    ):
+        """
+        Test that the bookmark never moves past a ticket whose audits have not been emitted yet,
+        even when the audits of later tickets arrive first.
+        """
+        events = []
+        tickets = [{"id": i, "generated_timestamp": 1672531200 + i, "fields": "duplicate"} for i in range(1, 5)]
+        mock_get_bookmark.return_value = "2023-01-01T00:00:00Z"
+        mock_get_objects.return_value = tickets
+        mock_update_bookmark.side_effect = lambda state, value: events.append(("bookmark", value))
+
+        async def mock_audits(session, ticket_id, comments_stream):
+            if ticket_id == 1:
+                await asyncio.sleep(0.2)
+            yield [("ticket_audits", {"ticket_id": ticket_id})], []
+        mock_audits_sync.side_effect = mock_audits
+
+        instance = streams.Tickets(None, {"audit_concurrency": 3})
+        for stream_name, record in instance.sync({}):
+            if stream_name == "ticket_audits":
+                events.append(("audit", record["ticket_id"]))
+
+        # Audits of tickets 2 and 3 are emitted before those of ticket 1
+        self.assertLess(events.index(("audit", 2)), events.index(("audit", 1)))
+        bookmarks = [value for kind, value in events if kind == "bookmark"]
+        self.assertEqual(["2023-01-01T00:00:01.000000Z", "2023-01-01T00:00:02.000000Z",
+                          "2023-01-01T00:00:03.000000Z", "2023-01-01T00:00:04.000000Z"], bookmarks)
+        self.assertGreater(events.index(("bookmark", "2023-01-01T00:00:01.000000Z")), events.index(("audit", 1)))
+
+    @patch("tap_zendesk.streams.TicketAudits.sync")
+    @patch("tap_zendesk.streams.TicketAudits.stream", MagicMock(tap_stream_id="ticket_audits"))
+    @patch("tap_zendesk.streams.Tickets.update_bookmark")
+    @patch("tap_zendesk.streams.Tickets.get_bookmark")
+    @patch("tap_zendesk.streams.Tickets.get_objects")
+    @patch("tap_zendesk.streams.Tickets.check_access")
+    @patch("tap_zendesk.streams.singer.write_state")
+    @patch("tap_zendesk.streams.zendesk_metrics.capture")
+    @patch("tap_zendesk.streams.LOGGER.info")
+    def test_audit_pages_are_emitted_as_they_arrive(
+        self,
+        mock_info,
+        mock_capture,
+        mock_write_state,
+        mock_check_access,
+        mock_get_objects,
+        mock_get_bookmark,
+        mock_update_bookmark,
+        mock_audits_sync
+    ):
+        """
+        Test that the first page of a ticket's audits is emitted before its last page is fetched.
+        """
+        first_page_emitted = threading.Event()
+        fetched_after_emit = []
+        mock_get_bookmark.return_value = "2023-01-01T00:00:00Z"
+        mock_get_objects.return_value = [{"id": 1, "generated_timestamp": 1672531201, "fields": "duplicate"}]
+
+        async def mock_audits(session, ticket_id, comments_stream):
+            yield [("ticket_audits", {"id": 1})], []
+            # Only fetch the next page once the first one has been written
+            fetched_after_emit.append(await asyncio.to_thread(first_page_emitted.wait, 5))
+            yield [("ticket_audits", {"id": 2})], []
+        mock_audits_sync.side_effect = mock_audits
+
+        audit_ids = []
+        for stream_name, record in streams.Tickets(None, {}).sync({}):
+            if stream_name == "ticket_audits":
+                audit_ids.append(record["id"])
+                first_page_emitted.set()
+
+        self.assertEqual([1, 2], audit_ids)
+        self.assertEqual([True], fetched_after_emit)
 
     @patch("tap_zendesk.streams.zendesk_metrics.capture")
     @patch("tap_zendesk.streams.LOGGER.warning")
@@ -315,13 +404,12 @@ class TestASyncTicketAudits(unittest.TestCase):
         async def run_test():
             # Run the sync method
             async with ClientSession() as session:
-                audit_records, comment_records = await instance.sync(
+                pages = [page async for page in instance.sync(
                     session, ticket_id, comments_stream
-                )
+                )]
 
                 # Assertions
-                self.assertEqual(len(audit_records), 0)
-                self.assertEqual(len(comment_records), 0)
+                self.assertEqual(pages, [])
 
         asyncio.run(run_test())
 
@@ -351,9 +439,10 @@ class TestASyncTicketAudits(unittest.TestCase):
             # Run the sync method
             async with ClientSession() as session:
                 with self.assertRaises(http.ZendeskError) as context:
-                    audit_records, comment_records = await instance.sync(
+                    pages = [page async for page in instance.sync(
                         session, ticket_id, comments_stream
-                    )
+                    )]
+                    [(audit_records, comment_records)] = pages
 
             self.assertEqual(
                 str(context.exception),
@@ -361,3 +450,88 @@ class TestASyncTicketAudits(unittest.TestCase):
             )
 
         asyncio.run(run_test())
+
+
+class TestAsyncSessionRunner(unittest.TestCase):
+    """
+    Test that the ticket sub-streams reuse one event loop and one pooled session.
+    """
+
+    def test_loop_and_session_are_reused_across_batches(self):
+        async def get_session(session):
+            return session, asyncio.get_running_loop()
+
+        runner = http.AsyncSessionRunner({"async_connection_limit": 5})
+        with runner:
+            first_session, first_loop = runner.run(get_session)
+            second_session, second_loop = runner.run(get_session)
+
+            self.assertIs(first_session, second_session)
+            self.assertIs(first_loop, second_loop)
+            self.assertEqual(5, first_session.connector.limit)
+
+        self.assertTrue(first_session.closed)
+        self.assertTrue(first_loop.is_closed())
+        self.assertIsNone(runner.loop)
+
+    def test_close_without_run_does_not_create_loop(self):
+        runner = http.AsyncSessionRunner({})
+        runner.close()
+        self.assertIsNone(runner.loop)
+
+    @patch("tap_zendesk.streams.TicketAudits.sync")
+    def test_streamed_audits_use_shared_session(self, mock_sync):
+        async def mock_audits(session, ticket_id, comments_stream):
+            yield [(None, {"ticket_id": ticket_id, "session": session})], []
+        mock_sync.side_effect = mock_audits
+
+        instance = streams.TicketAudits(None, {})
+        records = {}
+        with http.AsyncSessionRunner({}) as runner:
+            for ticket_id in [1, 2]:
+                runner.stream(ticket_id, instance.sync, ticket_id, MagicMock())
+            finished = set()
+            while len(finished) < 2:
+                key, item = runner.next_result()
+                if item is http.STREAM_END:
+                    finished.add(key)
+                else:
+                    records[key] = item
+            for audits, _ in records.values():
+                self.assertIs(runner.session, audits[0][1]["session"])
+        self.assertEqual({1: 1, 2: 2}, {key: audits[0][1]["ticket_id"] for key, (audits, _) in records.items()})
+
+    def test_stream_errors_are_raised_to_the_reader(self):
+        async def failing(session):
+            yield 1
+            raise http.ZendeskInternalServerError("boom")
+
+        with http.AsyncSessionRunner({}) as runner:
+            runner.stream("key", failing)
+            self.assertEqual(("key", 1), runner.next_result())
+            with self.assertRaises(http.ZendeskInternalServerError):
+                runner.next_result()
+
+    def test_stream_is_held_back_until_results_are_read(self):
+        produced = []
+
+        async def pages(session):
+            for page in range(10):
+                produced.append(page)
+                yield page
+
+        with http.AsyncSessionRunner({}, max_buffered_results=2) as runner:
+            runner.stream("key", pages)
+            self.assertEqual(("key", 0), runner.next_result())
+            # Give the generator time to run ahead if it were not bounded
+            time.sleep(0.05)
+            self.assertLessEqual(len(produced), 4)
+
+    def test_close_cancels_pending_work(self):
+        async def never_finishes(session):
+            await asyncio.sleep(3600)
+
+        with http.AsyncSessionRunner({}) as runner:
+            future = runner.submit(never_finishes)
+        self.assertTrue(future.cancelled())
+        self.assertIsNone(runner.thread)
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import requests
+
+from tap_zendesk import streams
+
+CONFIG = {'subdomain': 'acme', 'access_token': 'token', 'conditional_requests': 'true'}
+TAGS_URL = 'https://acme.zendesk.com/api/v2/tags'
+POLICIES_URL = 'https://acme.zendesk.com/api/v2/slas/policies'
+
+
+def mocked_get(status_code, json=None, etag=None):
+    fake_response = requests.models.Response()
+    fake_response.status_code = status_code
+    if etag:
+        fake_response.headers['ETag'] = etag
+    fake_response.json = Mock(return_value=json or {})
+    return fake_response
+
+
+def tags_page(names, has_more, after_cursor=None):
+    return {'tags': [{'name': name} for name in names], 'meta': {'has_more': has_more, 'after_cursor': after_cursor}}
+
+
+def sync(stream_class, state, config=CONFIG):
+    stream = stream_class(MagicMock(), config)
+    stream.stream = stream_class.name
+    return [record for _, record in stream.sync(state)]
+
+
+@patch('tap_zendesk.streams.singer.write_state')
+class TestConditionalRequests(unittest.TestCase):
+
+    @patch('requests.Session.get')
+    def test_unchanged_pages_are_not_emitted_again(self, mock_get, mock_write_state):
+        state = {}
+        mock_get.side_effect = [
+            mocked_get(200, tags_page(['a', 'b'], True, 'c1'), '"p1"'),
+            mocked_get(200, tags_page(['c'], False), '"p2"'),
+        ]
+        self.assertEqual([{'name': 'a'}, {'name': 'b'}, {'name': 'c'}], sync(streams.Tags, state))
+
+        mock_get.side_effect = [mocked_get(304), mocked_get(304)]
+        self.assertEqual([], sync(streams.Tags, state))
+
+        requests_made = mock_get.call_args_list[2:]
+        self.assertEqual(['"p1"', '"p2"'], [call.kwargs['headers']['If-None-Match'] for call in requests_made])
+        # The cursor of the second page is taken from the state as the first page wasn't returned
+        self.assertEqual('c1', requests_made[1].kwargs['params']['page[after]'])
+        self.assertEqual(2, len(state['bookmarks']['tags']['validators']))
+        self.assertEqual(2, mock_write_state.call_count)
+
+    @patch('requests.Session.get')
+    def test_only_changed_pages_are_emitted(self, mock_get, mock_write_state):
+        state = {}
+        mock_get.side_effect = [
+            mocked_get(200, tags_page(['a'], True, 'c1'), '"p1"'),
+            mocked_get(200, tags_page(['b'], False), '"p2"'),
+        ]
+        sync(streams.Tags, state)
+
+        mock_get.side_effect = [mocked_get(304), mocked_get(200, tags_page(['b', 'c'], False), '"p2-new"')]
+        self.assertEqual([{'name': 'b'}, {'name': 'c'}], sync(streams.Tags, state))
+
+        self.assertEqual(['"p1"', '"p2-new"'],
+                         sorted(validator['etag'] for validator in state['bookmarks']['tags']['validators'].values()))
+
+    @patch('requests.Session.get')
+    def test_offset_pages_follow_the_stored_next_page(self, mock_get, mock_write_state):
+        state = {}
+        next_page = POLICIES_URL + '?page=2'
+        mock_get.side_effect = [
+            mocked_get(200, {'sla_policies': [{'id': 1}], 'next_page': next_page}, '"p1"'),
+            mocked_get(200, {'sla_policies': [{'id': 2}], 'next_page': None}, '"p2"'),
+        ]
+        self.assertEqual([{'id': 1}, {'id': 2}], sync(streams.SLAPolicies, state))
+
+        mock_get.side_effect = [mocked_get(304), mocked_get(304)]
+        self.assertEqual([], sync(streams.SLAPolicies, state))
+        self.assertEqual([POLICIES_URL, next_page], [call.args[0] for call in mock_get.call_args_list[2:]])
+
+    @patch('requests.Session.get')
+    def test_incremental_streams_still_filter_on_the_bookmark(self, mock_get, mock_write_state):
+        state = {'bookmarks': {'ticket_forms': {'updated_at': '2023-01-02T00:00:00Z'}}}
+        mock_get.side_effect = [mocked_get(200, {'ticket_forms': [
+            {'id': 1, 'updated_at': '2023-01-01T00:00:00Z'},
+            {'id': 2, 'updated_at': '2023-01-03T00:00:00Z'}]}, '"p1"')]
+
+        self.assertEqual([2], [form['id'] for form in sync(streams.TicketForms, state)])
+        self.assertEqual('2023-01-03T00:00:00Z', state['bookmarks']['ticket_forms']['updated_at'])
+        self.assertIn('validators', state['bookmarks']['ticket_forms'])
+
+    @patch('requests.Session.get')
+    def test_off_by_default(self, mock_get, mock_write_state):
+        state = {}
+        mock_get.side_effect = [mocked_get(200, tags_page(['a'], False), '"p1"')]
+
+        sync(streams.Tags, state, {'subdomain': 'acme', 'access_token': 'token'})
+
+        self.assertNotIn('If-None-Match', mock_get.call_args.kwargs['headers'])
+        self.assertEqual({}, state)
+        mock_write_state.assert_not_called()
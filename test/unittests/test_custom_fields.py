@@ -0,0 +1,145 @@
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tap_zendesk import custom_fields, http, streams
+
+HEADERS = {'Authorization': 'Bearer token'}
+USER_FIELDS_URL = 'https://acme.zendesk.com/api/v2/user_fields.json'
+REGION = {'key': 'region', 'title': 'Region', 'type': 'dropdown', 'id': 1,
+          'custom_field_options': [{'id': 10, 'name': 'EMEA', 'value': 'emea'}]}
+PLAN = {'key': 'plan', 'title': 'Plan', 'type': 'text', 'id': 2}
+
+
+def page(fields, etag, next_page=None, status_code=200):
+    response = MagicMock(status_code=status_code, headers={'ETag': etag})
+    return response, {} if status_code == 304 else {'user_fields': fields, 'next_page': next_page}
+
+
+def not_modified():
+    return page([], None, status_code=304)
+
+
+class TestFieldCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_fields_are_fetched_every_time_without_a_directory(self, mock_request_json):
+        mock_request_json.side_effect = [page([PLAN], '"a"'), page([PLAN], '"a"')]
+        cache = custom_fields.FieldCache()
+
+        cache.get_fields('acme', 'user_fields', HEADERS, 300)
+        fields = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+
+        self.assertEqual([{'key': 'plan', 'title': 'Plan', 'type': 'text', 'custom_field_options': None}], fields)
+        self.assertEqual(2, mock_request_json.call_count)
+        self.assertNotIn('If-None-Match', mock_request_json.call_args.args[3])
+
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_fields_are_not_requested_within_the_ttl(self, mock_request_json):
+        mock_request_json.side_effect = [page([REGION], '"a"')]
+        cache = custom_fields.FieldCache(self.directory.name, ttl=3600)
+
+        first = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+        second = custom_fields.FieldCache(self.directory.name, ttl=3600).get_fields('acme', 'user_fields', HEADERS, 300)
+
+        self.assertEqual(first, second)
+        self.assertEqual([{'value': 'emea'}], second[0]['custom_field_options'])
+        self.assertEqual(1, mock_request_json.call_count)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_expired_pages_are_revalidated_with_their_etag(self, mock_request_json):
+        mock_request_json.side_effect = [
+            page([REGION], '"a"', next_page=USER_FIELDS_URL + '?page=2'),
+            page([PLAN], '"b"'),
+            not_modified(),
+            not_modified(),
+        ]
+        cache = custom_fields.FieldCache(self.directory.name, ttl=0)
+
+        first = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+        second = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+
+        self.assertEqual(['region', 'plan'], [field['key'] for field in second])
+        self.assertEqual(first, second)
+        revalidations = mock_request_json.call_args_list[2:]
+        self.assertEqual([USER_FIELDS_URL, USER_FIELDS_URL + '?page=2'], [call.args[0] for call in revalidations])
+        self.assertEqual(['"a"', '"b"'], [call.args[3]['If-None-Match'] for call in revalidations])
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_changed_fields_replace_the_cached_ones(self, mock_request_json):
+        mock_request_json.side_effect = [page([REGION], '"a"'), page([REGION, PLAN], '"c"'), not_modified()]
+        cache = custom_fields.FieldCache(self.directory.name, ttl=0)
+
+        cache.get_fields('acme', 'user_fields', HEADERS, 300)
+        changed = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+        revalidated = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+
+        self.assertEqual(['region', 'plan'], [field['key'] for field in changed])
+        self.assertEqual(changed, revalidated)
+        self.assertEqual('"c"', mock_request_json.call_args.args[3]['If-None-Match'])
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_accounts_are_cached_apart(self, mock_request_json):
+        mock_request_json.side_effect = [page([REGION], '"a"'), page([PLAN], '"a"')]
+        cache = custom_fields.FieldCache(self.directory.name, ttl=3600)
+
+        acme = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+        other = cache.get_fields('other', 'user_fields', HEADERS, 300)
+
+        self.assertEqual(['region'], [field['key'] for field in acme])
+        self.assertEqual(['plan'], [field['key'] for field in other])
+
+    @patch('tap_zendesk.custom_fields.LOGGER.warning')
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_fields_are_returned_when_the_cache_cant_be_written(self, mock_request_json, mock_warning):
+        mock_request_json.side_effect = [page([PLAN], '"a"'), page([PLAN], '"a"')]
+        # A file where the cache directory should be
+        with tempfile.NamedTemporaryFile(dir=self.directory.name) as f:
+            cache = custom_fields.FieldCache(f.name, ttl=3600)
+
+            fields = cache.get_fields('acme', 'user_fields', HEADERS, 300)
+            cache.get_fields('acme', 'user_fields', HEADERS, 300)
+
+        self.assertEqual(['plan'], [field['key'] for field in fields])
+        self.assertEqual(2, mock_request_json.call_count)
+        self.assertEqual("Not caching the custom fields in %s: %s", mock_warning.call_args.args[0])
+
+    def test_from_config(self):
+        cache = custom_fields.FieldCache.from_config({'custom_fields_cache_dir': self.directory.name,
+                                                      'custom_fields_cache_ttl': '60'})
+        self.assertEqual((self.directory.name, 60.0), (cache.directory, cache.ttl))
+        cache = custom_fields.FieldCache.from_config({})
+        self.assertEqual((None, custom_fields.DEFAULT_CACHE_TTL), (cache.directory, cache.ttl))
+
+
+class TestCustomFieldsSchema(unittest.TestCase):
+
+    @patch('tap_zendesk.custom_fields.http.request_json')
+    def test_custom_fields_are_added_to_the_schema(self, mock_request_json):
+        mock_request_json.side_effect = [page([REGION], '"a"')]
+        stream = streams.Users(MagicMock(), {'subdomain': 'acme', 'access_token': 'token'})
+
+        schema = stream.load_schema()
+
+        self.assertEqual({'region': {'type': ['string', 'null'], 'enum': ['emea']}},
+                         schema['properties']['user_fields']['properties'])
+        self.assertEqual(USER_FIELDS_URL, mock_request_json.call_args.args[0])
+
+    @patch('tap_zendesk.streams.LOGGER.warning')
+    @patch('tap_zendesk.custom_fields.http.request_json',
+           side_effect=http.ZendeskForbiddenError('HTTP-error-code: 403, Error: Forbidden'))
+    def test_forbidden_custom_fields_are_left_out(self, mock_request_json, mock_warning):
+        stream = streams.Organizations(MagicMock(), {'subdomain': 'acme', 'access_token': 'token'})
+
+        schema = stream.load_schema()
+
+        self.assertIn('organization_fields', schema['properties'])
+        mock_warning.assert_called_with("The account credentials supplied do not have access to `%s` custom fields.",
+                                        'organizations')
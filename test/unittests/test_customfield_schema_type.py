@@ -1,4 +1,3 @@
-import types
 import unittest
 from tap_zendesk.streams import process_custom_field
 
@@ -10,9 +9,7 @@ class TestCustomFieldSchemaDiscovery(unittest.TestCase):
     """
 
     def get_z_field_obj(self, *params):
-        field = types.SimpleNamespace()
-        field.title, field.key, field.type = params
-        return field
+        return dict(zip(('title', 'key', 'type'), params))
 
     def test_return_field_type_lookup(self):
         expected_singer_type = {"type" : ["integer", "null"]}
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import MagicMock, Mock, patch
 from parameterized import parameterized
@@ -27,6 +28,7 @@ def mocked_get(*args, **kwargs):
 class TestDiscovery(unittest.TestCase):
     '''
     Test that we can call api for each stream in discovey mode and handle forbidden error.
+    The responses are mocked in the order of the requests, so the streams are checked one at a time.
     '''
     @patch("tap_zendesk.discover.LOGGER.warning")
     @patch('tap_zendesk.streams.TalkPhoneNumbers.check_access')
@@ -39,7 +41,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=200, json={"tickets": [{"id": "t1"}]}), # Response of the 1st get request call
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 2nd get request call
@@ -62,7 +64,7 @@ class TestDiscovery(unittest.TestCase):
         some of stream method which call request of zenpy module and also mock get method of requests module with 200, 403 error.
 
         '''
-        discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+        discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
         expected_call_count = 8
         actual_call_count = mock_get.call_count
         self.assertEqual(expected_call_count, actual_call_count)
@@ -84,7 +86,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=200, json={"tickets": [{"id": "t1"}]}), # Response of the 1st get request call
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 2nd get request call
@@ -107,7 +109,7 @@ class TestDiscovery(unittest.TestCase):
         load_schema, resolve_schema_references also which we mock to test forbidden error. We mock check_access method of
         some of stream method which call request of zenpy module and also mock get method of requests module with 200, 403 error.
         '''
-        discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+        discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
 
         expected_call_count = 8
         actual_call_count = mock_get.call_count
@@ -130,7 +132,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 1st get request call
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 2nd get request call
@@ -153,7 +155,7 @@ class TestDiscovery(unittest.TestCase):
         some of stream method which call request of zenpy module and also mock get method of requests module with 200, 403 error.
         '''
 
-        responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+        responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
         expected_call_count = 8
         actual_call_count = mock_get.call_count
         self.assertEqual(expected_call_count, actual_call_count)
@@ -173,7 +175,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 1st get request call
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 2nd get request call
@@ -193,7 +195,7 @@ class TestDiscovery(unittest.TestCase):
         some of stream method which call request of zenpy module and also mock get method of requests module with 200, 403 error.
         '''
         try:
-            responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+            responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
         except http.ZendeskBadRequestError as e:
             expected_error_message = "HTTP-error-code: 400, Error: A validation exception has occurred."
             # Verifying the message formed for the custom exception
@@ -214,7 +216,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 1st get request call
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 2nd get request call
@@ -234,7 +236,7 @@ class TestDiscovery(unittest.TestCase):
         call request of zenpy module and also mock get method of requests module with 400, 403 error.
         '''
         try:
-            responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+            responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
         except zenpy.lib.exception.APIException as e:
             expected_error_message = AUTH_ERROR
             # Verifying the message formed for the custom exception
@@ -254,7 +256,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=200, json={"tickets": [{"id": "t1"}]}), # Response of the 1st get request call
                 mocked_get(status_code=200, json={"key1": "val1"}), # Response of the 1st get request call
@@ -273,7 +275,7 @@ class TestDiscovery(unittest.TestCase):
         '''
         Test that discovery mode does not raise any error in case of all streams have read permission
         '''
-        discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+        discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
 
         expected_call_count = 8
         actual_call_count = mock_get.call_count
@@ -290,7 +292,7 @@ class TestDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get',
+    @patch('requests.Session.get',
            side_effect=[
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 1st get request call
                 mocked_get(status_code=403, json={"key1": "val1"}), # Response of the 2nd get request call
@@ -314,7 +316,7 @@ class TestDiscovery(unittest.TestCase):
         some of stream method which call request of zenpy module and also mock get method of requests module with 200, 403 error.
         '''
         try:
-            responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE})
+            responses = discover.discover_streams('dummy_client', {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date':START_DATE, 'discovery_concurrency': 1})
         except http.ZendeskForbiddenError as e:
             expected_message = "HTTP-error-code: 403, Error: The account credentials supplied do not have 'read' access to any "\
             "of streams supported by the tap. Data collection cannot be initiated due to lack of permissions."
@@ -350,7 +352,7 @@ class TestOptionalStreamDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get', side_effect=[
+    @patch('requests.Session.get', side_effect=[
         mocked_get(status_code=200, json={'tickets': [{'id': 't1'}]}),  # tickets
         mocked_get(status_code=200, json={'groups': []}),               # groups
         mocked_get(status_code=200, json={}),                           # ticket_audits
@@ -380,7 +382,7 @@ class TestOptionalStreamDiscovery(unittest.TestCase):
         '''
         result = discover.discover_streams(
             'dummy_client',
-            {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date': START_DATE}
+            {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date': START_DATE, 'discovery_concurrency': 1}
         )
 
         # Connection must succeed – all streams except talk_phone_numbers are returned.
@@ -417,7 +419,7 @@ class TestOptionalStreamDiscovery(unittest.TestCase):
     @patch('tap_zendesk.streams.Stream.load_metadata', return_value={})
     @patch('tap_zendesk.streams.Stream.load_schema', return_value={})
     @patch('singer.resolve_schema_references', return_value={})
-    @patch('requests.get', side_effect=[
+    @patch('requests.Session.get', side_effect=[
         mocked_get(status_code=200, json={'tickets': [{'id': 't1'}]}),  # tickets
         mocked_get(status_code=200, json={}),                           # groups
         mocked_get(status_code=200, json={}),                           # ticket_audits
@@ -441,7 +443,7 @@ class TestOptionalStreamDiscovery(unittest.TestCase):
         '''
         result = discover.discover_streams(
             'dummy_client',
-            {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date': START_DATE}
+            {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date': START_DATE, 'discovery_concurrency': 1}
         )
 
         # Connection succeeds: all optional streams excluded, essential streams remain.
@@ -465,13 +467,11 @@ class TestOptionalStreamDiscovery(unittest.TestCase):
 
 class TestCheckAccessOptionalStreams(unittest.TestCase):
     '''
-    Unit tests for the check_access() fixes on the three streams affected by the
-    customer-reported bug:
-      - TalkPhoneNumbers: Zenpy Talk raises requests.HTTPError directly (not ZendeskForbiddenError)
-      - SLAPolicies:      Zenpy native client raises APIException
-      - TicketForms:      Zenpy native client raises APIException
-    All three must convert their native exceptions to ZendeskForbiddenError so
-    discover.py can handle them uniformly via the is_optional flag.
+    Unit tests for check_access() on the optional streams affected by the
+    customer-reported bug (TalkPhoneNumbers, SLAPolicies, TicketForms).
+    They call the Zendesk API directly, so http.call_api -> raise_for_error
+    maps a 403 to ZendeskForbiddenError and discover.py can handle them
+    uniformly via the is_optional flag.
     '''
 
     CONFIG = {
@@ -481,75 +481,63 @@ class TestCheckAccessOptionalStreams(unittest.TestCase):
     }
 
     # -----------------------------------------------------------------------
-    # Parameterized: Zenpy native-client APIException → ZendeskForbiddenError
-    # Covers SLAPolicies and TicketForms which both use self.client.<method>()
-    # and must convert APIException to ZendeskForbiddenError.
+    # Parameterized: HTTP 403 -> ZendeskForbiddenError
+    # Covers the scoped-token and plan-tier responses of every optional stream.
     # -----------------------------------------------------------------------
     @parameterized.expand([
-        ('sla_policies',  SLAPolicies,  'sla_policies'),
-        ('ticket_forms',  TicketForms,  'ticket_forms'),
+        ('sla_policies_missing_scope', SLAPolicies, ACCSESS_TOKEN_ERROR),
+        ('sla_policies_restricted', SLAPolicies, API_TOKEN_ERROR),
+        ('ticket_forms_missing_scope', TicketForms, ACCSESS_TOKEN_ERROR),
+        ('ticket_forms_restricted', TicketForms, API_TOKEN_ERROR),
+        ('talk_phone_numbers_missing_scope', TalkPhoneNumbers, ACCSESS_TOKEN_ERROR),
+        ('talk_phone_numbers_restricted', TalkPhoneNumbers, API_TOKEN_ERROR),
     ])
-    def test_zenpy_api_exception_raises_zendesk_forbidden(self, _name, stream_cls, client_attr):
+    def test_http_403_raises_zendesk_forbidden(self, _name, stream_cls, error):
         '''
-        Plan-tier streams (SLAPolicies, TicketForms) use the Zenpy native client.
-        A 403 surfaces as APIException; check_access() must re-raise it as
-        ZendeskForbiddenError for uniform handling in discover.py.
+        A 403 for a plan-tier or add-on stream must surface as
+        ZendeskForbiddenError, whatever the error message.
         '''
-        client = MagicMock()
-        getattr(client, client_attr).side_effect = zenpy.lib.exception.APIException(ACCSESS_TOKEN_ERROR)
-        stream = stream_cls(client, self.CONFIG)
-
-        with self.assertRaises(http.ZendeskForbiddenError):
-            stream.check_access()
+        with patch('requests.Session.get', return_value=mocked_get(
+                status_code=403, json=json.loads(error))):
+            stream = stream_cls(MagicMock(), self.CONFIG)
+            with self.assertRaises(http.ZendeskForbiddenError):
+                stream.check_access()
 
-    # -----------------------------------------------------------------------
-    # Parameterized: TalkPhoneNumbers check_access HTTP error handling
-    # The Zenpy Talk client calls response.raise_for_status() internally,
-    # so it surfaces errors as requests.HTTPError rather than ZendeskForbiddenError.
-    # -----------------------------------------------------------------------
     @parameterized.expand([
-        (
-            'http_403_converted_to_zendesk_forbidden',
-            403,
-            '403 Client Error: Forbidden for url: '
-            'https://testaccount.zendesk.com/api/v2/channels/voice/phone_numbers.json',
-            http.ZendeskForbiddenError,
-        ),
-        (
-            'http_non_403_reraises_unchanged',
-            500,
-            '500 Server Error: Internal Server Error',
-            requests.exceptions.HTTPError,
-        ),
+        ('sla_policies', SLAPolicies, 'https://testaccount.zendesk.com/api/v2/slas/policies'),
+        ('ticket_forms', TicketForms, 'https://testaccount.zendesk.com/api/v2/ticket_forms'),
+        ('talk_phone_numbers', TalkPhoneNumbers,
+         'https://testaccount.zendesk.com/api/v2/channels/voice/phone_numbers.json'),
     ])
-    def test_talk_phone_numbers_http_error(self, _name, status_code, error_msg, expected_exc):
+    def test_check_access_does_not_use_zenpy(self, _name, stream_cls, url):
         '''
-        TalkPhoneNumbers.check_access() calls the Zenpy Talk client which raises
-        requests.HTTPError for HTTP errors:
-          - 403 must be converted to ZendeskForbiddenError (customer-reported scenario).
-          - Non-403 errors (e.g. 500) must propagate unchanged.
+        check_access() requests the stream's endpoint through the tap's own session.
         '''
         client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.status_code = status_code
-        client.talk.phone_numbers.side_effect = requests.exceptions.HTTPError(
-            error_msg, response=mock_response
-        )
-        stream = TalkPhoneNumbers(client, self.CONFIG)
+        with patch('requests.Session.get', return_value=mocked_get(status_code=200, json={})) as mock_get:
+            stream_cls(client, self.CONFIG).check_access()
+        self.assertEqual(url, mock_get.call_args.args[0])
+        self.assertEqual([], client.mock_calls)
 
-        with self.assertRaises(expected_exc):
-            stream.check_access()
+    def test_non_403_reraises_unchanged(self):
+        '''
+        A non-403 error (e.g. 500) must propagate unchanged.
+        We patch http.call_api directly to avoid triggering the backoff decorator.
+        '''
+        with patch('tap_zendesk.streams.http.call_api',
+                   side_effect=http.ZendeskInternalServerError('500 Server Error')):
+            stream = TalkPhoneNumbers(MagicMock(), self.CONFIG)
+            with self.assertRaises(http.ZendeskInternalServerError):
+                stream.check_access()
 
     def test_talk_phone_numbers_404_silently_passes(self):
         '''
         ZendeskNotFoundError (404) should be silently ignored if the account simply
         has no phone numbers configured, which is not a permissions problem.
         '''
-        client = MagicMock()
-        client.talk.phone_numbers.side_effect = http.ZendeskNotFoundError('Not Found')
-        stream = TalkPhoneNumbers(client, self.CONFIG)
-
-        stream.check_access()
+        with patch('requests.Session.get', return_value=mocked_get(status_code=404, json={})):
+            stream = TalkPhoneNumbers(MagicMock(), self.CONFIG)
+            stream.check_access()
 
     # -----------------------------------------------------------------------
     # SatisfactionRatings: base class check_access() via http.call_api
@@ -564,7 +552,7 @@ class TestCheckAccessOptionalStreams(unittest.TestCase):
         needed. This test explicitly guards that contract so the implicit dependency
         on http.call_api behaviour is visible and regression-protected.
         '''
-        with patch('requests.get', return_value=mocked_get(
+        with patch('requests.Session.get', return_value=mocked_get(
                 status_code=403, json={'error': 'Forbidden'})):
             stream = SatisfactionRatings(MagicMock(), self.CONFIG)
             with self.assertRaises(http.ZendeskForbiddenError):
@@ -581,3 +569,46 @@ class TestCheckAccessOptionalStreams(unittest.TestCase):
             stream = SatisfactionRatings(MagicMock(), self.CONFIG)
             with self.assertRaises(http.ZendeskInternalServerError):
                 stream.check_access()
+
+
+def routed_get(url, **kwargs):
+    '''
+    Respond to the requests of discovery by URL, as concurrent checks make them in no set order.
+    '''
+    if 'satisfaction_ratings' in url:
+        return mocked_get(status_code=403, json={})
+    for field_type in ('user_fields', 'organization_fields'):
+        if url.endswith('/{}.json'.format(field_type)):
+            return mocked_get(status_code=200, json={field_type: [{'key': 'region', 'title': 'Region', 'type': 'text'}]})
+    return mocked_get(status_code=200, json={})
+
+
+class TestConcurrentDiscovery(unittest.TestCase):
+    CONFIG = {'subdomain': 'arp', 'access_token': 'dummy_token', 'start_date': START_DATE}
+
+    @patch('requests.Session.get', side_effect=routed_get)
+    def test_catalog_is_the_same_as_checking_one_stream_at_a_time(self, mock_get):
+        '''
+        The catalog keeps the order of STREAMS and its content whatever the number of concurrent checks.
+        '''
+        sequential = discover.discover_streams(MagicMock(), {**self.CONFIG, 'discovery_concurrency': 1})
+        concurrent = discover.discover_streams(MagicMock(), {**self.CONFIG, 'discovery_concurrency': 8})
+
+        self.assertEqual(sequential, concurrent)
+        self.assertEqual([name for name in STREAMS if name != 'satisfaction_ratings'],
+                         [entry['tap_stream_id'] for entry in concurrent])
+
+    @patch('requests.Session.get', side_effect=routed_get)
+    def test_custom_fields_are_fetched_once(self, mock_get):
+        '''
+        The schema is built once per stream, so the user and organization fields aren't
+        requested again for the metadata.
+        '''
+        catalog = discover.discover_streams(MagicMock(), self.CONFIG)
+
+        urls = [call.args[0] for call in mock_get.call_args_list]
+        self.assertEqual(1, urls.count('https://arp.zendesk.com/api/v2/user_fields.json'))
+        self.assertEqual(1, urls.count('https://arp.zendesk.com/api/v2/organization_fields.json'))
+        users = next(entry for entry in catalog if entry['tap_stream_id'] == 'users')
+        self.assertEqual({'type': ['string', 'null']},
+                         users['schema']['properties']['user_fields']['properties']['region'])
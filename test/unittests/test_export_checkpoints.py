@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from tap_zendesk import http, streams
+
+
+def user(user_id):
+    return {"id": user_id, "updated_at": "2023-01-{:02d}T00:00:00Z".format(user_id)}
+
+
+def ticket(ticket_id):
+    return {"id": ticket_id, "generated_timestamp": 1672531200 + ticket_id, "fields": "duplicate", "status": "deleted"}
+
+
+def fake_export(pages, fail_on_page=None):
+    """ Export of `pages` of records, each followed by its page end, failing when `fail_on_page` is reached """
+    def get_objects(start_time, side_load=None, cursor=None, page_ends=False):
+        first = 0 if cursor is None else int(cursor[1:])
+        for index, page in enumerate(pages[first:], first):
+            if index == fail_on_page:
+                raise http.ZendeskInternalServerError("HTTP-error-code: 500")
+            yield from (dict(record) for record in page)
+            if page_ends:
+                yield http.ExportPageEnd("c{}".format(index + 1), index == len(pages) - 1)
+    return MagicMock(side_effect=get_objects)
+
+
+@patch("tap_zendesk.streams.singer.write_state")
+class TestUsersCheckpoints(unittest.TestCase):
+    PAGES = [[user(1), user(2)], [user(3)], [user(4)]]
+
+    def users(self, config, get_objects):
+        instance = streams.Users(None, config)
+        instance.stream = MagicMock(tap_stream_id="users")
+        instance.get_objects = get_objects
+        return instance
+
+    def test_interrupted_export_resumes_from_the_checkpointed_cursor(self, mock_write_state):
+        config = {"checkpoint_interval_records": 1}
+        state = {"bookmarks": {"users": {"updated_at": "2023-01-01T00:00:00Z"}}}
+
+        instance = self.users(config, fake_export(self.PAGES, fail_on_page=2))
+        records = []
+        with self.assertRaises(http.ZendeskInternalServerError):
+            records.extend(record["id"] for _, record in instance.sync(state))
+        self.assertEqual([1, 2, 3], records)
+        self.assertEqual("c2", state["bookmarks"]["users"]["after_cursor"])
+
+        instance = self.users(config, fake_export(self.PAGES))
+        self.assertEqual([4], [record["id"] for _, record in instance.sync(state)])
+        self.assertEqual("c2", instance.get_objects.call_args.kwargs["cursor"])
+        # The next sync starts from the bookmark again
+        self.assertEqual({"updated_at": "2023-01-04T00:00:00Z"}, state["bookmarks"]["users"])
+
+    @patch("tap_zendesk.streams.LOGGER.warning")
+    def test_rejected_cursor_restarts_from_the_bookmark(self, mock_warning, mock_write_state):
+        state = {"bookmarks": {"users": {"updated_at": "2023-01-01T00:00:00Z", "after_cursor": "expired"}}}
+        export = fake_export(self.PAGES)
+
+        def get_objects(start_time, side_load=None, cursor=None, page_ends=False):
+            if cursor:
+                raise http.ZendeskBadRequestError("HTTP-error-code: 400, Error: Invalid cursor")
+            yield from export(start_time, side_load=side_load, cursor=cursor, page_ends=page_ends)
+        instance = self.users({}, MagicMock(side_effect=get_objects))
+
+        self.assertEqual([1, 2, 3, 4], [record["id"] for _, record in instance.sync(state)])
+        self.assertEqual([None], [call.kwargs["cursor"] for call in export.call_args_list])
+        self.assertTrue(mock_warning.called)
+        self.assertEqual({"updated_at": "2023-01-04T00:00:00Z"}, state["bookmarks"]["users"])
+
+    def test_cursor_is_checkpointed_on_the_time_interval(self, mock_write_state):
+        state = {"bookmarks": {"users": {"updated_at": "2023-01-01T00:00:00Z"}}}
+        instance = self.users({}, fake_export(self.PAGES, fail_on_page=2))
+
+        with patch("tap_zendesk.streams.time.monotonic", side_effect=[0, 10, 61, 61]):
+            with self.assertRaises(http.ZendeskInternalServerError):
+                list(instance.sync(state))
+
+        # Only the second page end came a minute after the start
+        self.assertEqual("c2", state["bookmarks"]["users"]["after_cursor"])
+        self.assertEqual(1, mock_write_state.call_count)
+
+    def test_checkpoints_can_be_turned_off(self, mock_write_state):
+        state = {"bookmarks": {"users": {"updated_at": "2023-01-01T00:00:00Z"}}}
+        instance = self.users({"checkpoint_interval_seconds": 0}, fake_export(self.PAGES, fail_on_page=2))
+
+        with self.assertRaises(http.ZendeskInternalServerError):
+            list(instance.sync(state))
+
+        self.assertNotIn("after_cursor", state["bookmarks"]["users"])
+        mock_write_state.assert_not_called()
+
+
+@patch("tap_zendesk.streams.singer.write_state")
+@patch("tap_zendesk.streams.zendesk_metrics.capture")
+class TestTicketsCheckpoints(unittest.TestCase):
+
+    def test_cursor_of_a_page_is_checkpointed_once_its_tickets_are_released(self, mock_capture, mock_write_state):
+        state = {"bookmarks": {"tickets": {"generated_timestamp": "2023-01-01T00:00:00Z"}}}
+        checkpoints = []
+        mock_write_state.side_effect = lambda state: checkpoints.append(
+            (state["bookmarks"]["tickets"].get("after_cursor"), state["bookmarks"]["tickets"]["generated_timestamp"]))
+        instance = streams.Tickets(None, {"checkpoint_interval_records": 1})
+        instance.stream = MagicMock(tap_stream_id="tickets")
+        instance.get_objects = fake_export([[ticket(1), ticket(2)], [ticket(3)]])
+
+        records = [record["id"] for _, record in instance.sync(state)]
+
+        self.assertEqual([1, 2, 3], records)
+        self.assertEqual(("c1", "2023-01-01T00:00:02.000000Z"), checkpoints[0])
+        self.assertNotIn("after_cursor", state["bookmarks"]["tickets"])
+        self.assertIsNone(instance.get_objects.call_args.kwargs["cursor"])
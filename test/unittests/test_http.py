@@ -1,12 +1,13 @@
+import io
+import json
 import unittest
 from unittest.mock import AsyncMock, Mock, patch
-from tap_zendesk import http, streams
+from tap_zendesk import http
 import requests
 from urllib3.exceptions import ProtocolError
 from requests.exceptions import ChunkedEncodingError, ConnectionError
 import asyncio
 from aiohttp import ClientSession
-import zenpy
 
 
 class Mockresponse:
@@ -73,7 +74,7 @@ class TestBackoff(unittest.TestCase):
     """
 
     @patch(
-        "requests.get", side_effect=[mocked_get(status_code=200, json=SINGLE_RESPONSE)]
+        "requests.Session.get", side_effect=[mocked_get(status_code=200, json=SINGLE_RESPONSE)]
     )
     def test_get_cursor_based_gets_one_page(self, mock_get, mock_sleep):
         responses = [
@@ -91,7 +92,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(expected_call_count, actual_call_count)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=[
             mocked_get(status_code=200, json={"key1": "val1", **PAGINATE_RESPONSE}),
             mocked_get(status_code=200, json={"key2": "val2", **SINGLE_RESPONSE}),
@@ -114,7 +115,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(expected_call_count, actual_call_count)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=[
             mocked_get(
                 status_code=429,
@@ -150,7 +151,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(expected_call_count, actual_call_count)
 
     @patch(
-        "requests.get", side_effect=[mocked_get(status_code=400, json={"key1": "val1"})]
+        "requests.Session.get", side_effect=[mocked_get(status_code=400, json={"key1": "val1"})]
     )
     def test_get_cursor_based_handles_400(self, mock_get, mock_sleep):
         try:
@@ -173,7 +174,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 1)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=[
             mocked_get(status_code=400, json={"error": "Couldn't authenticate you"})
         ],
@@ -199,7 +200,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 1)
 
     @patch(
-        "requests.get", side_effect=[mocked_get(status_code=401, json={"key1": "val1"})]
+        "requests.Session.get", side_effect=[mocked_get(status_code=401, json={"key1": "val1"})]
     )
     def test_get_cursor_based_handles_401(self, mock_get, mock_sleep):
         try:
@@ -222,7 +223,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 1)
 
     @patch(
-        "requests.get", side_effect=[mocked_get(status_code=404, json={"key1": "val1"})]
+        "requests.Session.get", side_effect=[mocked_get(status_code=404, json={"key1": "val1"})]
     )
     def test_get_cursor_based_handles_404(self, mock_get, mock_sleep):
         try:
@@ -241,7 +242,7 @@ class TestBackoff(unittest.TestCase):
         # Verify the request calls only 1 time
         self.assertEqual(mock_get.call_count, 1)
 
-    @patch("requests.get", side_effect=mock_send_409)
+    @patch("requests.Session.get", side_effect=mock_send_409)
     def test_get_cursor_based_handles_409(self, mocked_request, mock_api_token):
         """
         Test that `request` method retry 409 error 10 times
@@ -262,7 +263,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mocked_request.call_count, 10)
 
     @patch(
-        "requests.get", side_effect=[mocked_get(status_code=422, json={"key1": "val1"})]
+        "requests.Session.get", side_effect=[mocked_get(status_code=422, json={"key1": "val1"})]
     )
     def test_get_cursor_based_handles_422(self, mock_get, mock_sleep):
         try:
@@ -282,7 +283,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 1)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=10 * [mocked_get(status_code=500, json={"key1": "val1"})],
     )
     def test_get_cursor_based_handles_500(self, mock_get, mock_sleep):
@@ -309,7 +310,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 10)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=10 * [mocked_get(status_code=501, json={"key1": "val1"})],
     )
     def test_get_cursor_based_handles_501(self, mock_get, mock_sleep):
@@ -333,7 +334,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 10)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=10 * [mocked_get(status_code=502, json={"key1": "val1"})],
     )
     def test_get_cursor_based_handles_502(self, mock_get, mock_sleep):
@@ -358,7 +359,7 @@ class TestBackoff(unittest.TestCase):
         # Verify the request retry 10 times
         self.assertEqual(mock_get.call_count, 10)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_get_cursor_based_handles_444(self, mock_get, mock_sleep):
         fake_response = requests.models.Response()
         fake_response.status_code = 444
@@ -379,20 +380,7 @@ class TestBackoff(unittest.TestCase):
 
         self.assertEqual(mock_get.call_count, 1)
 
-    @patch("tap_zendesk.streams.LOGGER.warning")
-    def test_raise_or_log_zenpy_apiexception(self, mocked_logger, mock_sleep):
-        schema = {}
-        stream = "test_stream"
-        error_string = '{"error": "Forbidden", "description": "Missing the following required scopes: read"}'
-        e = zenpy.lib.exception.APIException(error_string)
-        streams.raise_or_log_zenpy_apiexception(schema, stream, e)
-        # Verify the raise_or_log_zenpy_apiexception Log expected message
-        mocked_logger.assert_called_with(
-            "The account credentials supplied do not have access to `%s` custom fields.",
-            stream,
-        )
-
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_call_api_handles_timeout_error(self, mock_get, mock_sleep):
         mock_get.side_effect = requests.exceptions.Timeout
 
@@ -406,7 +394,7 @@ class TestBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_call_api_handles_connection_error(self, mock_get, mock_sleep):
         mock_get.side_effect = ConnectionError
 
@@ -421,7 +409,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 5)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=10 * [mocked_get(status_code=524, json={"key1": "val1"})],
     )
     def test_get_cursor_based_handles_524(self, mock_get, mock_sleep):
@@ -445,7 +433,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 10)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=10 * [mocked_get(status_code=520, json={"key1": "val1"})],
     )
     def test_get_cursor_based_handles_520(self, mock_get, mock_sleep):
@@ -469,7 +457,7 @@ class TestBackoff(unittest.TestCase):
         self.assertEqual(mock_get.call_count, 10)
 
     @patch(
-        "requests.get",
+        "requests.Session.get",
         side_effect=10 * [mocked_get(status_code=503, json={"key1": "val1"})],
     )
     def test_get_cursor_based_handles_503(self, mock_get, mock_sleep):
@@ -494,7 +482,7 @@ class TestBackoff(unittest.TestCase):
         # Verify the request retry 10 times
         self.assertEqual(mock_get.call_count, 10)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_call_api_handles_protocol_error(self, mock_get, mock_sleep):
         """Check whether the request backoff properly for call_api method for 5 times in case of
          Protocol error"""
@@ -506,7 +494,7 @@ class TestBackoff(unittest.TestCase):
             )
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_call_api_handles_chunked_encoding_error(self, mock_get, mock_sleep):
         """Check whether the request backoff properly for call_api method for 5 times in case of
         ChunkedEncoding error"""
@@ -518,7 +506,7 @@ class TestBackoff(unittest.TestCase):
             )
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_call_api_handles_connection_reset_error(self, mock_get, mock_sleep):
         """Check whether the request backoff properly for call_api method for 5 times in case of
         ConnectionResetError error"""
@@ -564,6 +552,7 @@ class TestAPIAsync(unittest.TestCase):
         mock_error_response = AsyncMock()
         mock_error_response.status = 429
         mock_error_response.headers = {"Retry-After": retry_after}
+        mock_error_response.json.return_value = {}
         mock_response = AsyncMock()
         mock_response.status = 200
         mock_response.json.return_value = response_data
@@ -595,6 +584,7 @@ class TestAPIAsync(unittest.TestCase):
         mock_error_response = AsyncMock()
         mock_error_response.status = 429
         mock_error_response.headers = {"Retry-After": retry_after}
+        mock_error_response.json.return_value = {}
         mock_response = AsyncMock()
         mock_response.status = 200
         mock_response.json.return_value = response_data
@@ -625,6 +615,7 @@ class TestAPIAsync(unittest.TestCase):
         mock_error_response = AsyncMock()
         mock_error_response.status = 429
         mock_error_response.headers = {}
+        mock_error_response.json.return_value = {}
         mock_response = AsyncMock()
         mock_response.status = 200
         mock_response.json.return_value = response_data
@@ -858,7 +849,7 @@ class TestAPIAsync(unittest.TestCase):
     @patch("aiohttp.ClientSession.get")
     def test_paginate_ticket_audits(self, mocked):
         """
-        Test that paginate_ticket_audits correctly paginates through multiple pages of results.
+        Test that paginate_ticket_audits correctly paginates through multiple pages of results, yielding each page.
         """
         url = "https://api.example.com/resource"
         access_token = "test_token"
@@ -887,18 +878,6 @@ class TestAPIAsync(unittest.TestCase):
                 "next":"https://example.zendesk.com/api/v2/tickets/example/audits.json?page[after]=page_cursor_after==&page[size]=100"
             }
         }
-        expected_result = {
-            "audits": [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}],
-            "meta": {
-                "has_more": True,
-                "after_cursor": "page_cursor_after==",
-                "before_cursor": "page_cursor_before=="
-            },
-            "links":{
-                "prev":"https://example.zendesk.com/api/v2/tickets/example/audits.json?page[before]=page_cursor_before==&page[size]=100",
-                "next":"https://example.zendesk.com/api/v2/tickets/example/audits.json?page[after]=page_cursor_after==&page[size]=100"
-            }
-        }
         mock_first_response = AsyncMock()
         mock_first_response.status = 200
         mock_first_response.json.return_value = first_page
@@ -912,9 +891,158 @@ class TestAPIAsync(unittest.TestCase):
 
         async def run_test():
             async with ClientSession() as session:
-                result = await http.paginate_ticket_audits(
+                pages = [page async for page in http.paginate_ticket_audits(
                     session, url, access_token, 10, page_size
-                )
-                self.assertEqual(result, expected_result)
+                )]
+                self.assertEqual(pages, [first_page, second_page])
+                self.assertEqual("page_cursor_after==", mocked.call_args_list[1].kwargs["params"]["page[after]"])
 
         asyncio.run(run_test())
+
+
+class TestSingleDecode(unittest.TestCase):
+    """Test that each response body is decoded only once on the sync call path."""
+
+    def test_raise_for_error_returns_decoded_body(self):
+        response = mocked_get(status_code=200, json={"key1": "val1"})
+        self.assertEqual({"key1": "val1"}, http.raise_for_error(response))
+        self.assertEqual(1, response.json.call_count)
+
+    def test_raise_for_error_raises_when_a_200_is_not_json(self):
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b"<html>Service Unavailable</html>"
+        with self.assertRaises(ValueError):
+            http.raise_for_error(response)
+
+    def test_raise_for_error_returns_empty_body_without_content(self):
+        for status_code in (204, 304):
+            response = mocked_get(status_code=status_code)
+            self.assertEqual({}, http.raise_for_error(response))
+            self.assertFalse(response.json.called)
+
+    def test_raise_for_error_maps_error_without_json_body(self):
+        response = requests.models.Response()
+        response.status_code = 403
+        response._content = b"Forbidden"
+        with self.assertRaises(http.ZendeskForbiddenError):
+            http.raise_for_error(response)
+
+    def test_get_incremental_export_decodes_each_page_once(self):
+        pages = [
+            mocked_get(status_code=200, json={"tickets": [{"id": 1}], "end_of_stream": False, "after_cursor": "c1"}),
+            mocked_get(status_code=200, json={"tickets": [{"id": 2}], "end_of_stream": True, "after_cursor": "c2"}),
+        ]
+        with patch("requests.Session.get", side_effect=pages):
+            responses = list(http.get_incremental_export("some_url", "some_token", REQUEST_TIMEOUT, 0, None))
+
+        self.assertEqual([[{"id": 1}], [{"id": 2}]], [response["tickets"] for response in responses])
+        self.assertEqual([1, 1], [page.json.call_count for page in pages])
+
+    def test_get_offset_based_decodes_each_page_once(self):
+        pages = [
+            mocked_get(status_code=200, json={"items": [1], "next_page": "next_url"}),
+            mocked_get(status_code=200, json={"items": [2], "next_page": None}),
+        ]
+        with patch("requests.Session.get", side_effect=pages):
+            responses = list(http.get_offset_based("some_url", "some_token", REQUEST_TIMEOUT, PAGE_SIZE))
+
+        self.assertEqual(2, len(responses))
+        self.assertEqual([1, 1], [page.json.call_count for page in pages])
+
+
+class TestPooledSession(unittest.TestCase):
+    """Test that call_api sends every request through one pooled keep-alive session."""
+
+    def test_session_uses_config(self):
+        session = http.build_session({"http_pool_size": "25",
+                                      "marketplace_name": "Hithere",
+                                      "marketplace_organization_id": 1234,
+                                      "marketplace_app_id": 12345})
+        adapter = session.get_adapter("https://test.zendesk.com")
+        self.assertEqual(25, adapter._pool_maxsize)
+        self.assertEqual("1234", session.headers["X-Zendesk-Marketplace-Organization-Id"])
+
+    def test_session_defaults(self):
+        session = http.build_session({"marketplace_name": "Hithere"})
+        adapter = session.get_adapter("https://test.zendesk.com")
+        self.assertEqual(http.DEFAULT_POOL_SIZE, adapter._pool_maxsize)
+        # Retries are left to the backoff of call_api
+        self.assertEqual(0, adapter.max_retries.total)
+        self.assertNotIn("X-Zendesk-Marketplace-Name", session.headers)
+
+    @patch("requests.adapters.HTTPAdapter.send")
+    def test_call_api_reuses_session(self, mock_send):
+        mock_send.return_value = mocked_get(status_code=200, json={"key1": "val1"})
+        with patch("tap_zendesk.http.SESSION", None):
+            http.call_api_json("https://test.zendesk.com/api/v2/users", REQUEST_TIMEOUT, params={}, headers={})
+            session = http.SESSION
+            http.call_api_json("https://test.zendesk.com/api/v2/users", REQUEST_TIMEOUT, params={}, headers={})
+            self.assertIs(session, http.SESSION)
+        self.assertEqual(2, mock_send.call_count)
+
+
+def streamed_get(status_code, body, fail_after=None):
+    """A response whose body is read in chunks, dropping the connection after `fail_after` bytes."""
+    fake_response = requests.models.Response()
+    fake_response.status_code = status_code
+    data = json.dumps(body).encode("utf-8")
+
+    def iter_content(chunk_size=1, decode_unicode=False):
+        for i in range(0, len(data), 8):
+            if fail_after is not None and i >= fail_after:
+                raise ChunkedEncodingError("Connection broken")
+            yield data[i:i + 8]
+    fake_response.iter_content = iter_content
+    fake_response.raw = io.BytesIO(data)
+    fake_response.json = Mock(return_value=body)
+    return fake_response
+
+
+class TestStreamIncrementalExport(unittest.TestCase):
+    """Test that incremental export pages are parsed as they are read."""
+
+    PAGES = [
+        {"tickets": [{"id": 1}, {"id": 2}], "after_cursor": "c1", "end_of_stream": False},
+        {"tickets": [{"id": 3}], "after_cursor": "c2", "end_of_stream": True},
+    ]
+
+    @patch("requests.Session.get")
+    def test_pages_are_followed_by_cursor(self, mock_get):
+        mock_get.side_effect = [streamed_get(200, page) for page in self.PAGES]
+        records = list(http.stream_incremental_export("some_url", "some_token", REQUEST_TIMEOUT, 0,
+                                                      "metric_sets", "tickets"))
+
+        self.assertEqual([1, 2, 3], [record["id"] for record in records])
+        self.assertEqual({"cursor": "c1", "include": "metric_sets"}, mock_get.call_args_list[1].kwargs["params"])
+        self.assertTrue(all(call.kwargs["stream"] for call in mock_get.call_args_list))
+
+    @patch("requests.Session.get")
+    def test_export_resumes_from_cursor_with_page_ends(self, mock_get):
+        mock_get.side_effect = [streamed_get(200, page) for page in self.PAGES]
+        records = list(http.stream_incremental_export("some_url", "some_token", REQUEST_TIMEOUT, 0,
+                                                      None, "tickets", cursor="c0", page_ends=True))
+
+        self.assertEqual([{"id": 1}, {"id": 2}, http.ExportPageEnd("c1", False),
+                          {"id": 3}, http.ExportPageEnd("c2", True)], records)
+        self.assertEqual({"cursor": "c0", "include": None}, mock_get.call_args_list[0].kwargs["params"])
+
+    @patch("requests.Session.get")
+    def test_page_is_requested_again_when_connection_drops(self, mock_get):
+        mock_get.side_effect = [
+            streamed_get(200, self.PAGES[0], fail_after=24),
+            streamed_get(200, self.PAGES[0]),
+            streamed_get(200, self.PAGES[1]),
+        ]
+        records = list(http.stream_incremental_export("some_url", "some_token", REQUEST_TIMEOUT, 0, None, "tickets"))
+
+        # Records read before the connection dropped are not yielded twice
+        self.assertEqual([1, 2, 3], [record["id"] for record in records])
+        self.assertEqual(3, mock_get.call_count)
+
+    @patch("time.sleep")
+    @patch("requests.Session.get")
+    def test_error_response_is_raised(self, mock_get, mock_sleep):
+        mock_get.return_value = streamed_get(403, {"error": "Forbidden"})
+        with self.assertRaises(http.ZendeskForbiddenError):
+            list(http.stream_incremental_export("some_url", "some_token", REQUEST_TIMEOUT, 0, None, "tickets"))
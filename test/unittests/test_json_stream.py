@@ -0,0 +1,52 @@
+import json
+import unittest
+
+from tap_zendesk import json_stream
+
+PAGE = {
+    "tickets": [
+        {"id": 1, "subject": "Café ☕ [urgent], {\"quoted\"}", "tags": ["a", "b"], "metric_set": {"reopens": 0}},
+        {"id": 2, "subject": "", "score": -12.5e3, "tags": [], "via": None, "is_public": True},
+        {"id": 1234567890123, "custom_fields": [{"id": 3, "value": False}]},
+    ],
+    "after_cursor": "MTY3MjUzMTIwMA==",
+    "end_of_stream": False,
+    "count": 3,
+}
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterItems(unittest.TestCase):
+
+    def test_matches_json_loads_for_any_chunk_size(self):
+        body = json.dumps(PAGE, indent=1, ensure_ascii=False).encode("utf-8")
+        for size in (1, 2, 3, 7, 64, len(body)):
+            fields = {}
+            items = list(json_stream.iter_items(chunked(body, size), "tickets", fields))
+            self.assertEqual(PAGE["tickets"], items)
+            self.assertEqual({"after_cursor": "MTY3MjUzMTIwMA==", "end_of_stream": False, "count": 3}, fields)
+
+    def test_items_are_yielded_before_the_page_is_read(self):
+        body = json.dumps(PAGE).encode("utf-8")
+        chunks = iter(chunked(body, 16))
+        fields = {}
+        items = json_stream.iter_items(chunks, "tickets", fields)
+        self.assertEqual(1, next(items)["id"])
+        # Less than the whole body has been read and the cursor is not known yet
+        self.assertIsNotNone(next(chunks, None))
+        self.assertNotIn("after_cursor", fields)
+
+    def test_empty_and_missing_arrays(self):
+        fields = {}
+        self.assertEqual([], list(json_stream.iter_items([b'{"users": [], "end_of_stream": true}'], "users", fields)))
+        self.assertEqual({"end_of_stream": True}, fields)
+        self.assertEqual([], list(json_stream.iter_items([b'{}'], "users", {})))
+        self.assertEqual([], list(json_stream.iter_items([b'{"count": 0}'], "users", {})))
+
+    def test_invalid_json_raises(self):
+        for body in (b'{"users": [{"id": 1} {"id": 2}]}', b'{"users": [{"id": 1}', b'[]', b''):
+            with self.assertRaises(json.JSONDecodeError):
+                list(json_stream.iter_items(chunked(body, 4), "users", {}))
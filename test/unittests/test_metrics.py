@@ -0,0 +1,111 @@
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+from tap_zendesk import metrics
+
+
+@patch('tap_zendesk.metrics.LOGGER.info')
+@patch('tap_zendesk.metrics.time.monotonic')
+class TestMetrics(unittest.TestCase):
+
+    def logged(self, mock_info, prefix):
+        return [call.args for call in mock_info.call_args_list if call.args[0].startswith(prefix)]
+
+    def test_counts_are_aggregated_per_window(self, mock_monotonic, mock_info):
+        mock_monotonic.side_effect = [0, 1, 2, 301, 301, 602, 602, 700, 1000]
+        recorder = metrics.Metrics(capture_rate=300, snapshots=False)
+
+        # A window is closed by the first capture after it ends, which counts towards it
+        for _ in range(6):
+            recorder.capture('ticket')
+        recorder.aggregate_rates()
+
+        stats = recorder.rates['ticket']
+        self.assertEqual((3, 6, 1, 4), (stats.windows, stats.total, stats.minimum, stats.maximum))
+        self.assertEqual([4, 1, 1], list(stats.recent))
+        self.assertEqual([("Synced average of %s %ss per %s seconds", 2, 'ticket', 300)],
+                         self.logged(mock_info, "Synced average"))
+        self.assertEqual([("Synced total of %s %ss in %s seconds", 6, 'ticket', 900)],
+                         self.logged(mock_info, "Synced total"))
+
+    def test_snapshots_are_logged_when_a_window_ends(self, mock_monotonic, mock_info):
+        mock_monotonic.side_effect = [0, 1, 300, 301]
+        recorder = metrics.Metrics(capture_rate=300)
+
+        recorder.capture('ticket_audit')
+        recorder.capture('ticket_audit')
+        self.assertEqual([], self.logged(mock_info, "Synced"))
+        recorder.capture('ticket_audit')
+
+        self.assertEqual([("Synced max of %s %ss per %s seconds", 3, 'ticket_audit', 300)],
+                         self.logged(mock_info, "Synced max"))
+
+    def test_nothing_captured(self, mock_monotonic, mock_info):
+        mock_monotonic.return_value = 0
+        metrics.Metrics().aggregate_rates()
+        mock_info.assert_called_once_with("No zendesk metrics were captured")
+
+    def test_captures_from_several_threads_while_rates_are_aggregated(self, mock_monotonic, mock_info):
+        mock_monotonic.return_value = 0
+        recorder = metrics.Metrics(capture_rate=300, snapshots=False)
+        done = threading.Event()
+        errors = []
+        # Switch threads as often as possible to interleave the captures with the aggregation
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        def run(func):
+            try:
+                func()
+            except Exception as e: # pylint: disable=broad-except
+                errors.append(e)
+
+        def capture(thread):
+            for i in range(2000):
+                # New metrics keep being added to the window while it is aggregated
+                recorder.capture('metric_{}_{}'.format(thread, i))
+
+        def aggregate():
+            while not done.is_set():
+                recorder.aggregate_rates(log=False)
+                recorder.log_aggregate_rates()
+
+        threads = [threading.Thread(target=run, args=(lambda thread=thread: capture(thread),)) for thread in range(4)]
+        aggregator = threading.Thread(target=run, args=(aggregate,))
+        for thread in threads + [aggregator]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        aggregator.join()
+        recorder.aggregate_rates(log=False)
+
+        self.assertEqual([], errors)
+        self.assertEqual(8000, sum(stats.total for stats in recorder.rates.values()))
+
+class TestRateStats(unittest.TestCase):
+
+    def test_mean_and_percentiles(self):
+        stats = metrics.RateStats()
+        for count in [5, 1, 4, 2, 3]:
+            stats.add(count)
+        self.assertEqual(3, stats.mean())
+        stats.add(4)
+        self.assertEqual(3.1666666666666665, stats.mean())
+        self.assertEqual((4, 5), (stats.percentile(50), stats.percentile(95)))
+
+    def test_percentiles_cover_the_latest_windows(self):
+        stats = metrics.RateStats()
+        for count in range(metrics.ROLLING_WINDOWS + 100):
+            stats.add(count)
+        self.assertEqual(metrics.ROLLING_WINDOWS, len(stats.recent))
+        self.assertEqual((0, 100), (stats.minimum, min(stats.recent)))
+
+    def test_from_config(self):
+        recorder = metrics.Metrics.from_config({'metrics_window_seconds': '60', 'metrics_snapshots': 'false'})
+        self.assertEqual((60.0, False), (recorder.capture_rate, recorder.snapshots))
+        recorder = metrics.Metrics.from_config({})
+        self.assertEqual((metrics.DEFAULT_CAPTURE_RATE, True), (recorder.capture_rate, recorder.snapshots))
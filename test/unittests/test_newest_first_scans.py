@@ -0,0 +1,116 @@
+import datetime
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pytz
+from tap_zendesk import http, streams
+
+NOW = datetime.datetime(2023, 1, 31, 0, 0, 0, tzinfo=pytz.UTC)
+BOOKMARK = "2023-01-20T00:00:00Z"
+
+
+def group(group_id, day):
+    return {"id": group_id, "updated_at": "2023-01-{:02d}T00:00:00Z".format(day)}
+
+
+class FakePages():
+    """ Cursor based pages of groups, remembering how many of them were read """
+    def __init__(self, pages, item_key="groups"):
+        self.pages = pages
+        self.item_key = item_key
+        self.read = 0
+
+    def __call__(self, url, access_token, request_timeout, page_size, cursor=None, **kwargs):
+        for page in self.pages:
+            self.read += 1
+            yield {self.item_key: [dict(record) for record in page]}
+
+
+@patch("tap_zendesk.streams.utils.now", MagicMock(return_value=NOW))
+@patch("tap_zendesk.http.get_cursor_based")
+class TestNewestFirstScans(unittest.TestCase):
+    PAGES = [[group(1, 30), group(2, 25)], [group(3, 21), group(4, 10)], [group(5, 9), group(6, 8)], [group(7, 1)]]
+
+    def sync(self, stream_class, state, config=None):
+        instance = stream_class(None, {"subdomain": "acme", "access_token": "token", **(config or {})})
+        instance.stream = MagicMock(tap_stream_id=stream_class.name)
+        return [record["id"] for _, record in instance.sync(state)]
+
+    def state(self, last_full_scan="2023-01-30T12:00:00Z"):
+        return {"bookmarks": {"groups": {"updated_at": BOOKMARK, "last_full_scan": last_full_scan}}}
+
+    def test_scan_stops_at_the_first_page_older_than_the_bookmark(self, mock_get_cursor_based):
+        pages = FakePages(self.PAGES)
+        mock_get_cursor_based.side_effect = pages
+
+        self.assertEqual([1, 2, 3], self.sync(streams.Groups, self.state()))
+        self.assertEqual(3, pages.read)
+        self.assertEqual({"sort": "-updated_at"}, mock_get_cursor_based.call_args.kwargs["params"])
+
+    def test_every_page_is_read_when_the_full_scan_is_due(self, mock_get_cursor_based):
+        pages = FakePages(self.PAGES)
+        mock_get_cursor_based.side_effect = pages
+        state = self.state("2023-01-29T00:00:00Z")
+
+        self.assertEqual([1, 2, 3], self.sync(streams.Groups, state))
+        self.assertEqual(4, pages.read)
+        self.assertEqual("2023-01-31T00:00:00.000000Z", state["bookmarks"]["groups"]["last_full_scan"])
+
+    def test_first_sync_is_a_full_scan(self, mock_get_cursor_based):
+        pages = FakePages(self.PAGES)
+        mock_get_cursor_based.side_effect = pages
+        state = {"bookmarks": {"groups": {"updated_at": BOOKMARK}}}
+
+        self.sync(streams.Groups, state)
+
+        self.assertEqual(4, pages.read)
+        self.assertIn("last_full_scan", state["bookmarks"]["groups"])
+
+    def test_full_scan_interval_is_configurable(self, mock_get_cursor_based):
+        pages = FakePages(self.PAGES)
+        mock_get_cursor_based.side_effect = pages
+
+        self.sync(streams.Groups, self.state(), {"full_scan_interval_hours": 6})
+
+        self.assertEqual(4, pages.read)
+
+    @patch("tap_zendesk.streams.LOGGER.warning")
+    def test_every_page_is_read_when_objects_are_out_of_order(self, mock_warning, mock_get_cursor_based):
+        pages = FakePages([[group(1, 30), group(2, 5)], [group(3, 25)], [group(4, 4)]])
+        mock_get_cursor_based.side_effect = pages
+
+        self.assertEqual([1, 3], self.sync(streams.Groups, self.state()))
+        self.assertEqual(3, pages.read)
+        mock_warning.assert_called_with("%s: Objects are not listed newest first, reading every page", "groups")
+
+    @patch("tap_zendesk.streams.LOGGER.warning")
+    def test_every_page_is_read_when_sorting_is_rejected(self, mock_warning, mock_get_cursor_based):
+        pages = FakePages(self.PAGES)
+
+        def get_cursor_based(*args, **kwargs):
+            if kwargs.get("params"):
+                raise http.ZendeskBadRequestError("HTTP-error-code: 400, Error: Invalid sort")
+            yield from pages(*args, **kwargs)
+        mock_get_cursor_based.side_effect = get_cursor_based
+
+        self.assertEqual([1, 2, 3], self.sync(streams.Groups, self.state()))
+        self.assertEqual(4, pages.read)
+        self.assertEqual("groups", mock_warning.call_args.args[1])
+
+    def test_macros_are_sorted_by_updated_at(self, mock_get_cursor_based):
+        pages = FakePages([[group(1, 30)], [group(2, 1)], [group(3, 1)]], "macros")
+        mock_get_cursor_based.side_effect = pages
+        state = {"bookmarks": {"macros": {"updated_at": BOOKMARK, "last_full_scan": "2023-01-30T12:00:00Z"}}}
+
+        self.assertEqual([1], self.sync(streams.Macros, state))
+        self.assertEqual(2, pages.read)
+        self.assertEqual({"sort_by": "updated_at", "sort_order": "desc"},
+                         mock_get_cursor_based.call_args.kwargs["params"])
+
+    def test_ticket_fields_are_always_read_in_full(self, mock_get_cursor_based):
+        pages = FakePages([[group(1, 30)], [group(2, 1)], [group(3, 1)]], "ticket_fields")
+        mock_get_cursor_based.side_effect = pages
+        state = {"bookmarks": {"ticket_fields": {"updated_at": BOOKMARK, "last_full_scan": "2023-01-30T12:00:00Z"}}}
+
+        self.assertEqual([1], self.sync(streams.TicketFields, state))
+        self.assertEqual(3, pages.read)
@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from tap_zendesk import streams
+
+
+class TestOrganizations(unittest.TestCase):
+
+    @patch("tap_zendesk.http.call_api_json")
+    def test_sync_reads_the_incremental_export_directly(self, mock_call_api_json):
+        mock_call_api_json.side_effect = [
+            {"organizations": [{"id": 1, "updated_at": "2023-01-02T00:00:00Z"}],
+             "next_page": "https://test.zendesk.com/api/v2/incremental/organizations.json?start_time=1672617600",
+             "end_of_stream": False},
+            {"organizations": [{"id": 2, "updated_at": "2023-01-03T00:00:00Z"}],
+             "next_page": None, "end_of_stream": True},
+        ]
+        client = MagicMock()
+        state = {"bookmarks": {"organizations": {"updated_at": "2023-01-01T00:00:00Z"}}}
+        instance = streams.Organizations(client, {"subdomain": "test", "access_token": "token"})
+        instance.stream = "organizations"
+
+        records = list(instance.sync(state))
+
+        self.assertEqual([("organizations", {"id": 1, "updated_at": "2023-01-02T00:00:00Z"}),
+                          ("organizations", {"id": 2, "updated_at": "2023-01-03T00:00:00Z"})], records)
+        self.assertEqual("2023-01-03T00:00:00Z", state["bookmarks"]["organizations"]["updated_at"])
+        first_call = mock_call_api_json.call_args_list[0]
+        self.assertEqual("https://test.zendesk.com/api/v2/incremental/organizations.json", first_call.args[0])
+        self.assertEqual(1672531200, first_call.kwargs["params"]["start_time"])
+        # Records are plain dicts, Zenpy is not involved
+        client.organizations.incremental.assert_not_called()
@@ -0,0 +1,73 @@
+import io
+import json
+import unittest
+from unittest.mock import patch
+import singer
+from tap_zendesk import output
+
+
+class TestMessageWriter(unittest.TestCase):
+    """
+    Confirm that Singer messages are buffered, flushed according to the configured policy and
+    written in the order they were emitted.
+    """
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_messages_are_buffered_until_message_limit(self, mock_stdout):
+        writer = output.MessageWriter(max_messages=3, flush_interval=60)
+        with output.buffered_output(writer):
+            singer.write_record("tags", {"name": "a"})
+            singer.write_record("tags", {"name": "b"})
+            self.assertEqual("", mock_stdout.getvalue())
+
+            singer.write_record("tags", {"name": "c"})
+            self.assertEqual(3, len(mock_stdout.getvalue().splitlines()))
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_buffer_is_flushed_on_byte_limit(self, mock_stdout):
+        writer = output.MessageWriter(max_bytes=10, flush_interval=60)
+        with output.buffered_output(writer):
+            singer.write_record("tags", {"name": "a"})
+            self.assertEqual(1, len(mock_stdout.getvalue().splitlines()))
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_state_is_written_after_its_records(self, mock_stdout):
+        writer = output.MessageWriter(max_messages=2, flush_interval=60)
+        state = {"bookmarks": {"tags": {"updated_at": "2023-01-01T00:00:00Z"}}}
+        with output.buffered_output(writer):
+            singer.write_record("tags", {"name": "a"})
+            singer.write_state(state)
+            singer.write_record("tags", {"name": "b"})
+            # Later changes to the state dict must not leak into the buffered STATE message
+            state["bookmarks"]["tags"]["updated_at"] = "2024-01-01T00:00:00Z"
+
+        messages = [json.loads(line) for line in mock_stdout.getvalue().splitlines()]
+        self.assertEqual(["RECORD", "STATE", "RECORD"], [message["type"] for message in messages])
+        self.assertEqual("2023-01-01T00:00:00Z", messages[1]["value"]["bookmarks"]["tags"]["updated_at"])
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_write_message_is_restored_on_exit(self, mock_stdout):
+        write_message = singer.messages.write_message
+        with self.assertRaises(ValueError):
+            with output.buffered_output(output.MessageWriter(flush_interval=60)):
+                singer.write_record("tags", {"name": "a"})
+                raise ValueError()
+        self.assertIs(write_message, singer.messages.write_message)
+        # Buffered messages are still written out
+        self.assertEqual(1, len(mock_stdout.getvalue().splitlines()))
+
+    def test_get_writer_uses_config(self):
+        writer = output.get_writer({"output_buffer_bytes": "100", "output_buffer_messages": 10,
+                                    "output_flush_interval": 0.5})
+        self.assertEqual((100, 10, 0.5), (writer.max_bytes, writer.max_messages, writer.flush_interval))
+        self.assertIs(output.singer_encoder, writer.encoder)
+
+    def test_get_writer_rejects_unknown_encoder(self):
+        with self.assertRaises(ValueError):
+            output.get_writer({"output_json_encoder": "yaml"})
+
+    @unittest.skipIf(output.orjson is None, "orjson is not installed")
+    def test_orjson_encoder_matches_singer_encoder(self):
+        message = singer.RecordMessage(stream="tags", record={"name": "é", "count": 1.5, "tags": [None]})
+        self.assertEqual(json.loads(output.singer_encoder(message)),
+                         json.loads(output.orjson_encoder(message)))
@@ -0,0 +1,38 @@
+import json
+import unittest
+from zenpy.lib.api_objects import Organization, SlaPolicy, TicketMetricEvent
+from zenpy.lib.proxy import ProxyList
+from tap_zendesk.sync import process_record, ZendeskEncoder
+
+
+def legacy_process_record(record):
+    return json.loads(json.dumps(record, cls=ZendeskEncoder))
+
+
+class TestProcessRecord(unittest.TestCase):
+    """
+    Confirm that process_record converts Zenpy objects the same way the JSON round-trip through
+    ZendeskEncoder does.
+    """
+
+    def test_organization_matches_json_round_trip(self):
+        organization = Organization(id=1, name="acme", tags=ProxyList(["a", "b"]),
+                                    organization_fields={"region": "emea"},
+                                    created_at="2020-01-01T00:00:00Z")
+        self.assertEqual(legacy_process_record(organization), process_record(organization))
+
+    def test_nested_structures_match_json_round_trip(self):
+        policy = SlaPolicy(id=2, title="Urgent",
+                           filter={"all": [{"field": "type", "operator": "is", "value": "incident"}]},
+                           policy_metrics=[{"priority": "low", "target": 60}])
+        self.assertEqual(legacy_process_record(policy), process_record(policy))
+
+    def test_dirty_object_matches_json_round_trip(self):
+        event = TicketMetricEvent(id=3, ticket_id=4, type="measure", time="2020-01-01T00:00:00Z")
+        event._clean_dirty()
+        event.metric = "reply_time"
+        self.assertEqual(legacy_process_record(event), process_record(event))
+
+    def test_plain_dict_is_returned_as_is(self):
+        record = {"id": 1, "tags": ["a"]}
+        self.assertIs(record, process_record(record))
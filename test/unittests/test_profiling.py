@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tap_zendesk import profiling
+from tap_zendesk.sync import sync_stream
+
+SCHEMA = {'type': 'object', 'properties': {'name': {'type': ['null', 'string']}}}
+
+
+class TestProfiler(unittest.TestCase):
+
+    @patch('tap_zendesk.profiling.time.perf_counter', side_effect=[0, 1, 3, 10])
+    def test_stages_are_timed_exclusive_of_the_stages_within(self, mock_perf_counter):
+        profiler = profiling.Profiler()
+
+        with patch('tap_zendesk.profiling.PROFILER', profiler):
+            fetch = profiling.timed('fetch', lambda: 'page')
+            profiling.timed('read', fetch)()
+
+        self.assertEqual({'fetch': [2, 1], 'read': [8, 1]}, profiler.stages['other'])
+
+    def test_nothing_is_wrapped_without_profiling(self):
+        records = iter([1])
+        self.assertIs(sorted, profiling.timed('convert', sorted))
+        self.assertIs(records, profiling.timed_iter('read', records))
+
+    def test_a_timed_generator_left_part_way_is_closed(self):
+        closed = []
+
+        def pages():
+            try:
+                yield 1
+                yield 2
+            finally:
+                closed.append(True)
+
+        with patch('tap_zendesk.profiling.PROFILER', profiling.Profiler()):
+            items = profiling.timed_iter('read', pages())
+        self.assertEqual(1, next(items))
+        items.close()
+        self.assertEqual([True], closed)
+
+    def test_from_config(self):
+        self.assertIsNone(profiling.Profiler.from_config({}))
+        profiler = profiling.Profiler.from_config({'profile': 'true', 'profile_output_dir': '/tmp/profiles'})
+        self.assertEqual(('/tmp/profiles', profiling.DEFAULT_TOP_FUNCTIONS), (profiler.output_dir, profiler.top_functions))
+
+
+@patch('tap_zendesk.sync.singer.write_record')
+class TestProfiledSync(unittest.TestCase):
+
+    def sync(self, profiler):
+        stream = MagicMock(tap_stream_id='tags', metadata=[])
+        stream.schema.to_dict.return_value = SCHEMA
+        instance = MagicMock(stream=stream, replication_method='FULL_TABLE')
+        instance.sync.return_value = iter([(stream, {'name': 'a'}), (stream, {'name': 'b'})])
+        with patch('tap_zendesk.profiling.PROFILER', profiler), profiler.profile_stream('tags'):
+            return sync_stream({}, '2020-01-01T00:00:00Z', instance)
+
+    def test_stages_of_each_stream_are_timed(self, mock_write_record):
+        profiler = profiling.Profiler()
+
+        self.assertEqual(2, self.sync(profiler))
+
+        self.assertEqual(2, mock_write_record.call_count)
+        stages = profiler.stages['tags']
+        self.assertEqual({'read': 3, 'convert': 2, 'transform': 2, 'write': 2},
+                         {stage: calls for stage, (_, calls) in stages.items()})
+        self.assertIn('tags', profiler.wall_times)
+
+    @patch('tap_zendesk.profiling.LOGGER.info')
+    def test_the_slowest_stream_is_profiled(self, mock_info, mock_write_record):
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = profiling.Profiler(directory, top_functions=5)
+            self.sync(profiler)
+            mock_info.reset_mock()
+            profiler.log_summary()
+
+            self.assertTrue(os.path.exists(os.path.join(directory, 'tags.prof')))
+        self.assertEqual('tags', mock_info.call_args_list[0].args[1])
+        self.assertEqual('tags', mock_info.call_args.args[1])
+        self.assertIn('cumulative', mock_info.call_args.args[3])
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from tap_zendesk import http, rate_limit
+
+AUDITS_URL = "https://test.zendesk.com/api/v2/tickets/1/audits.json"
+USERS_URL = "https://test.zendesk.com/api/v2/users.json"
+EXPORT_URL = "https://test.zendesk.com/api/v2/incremental/tickets/cursor.json"
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_capacity_is_available_straight_away(self):
+        bucket = rate_limit.TokenBucket(600)
+        self.assertEqual(10, bucket.capacity)
+        self.assertEqual([0] * 10, [bucket.reserve() for _ in range(10)])
+
+    @patch("tap_zendesk.rate_limit.time.monotonic", return_value=100.0)
+    def test_requests_beyond_capacity_are_spread_evenly(self, mock_monotonic):
+        bucket = rate_limit.TokenBucket(60)
+        self.assertEqual(0, bucket.reserve())
+        # One token a second
+        self.assertEqual(1, bucket.reserve())
+        self.assertEqual(2, bucket.reserve())
+
+        mock_monotonic.return_value = 103.0
+        self.assertEqual(0, bucket.reserve())
+
+
+@patch("tap_zendesk.rate_limit.time.monotonic", return_value=100.0)
+class TestMinuteWindowBucket(unittest.TestCase):
+
+    def test_burst_of_export_requests_is_not_delayed(self, mock_monotonic):
+        limiter = rate_limit.RateLimiter.from_config({})
+        self.assertEqual([0] * 10, [limiter.delay(EXPORT_URL) for _ in range(10)])
+        # The 11th waits for the first to be a minute old
+        self.assertEqual(60, limiter.delay(EXPORT_URL))
+
+        mock_monotonic.return_value = 170.0
+        self.assertEqual(0, limiter.delay(EXPORT_URL))
+
+    def test_fewer_requests_once_slowed_down(self, mock_monotonic):
+        bucket = rate_limit.MinuteWindowBucket(10)
+        bucket.adapt(remaining=2, resets=60)
+        self.assertEqual([0, 0, 60, 60], [bucket.reserve() for _ in range(4)])
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_default_limits(self):
+        limiter = rate_limit.RateLimiter.from_config({})
+        self.assertIsNone(limiter.account_bucket)
+        self.assertEqual([("ticket_audits", 450), ("incremental_exports", 10)],
+                         [(name, bucket.per_minute) for name, _, bucket in limiter.endpoint_buckets])
+
+    def test_limits_from_config(self):
+        limiter = rate_limit.RateLimiter.from_config({
+            "rate_limit_per_minute": "0",
+            "ticket_audits_rate_limit_per_minute": 100,
+            "incremental_exports_rate_limit_per_minute": "10",
+        })
+        self.assertIsNone(limiter.account_bucket)
+        self.assertEqual([100, 10], [bucket.per_minute for _, _, bucket in limiter.endpoint_buckets])
+
+    def test_request_takes_account_and_endpoint_tokens(self):
+        account_bucket = MagicMock(reserve=MagicMock(return_value=0.5))
+        audits_bucket = MagicMock(reserve=MagicMock(return_value=2))
+        limiter = rate_limit.RateLimiter(account_bucket, [("ticket_audits", rate_limit.ENDPOINT_CLASSES[0][1], audits_bucket)])
+
+        self.assertEqual(2, limiter.delay(AUDITS_URL))
+        self.assertEqual(0.5, limiter.delay(USERS_URL))
+        self.assertEqual(2, account_bucket.reserve.call_count)
+        self.assertEqual(1, audits_bucket.reserve.call_count)
+
+    def test_buckets_adapt_to_quota_headers(self):
+        limiter = rate_limit.RateLimiter.from_config({"rate_limit_per_minute": 600})
+        audits_bucket = limiter.endpoint_buckets[0][2]
+
+        # Plenty of quota left: the configured rates are kept
+        limiter.observe(AUDITS_URL, {"ratelimit-remaining": "500", "ratelimit-reset": "10"})
+        self.assertEqual(10, limiter.account_bucket.rate)
+        self.assertEqual(20, limiter.concurrency("ticket_audits", 20))
+
+        # 30 requests left for the next 15 seconds, and 45 audit requests for the next 30
+        limiter.observe(AUDITS_URL, {"Ratelimit-Remaining": "30", "Ratelimit-Reset": "15",
+                                     "Zendesk-RateLimit-Ticket-Audits": "total=450; remaining=45; resets=30"})
+        self.assertEqual(2, limiter.account_bucket.rate)
+        self.assertEqual(1.5, audits_bucket.rate)
+        self.assertEqual(4, limiter.concurrency("ticket_audits", 20))
+
+        # Headers of other endpoints don't slow down the audits bucket
+        limiter.observe(USERS_URL, {"X-Rate-Limit-Remaining": "600",
+                                    "Zendesk-RateLimit-Users": "total=100; remaining=1; resets=60"})
+        self.assertEqual(10, limiter.account_bucket.rate)
+        self.assertEqual(1.5, audits_bucket.rate)
+
+    def test_endpoint_quotas_without_resets(self):
+        limiter = rate_limit.RateLimiter.from_config({})
+        audits_bucket = limiter.endpoint_buckets[0][2]
+
+        # Two quotas left with as many requests, one of them without `resets`
+        limiter.observe(AUDITS_URL, {"Zendesk-RateLimit-Ticket-Audits": "total=450; remaining=30; resets=15",
+                                     "Zendesk-RateLimit-Tickets": "total=450; remaining=30"})
+        self.assertLess(audits_bucket.rate, audits_bucket.max_rate)
+
+    @patch("tap_zendesk.rate_limit.time.monotonic", return_value=100.0)
+    def test_exhausted_account_quota_pauses_without_account_bucket(self, mock_monotonic):
+        limiter = rate_limit.RateLimiter.from_config({})
+
+        limiter.observe(USERS_URL, {"ratelimit-remaining": "5", "ratelimit-reset": "20"})
+        self.assertEqual(0, limiter.delay(USERS_URL))
+
+        limiter.observe(USERS_URL, {"ratelimit-remaining": "0", "ratelimit-reset": "20"})
+        self.assertEqual(20, limiter.delay(USERS_URL))
+        self.assertEqual(1, limiter.concurrency("ticket_audits", 20))
+
+        mock_monotonic.return_value = 120.0
+        self.assertEqual(0, limiter.delay(USERS_URL))
+
+    def test_missing_headers_are_ignored(self):
+        limiter = rate_limit.RateLimiter.from_config({"rate_limit_per_minute": 700})
+        limiter.observe(USERS_URL, None)
+        limiter.observe(USERS_URL, MagicMock())
+        self.assertEqual(1, limiter.account_bucket.saturation)
+
+    def test_only_the_first_caller_backs_off(self):
+        limiter = rate_limit.RateLimiter()
+        paused_until = limiter.pause(10)
+        self.assertIsNotNone(paused_until)
+        self.assertIsNone(limiter.pause(10))
+        self.assertGreater(limiter.delay(USERS_URL), 9)
+        self.assertEqual(1, limiter.concurrency("ticket_audits", 20))
+
+        limiter.resume(paused_until)
+        self.assertEqual(0, limiter.delay(USERS_URL))
+        self.assertEqual(20, limiter.concurrency("ticket_audits", 20))
+
+    def test_nested_requests_are_counted_once(self):
+        limiter = MagicMock()
+        with patch("tap_zendesk.rate_limit.LIMITER", limiter):
+            with rate_limit.limited(USERS_URL):
+                with rate_limit.limited(USERS_URL):
+                    pass
+            with rate_limit.limited(USERS_URL):
+                pass
+        self.assertEqual(2, limiter.wait.call_count)
+
+
+class TestRateLimitedRequests(unittest.TestCase):
+
+    @patch("tap_zendesk.http.sleep")
+    def test_429_waits_behind_request_already_backing_off(self, mock_sleep):
+        limiter = rate_limit.RateLimiter()
+        exception = http.ZendeskRateLimitError("", MagicMock(status_code=429, headers={"Retry-After": "10"}))
+        with patch("tap_zendesk.rate_limit.LIMITER", limiter):
+            # The first request to hit the rate limit backs off and lifts the pause when done
+            self.assertFalse(http.is_fatal(exception))
+            mock_sleep.assert_called_once_with(10)
+            self.assertEqual(0, limiter.paused_until)
+
+            # A request hitting the rate limit while another one backs off waits in the limiter instead
+            limiter.pause(10)
+            self.assertFalse(http.is_fatal(exception))
+            self.assertEqual(1, mock_sleep.call_count)
+
+    @patch("requests.Session.get")
+    def test_call_api_waits_for_limiter(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={}))
+        limiter = MagicMock()
+        with patch("tap_zendesk.rate_limit.LIMITER", limiter):
+            http.call_api(USERS_URL, 300, params={}, headers={})
+        limiter.wait.assert_called_once_with(USERS_URL)
+
+    def test_call_api_async_waits_for_limiter(self):
+        response = MagicMock(status=200, json=AsyncMock(return_value={"audits": []}),
+                             read=AsyncMock(return_value=b'{"audits": []}'))
+        session = MagicMock()
+        session.get.return_value.__aenter__ = AsyncMock(return_value=response)
+        session.get.return_value.__aexit__ = AsyncMock(return_value=False)
+        limiter = MagicMock(wait_async=AsyncMock())
+        with patch("tap_zendesk.rate_limit.LIMITER", limiter):
+            result = asyncio.run(http.call_api_async(session, AUDITS_URL, 300, params={}, headers={}))
+        self.assertEqual({"audits": []}, result)
+        limiter.wait_async.assert_awaited_once_with(AUDITS_URL)
+
+
+class TestParallelExports(unittest.TestCase):
+
+    def test_parallel_windows_are_paced_without_429s(self):
+        """ Windows of a backfill exported on 3 threads against Zendesk's 10 export requests a minute """
+        local = threading.local()
+        lock = threading.Lock()
+        sent = []
+
+        def fake_sleep(seconds):
+            # The clock stands still, so a request is sent as many seconds in as its thread waited
+            local.sent_at = seconds
+
+        def fake_get(url, **kwargs):
+            sent_at, local.sent_at = getattr(local, "sent_at", 0), 0
+            with lock:
+                over_quota = len([t for t in sent if sent_at - 60 < t <= sent_at]) >= 10
+                sent.append(sent_at)
+            if over_quota:
+                return MagicMock(status_code=429, headers={"Retry-After": "60"}, json=MagicMock(return_value={}))
+            return MagicMock(status_code=200, headers={}, json=MagicMock(return_value={"tickets": []}))
+
+        with patch("tap_zendesk.rate_limit.time", MagicMock(monotonic=MagicMock(return_value=0.0), sleep=fake_sleep)), \
+             patch("tap_zendesk.rate_limit.LIMITER", rate_limit.RateLimiter.from_config({})), \
+             patch("tap_zendesk.http.sleep") as mock_http_sleep, \
+             patch("requests.Session.get", side_effect=fake_get):
+            with ThreadPoolExecutor(3) as executor:
+                list(executor.map(lambda window: http.call_api(EXPORT_URL, 300, params={"window": window}, headers={}),
+                                  range(30)))
+
+        self.assertEqual(30, len(sent))
+        self.assertFalse(mock_http_sleep.called)
+        # 10 requests a minute, each burst sent straight away
+        self.assertEqual([0] * 10 + [60] * 10 + [120] * 10, sorted(round(t, 6) for t in sent))
@@ -40,7 +40,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
     A set of unit tests to ensure that requests are retrying properly for Timeout Error.
     """   
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_call_api_handles_timeout_error(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times,
         """
@@ -54,7 +54,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get', side_effect=5*[requests.exceptions.Timeout])
+    @patch('requests.Session.get', side_effect=5*[requests.exceptions.Timeout])
     def test_get_cursor_based_handles_timeout_error(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times,
         """
@@ -70,7 +70,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get', side_effect=[mocked_get(status_code=200, json={"key1": "val1", **PAGINATE_RESPONSE}),
+    @patch('requests.Session.get', side_effect=[mocked_get(status_code=200, json={"key1": "val1", **PAGINATE_RESPONSE}),
                                         requests.exceptions.Timeout, requests.exceptions.Timeout, 
                                         mocked_get(status_code=200, json={"key1": "val1", **SINGLE_RESPONSE})])
     def test_get_cursor_based_handles_timeout_error_in_pagination_call(self, mock_get, mock_sleep):
@@ -88,7 +88,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request call total 4 times(2 time retry call, 2 time 200 call)
         self.assertEqual(mock_get.call_count, 4)
 
-    @patch('requests.get', side_effect=5*[requests.exceptions.Timeout])
+    @patch('requests.Session.get', side_effect=5*[requests.exceptions.Timeout])
     def test_get_offset_based_handles_timeout_error(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times,
         """
@@ -104,7 +104,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get', side_effect=[mocked_get(status_code=200, json={"key1": "val1", **PAGINATE_RESPONSE}),
+    @patch('requests.Session.get', side_effect=[mocked_get(status_code=200, json={"key1": "val1", **PAGINATE_RESPONSE}),
                                         requests.exceptions.Timeout, requests.exceptions.Timeout, 
                                         mocked_get(status_code=200, json={"key1": "val1", **SINGLE_RESPONSE})])
     def test_get_offset_based_handles_timeout_error_in_pagination_call(self, mock_get, mock_sleep):
@@ -122,7 +122,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request call total 4 times(2 time retry call, 2 time 200 call)
         self.assertEqual(mock_get.call_count, 4)
 
-    @patch('requests.get', side_effect=5*[requests.exceptions.Timeout])
+    @patch('requests.Session.get', side_effect=5*[requests.exceptions.Timeout])
     def test_get_incremental_export_handles_timeout_error(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times,
         """
@@ -136,7 +136,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_without_parameter(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when `request_timeout` does not passed,
         """
@@ -151,7 +151,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_with_zero_str_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when string "0" value of `request_timeout` passed,
         """
@@ -166,7 +166,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_with_zero_int_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when int 0 value of `request_timeout` passed,
         """
@@ -181,7 +181,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_with_str_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when string value of `request_timeout` passed,
         """
@@ -196,7 +196,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_with_int_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when int value of `request_timeout` passed,
         """
@@ -211,7 +211,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_with_float_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when float value of `request_timeout` passed,
         """
@@ -225,7 +225,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
 
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_stream_timeout_error_with_empty_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when empty value of `request_timeout` passed,
         """
@@ -239,7 +239,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
 
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_without_parameter(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when `request_timeout` does not passed,
         """
@@ -254,7 +254,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_with_zero_str_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when stiring "0" value of `request_timeout` passed,
         """
@@ -269,7 +269,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_with_zero_int_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when int 0 value of `request_timeout` passed,
         """
@@ -284,7 +284,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_with_empty_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when empty value of `request_timeout` passed,
         """
@@ -299,7 +299,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_with_str_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when string value of `request_timeout` passed,
         """
@@ -314,7 +314,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_with_int_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when int value of `request_timeout` passed,
         """
@@ -329,7 +329,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         # Verify the request retry 5 times on timeout
         self.assertEqual(mock_get.call_count, 5)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_cursor_based_export_stream_timeout_error_with_float_value(self, mock_get, mock_sleep):
         """We mock request method to raise a `Timeout` and expect the tap to retry this up to 5 times when float value of `request_timeout` passed,
         """
@@ -359,7 +359,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -386,7 +386,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -414,7 +414,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -442,7 +442,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -470,7 +470,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -498,7 +498,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -526,7 +526,7 @@ class TestRequestTimeoutBackoff(unittest.TestCase):
         async def run_test():
             async with aiohttp.ClientSession() as session:
                 try:
-                    await ticket_audits.get_objects(session, 1)
+                    [page async for page in ticket_audits.get_objects(session, 1)]
                 except requests.exceptions.Timeout as e:
                     pass
 
@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+import requests
+
+import tap_zendesk
+from tap_zendesk import http, rate_limit, telemetry
+
+AUDITS_URL = 'https://acme.zendesk.com/api/v2/tickets/123/audits.json'
+
+
+def mocked_get(status_code, json=None, headers=None):
+    fake_response = requests.models.Response()
+    fake_response.status_code = status_code
+    fake_response.headers.update(headers or {})
+    fake_response.url = AUDITS_URL
+    fake_response.json = Mock(return_value=json or {})
+    return fake_response
+
+
+class TestEndpointTemplate(unittest.TestCase):
+
+    def test_ids_and_query_are_left_out(self):
+        self.assertEqual('/api/v2/tickets/{id}/audits.json', telemetry.endpoint_template(AUDITS_URL + '?page[size]=100'))
+        self.assertEqual('/api/v2/users/{id}.json', telemetry.endpoint_template('https://acme.zendesk.com/api/v2/users/7.json'))
+        self.assertEqual('/api/v2/incremental/tickets/cursor.json',
+                         telemetry.endpoint_template('https://acme.zendesk.com/api/v2/incremental/tickets/cursor.json'))
+        self.assertEqual('unknown', telemetry.endpoint_template(None))
+
+
+class TestTelemetry(unittest.TestCase):
+
+    @patch('tap_zendesk.telemetry.LOGGER.info')
+    def test_requests_are_counted_per_endpoint_and_logged_once_per_interval(self, mock_info):
+        recorder = telemetry.Telemetry(request_log_interval=2)
+        for ticket_id, seconds in enumerate([0.005, 0.02, 0.2, 3]):
+            recorder.record_request(AUDITS_URL.replace('123', str(ticket_id)), seconds, 200, 100, {'X-Request-Id': 'r'})
+        recorder.record_request(AUDITS_URL, 0.1, 429, 0)
+
+        stats = recorder.endpoints['/api/v2/tickets/{id}/audits.json']
+        self.assertEqual((5, 0, 1, 400), (stats.requests, stats.errors, stats.rate_limited, stats.bytes))
+        self.assertEqual((100, 5000), (stats.latency_percentile(50), stats.latency_percentile(95)))
+        self.assertEqual([1, 3, 5], [call.args[4] for call in mock_info.call_args_list])
+        self.assertEqual('r', mock_info.call_args_list[0].args[3])
+
+    def test_latencies_beyond_the_last_bucket(self):
+        stats = telemetry.EndpointStats()
+        stats.add_request(45, 500)
+        self.assertEqual((45000, 1), (stats.latency_percentile(95), stats.errors))
+
+    @patch('tap_zendesk.telemetry.LOGGER.info')
+    def test_summary_starts_with_the_slowest_endpoint(self, mock_info):
+        recorder = telemetry.Telemetry()
+        recorder.record_request('https://acme.zendesk.com/api/v2/tags', 0.1, 200, 10)
+        recorder.record_request(AUDITS_URL, 2, 200, 10)
+        mock_info.reset_mock()
+
+        recorder.log_summary()
+
+        self.assertEqual(['/api/v2/tickets/{id}/audits.json', '/api/v2/tags'],
+                         [call.args[1] for call in mock_info.call_args_list])
+
+    def test_from_config(self):
+        self.assertEqual(1, telemetry.Telemetry.from_config({'http_request_log_interval': '1'}).request_log_interval)
+        self.assertEqual(telemetry.DEFAULT_REQUEST_LOG_INTERVAL, telemetry.Telemetry.from_config({}).request_log_interval)
+
+
+@patch('tap_zendesk.telemetry.TELEMETRY', new_callable=telemetry.Telemetry)
+class TestInstrumentedRequests(unittest.TestCase):
+
+    @patch('tap_zendesk.request')
+    def test_requests_through_the_session_are_recorded(self, mock_request, mock_telemetry):
+        response = mocked_get(200)
+        response._content = b'{"tags": []}'
+        mock_request.return_value = response
+
+        tap_zendesk.request_metrics_patch(requests.Session(), 'GET', AUDITS_URL)
+
+        stats = mock_telemetry.endpoints['/api/v2/tickets/{id}/audits.json']
+        self.assertEqual((1, 12), (stats.requests, stats.bytes))
+
+    @patch('tap_zendesk.http.sleep')
+    @patch('tap_zendesk.request')
+    def test_429_of_the_pooled_session_is_backed_off_once(self, mock_request, mock_http_sleep, mock_telemetry):
+        responses = [mocked_get(429, headers={'Retry-After': '3'}), mocked_get(200)]
+        for response in responses:
+            response._content = b'{}'
+        mock_request.side_effect = responses
+        limiter = rate_limit.RateLimiter()
+
+        with patch('tap_zendesk.rate_limit.LIMITER', limiter):
+            http.call_api(AUDITS_URL, 300, params={}, headers={})
+
+        mock_http_sleep.assert_called_once_with(3)
+        self.assertEqual(0, limiter.paused_until)
+        stats = mock_telemetry.endpoints['/api/v2/tickets/{id}/audits.json']
+        self.assertEqual((2, 1), (stats.requests, stats.retries))
+        # The Retry-After, and the jittered wait of the backoff
+        self.assertGreaterEqual(stats.backoff_seconds, 3)
+
+    @patch('time.sleep')
+    @patch('tap_zendesk.http.sleep')
+    @patch('requests.Session.get')
+    def test_retries_and_backoff_of_sync_requests(self, mock_get, mock_http_sleep, mock_sleep, mock_telemetry):
+        mock_get.side_effect = [mocked_get(429, headers={'Retry-After': '3'}), mocked_get(500), mocked_get(200)]
+
+        http.call_api(AUDITS_URL, 300, params={}, headers={})
+
+        stats = mock_telemetry.endpoints['/api/v2/tickets/{id}/audits.json']
+        self.assertEqual(2, stats.retries)
+        # The Retry-After of the 429 and the two waits of the backoff
+        self.assertGreaterEqual(stats.backoff_seconds, 3)
+
+    @patch('tap_zendesk.http.async_sleep')
+    def test_async_requests_are_recorded(self, mock_sleep, mock_telemetry):
+        responses = [MagicMock(status=status, url=AUDITS_URL, headers={'Retry-After': '5'},
+                               json=AsyncMock(return_value={}), read=AsyncMock(return_value=b'{"audits": []}'))
+                     for status in (429, 200)]
+        session = MagicMock()
+        session.get.return_value.__aenter__ = AsyncMock(side_effect=responses)
+        session.get.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        asyncio.run(http.call_api_async(session, AUDITS_URL, 300, params={}, headers={}))
+
+        stats = mock_telemetry.endpoints['/api/v2/tickets/{id}/audits.json']
+        self.assertEqual((2, 1, 1, 5, 28), (stats.requests, stats.rate_limited, stats.retries,
+                                            stats.backoff_seconds, stats.bytes))
@@ -0,0 +1,181 @@
+import json
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+import singer
+from tap_zendesk import http, streams
+
+TICKET_EVENT = {
+    "id": 1001,
+    "ticket_id": 42,
+    "timestamp": 1672531200,
+    "created_at": "2023-01-01T00:00:00Z",
+    "updater_id": 7,
+    "via": "Web form",
+    "system": {"client": "Mozilla", "ip_address": "127.0.0.1"},
+    "metadata": {"custom": {}},
+    "event_type": "Audit",
+    "child_events": [
+        {"id": 1, "via": "Web form", "via_reference_id": None, "event_type": "Change",
+         "priority": "high", "previous_value": "low"},
+        {"id": 2, "via": "Web form", "via_reference_id": None, "event_type": "Comment",
+         "comment_present": True, "comment_public": True, "body": "Hello", "html_body": "<p>Hello</p>",
+         "plain_body": "Hello", "public": True, "author_id": 7, "attachments": []},
+    ],
+}
+
+
+def load_schema(name):
+    path = os.path.join(os.path.dirname(streams.__file__), "schemas", "{}.json".format(name))
+    with open(path, encoding="UTF-8") as f:
+        return json.load(f)
+
+
+class TestAuditFromTicketEvent(unittest.TestCase):
+
+    def test_audit_follows_ticket_audits_schema(self):
+        audit = streams.audit_from_ticket_event(json.loads(json.dumps(TICKET_EVENT)))
+
+        self.assertEqual(1001, audit["id"])
+        self.assertEqual(42, audit["ticket_id"])
+        self.assertEqual(7, audit["author_id"])
+        self.assertEqual({"channel": "Web form"}, audit["via"])
+        self.assertEqual({"custom": {}, "system": TICKET_EVENT["system"]}, audit["metadata"])
+        change, comment = audit["events"]
+        self.assertEqual({"id": 1, "type": "Change", "audit_id": 1001, "via": {"channel": "Web form"},
+                          "field_name": "priority", "value": "high", "previous_value": "low"}, change)
+        self.assertEqual("Comment", comment["type"])
+        self.assertEqual("Hello", comment["body"])
+        self.assertNotIn("comment_present", comment)
+
+        with singer.Transformer() as transformer:
+            transformer.transform(audit, load_schema("ticket_audits"))
+
+    def test_comments_follow_ticket_comments_schema(self):
+        audit = streams.audit_from_ticket_event(json.loads(json.dumps(TICKET_EVENT)))
+        comments = list(streams.TicketAudits.get_comments(audit, audit["ticket_id"]))
+
+        self.assertEqual(1, len(comments))
+        self.assertEqual(42, comments[0]["ticket_id"])
+        self.assertEqual("2023-01-01T00:00:00Z", comments[0]["created_at"])
+        with singer.Transformer() as transformer:
+            transformer.transform(comments[0], load_schema("ticket_comments"))
+
+
+class TestTicketEventsSource(unittest.TestCase):
+
+    @patch("tap_zendesk.streams.TicketAudits.sync")
+    @patch("tap_zendesk.streams.TicketComments.stream", MagicMock(tap_stream_id="ticket_comments"))
+    @patch("tap_zendesk.streams.TicketAudits.stream", MagicMock(tap_stream_id="ticket_audits"))
+    @patch("tap_zendesk.streams.http.get_time_based_export")
+    @patch("tap_zendesk.streams.Tickets.get_objects")
+    @patch("tap_zendesk.streams.singer.write_state")
+    @patch("tap_zendesk.streams.zendesk_metrics.capture")
+    def test_audits_and_comments_come_from_ticket_events(self, mock_capture, mock_write_state, mock_get_objects,
+                                                          mock_get_export, mock_audits_sync):
+        mock_get_objects.return_value = [{"id": 42, "generated_timestamp": 1672531300, "fields": "duplicate"}]
+        mock_get_export.return_value = [
+            {"ticket_events": [json.loads(json.dumps(TICKET_EVENT))], "end_time": 1672531250, "end_of_stream": True},
+        ]
+        state = {"bookmarks": {"tickets": {"generated_timestamp": "2023-01-01T00:00:00Z"}}}
+        config = {"subdomain": "test", "access_token": "token", "ticket_audits_source": "ticket_events"}
+
+        records = list(streams.Tickets(None, config).sync(state))
+
+        mock_audits_sync.assert_not_called()
+        self.assertEqual(42, records[0][1]["id"])
+        self.assertEqual(["ticket_audits", "ticket_comments"], [stream.tap_stream_id for stream, _ in records[1:]])
+        self.assertEqual(1672531200, mock_get_export.call_args.args[3])
+        self.assertEqual("comment_events", mock_get_export.call_args.args[4])
+        self.assertEqual("2023-01-01T00:00:50.000000Z",
+                         state["bookmarks"]["ticket_audits"][streams.TICKET_EVENTS_BOOKMARK_KEY])
+
+    @patch("tap_zendesk.streams.TicketComments.stream", MagicMock(tap_stream_id="ticket_comments"))
+    @patch("tap_zendesk.streams.TicketAudits.stream", MagicMock(tap_stream_id="ticket_audits"))
+    @patch("tap_zendesk.streams.http.get_time_based_export")
+    @patch("tap_zendesk.streams.Tickets.get_objects")
+    @patch("tap_zendesk.streams.singer.write_state")
+    @patch("tap_zendesk.streams.zendesk_metrics.capture")
+    def test_interrupted_events_export_resumes_from_the_original_bookmark(self, mock_capture, mock_write_state,
+                                                                          mock_get_objects, mock_get_export):
+        mock_get_objects.return_value = [{"id": 42, "generated_timestamp": 1672617600, "fields": "duplicate"}]
+        mock_get_export.side_effect = http.ZendeskInternalServerError("HTTP-error-code: 500")
+        state = {"bookmarks": {"tickets": {"generated_timestamp": "2023-01-01T00:00:00Z"}}}
+        config = {"subdomain": "test", "access_token": "token", "ticket_audits_source": "ticket_events"}
+
+        # Interrupted once the tickets bookmark moved on, before the events export was read
+        with self.assertRaises(http.ZendeskInternalServerError):
+            list(streams.Tickets(None, config).sync(state))
+        self.assertEqual("2023-01-02T00:00:00.000000Z", state["bookmarks"]["tickets"]["generated_timestamp"])
+
+        mock_get_objects.return_value = []
+        mock_get_export.side_effect = None
+        mock_get_export.return_value = [{"ticket_events": [], "end_time": 1672617600, "end_of_stream": True}]
+        list(streams.Tickets(None, config).sync(state))
+
+        self.assertEqual(1672531200, mock_get_export.call_args.args[3])
+
+    def test_unsupported_source_raises(self):
+        instance = streams.Tickets(None, {"ticket_audits_source": "audit_log"})
+        instance.get_objects = MagicMock(return_value=[])
+        with self.assertRaises(ValueError):
+            list(instance.sync({"bookmarks": {"tickets": {"generated_timestamp": "2023-01-01T00:00:00Z"}}}))
+
+
+class TestGetTimeBasedExport(unittest.TestCase):
+
+    @patch("tap_zendesk.http.call_api_json")
+    def test_follows_next_page_until_end_of_stream(self, mock_call_api_json):
+        mock_call_api_json.side_effect = [
+            {"ticket_events": [1], "next_page": "page_2", "end_of_stream": False},
+            {"ticket_events": [2], "next_page": "page_3", "end_of_stream": True},
+        ]
+        pages = list(http.get_time_based_export("page_1", "token", 300, 1672531200, "comment_events"))
+
+        self.assertEqual([[1], [2]], [page["ticket_events"] for page in pages])
+        self.assertEqual(["page_1", "page_2"], [call.args[0] for call in mock_call_api_json.call_args_list])
+        self.assertEqual({"start_time": 1672531200, "include": "comment_events"},
+                         mock_call_api_json.call_args_list[0].kwargs["params"])
+
+    @patch("tap_zendesk.http.time.time", return_value=1672532000)
+    @patch("tap_zendesk.http.call_api_json")
+    def test_stops_once_caught_up_without_end_of_stream(self, mock_call_api_json, mock_time):
+        # Like the ticket metric events export, no page says end_of_stream and every page has a next one
+        mock_call_api_json.side_effect = [
+            {"ticket_metric_events": [1], "next_page": "page_2", "end_time": 1672531200},
+            {"ticket_metric_events": [2], "next_page": "page_3", "end_time": 1672531800},
+            {"ticket_metric_events": [], "next_page": "page_3", "end_time": 1672531800},
+        ]
+        pages = list(http.get_time_based_export("page_1", "token", 300, 1672531000, None))
+
+        # The second page ends within 5 minutes of now
+        self.assertEqual([[1], [2]], [page["ticket_metric_events"] for page in pages])
+
+    @patch("tap_zendesk.http.time.time", return_value=1672600000)
+    @patch("tap_zendesk.http.call_api_json")
+    def test_stops_when_end_time_stops_advancing(self, mock_call_api_json, mock_time):
+        mock_call_api_json.side_effect = [
+            {"ticket_metric_events": [1], "next_page": "page_2", "end_time": 1672531200},
+            {"ticket_metric_events": [], "next_page": "page_2", "end_time": 1672531200},
+            {"ticket_metric_events": [], "next_page": "page_2", "end_time": 1672531200},
+        ]
+        pages = list(http.get_time_based_export("page_1", "token", 300, 1672531000, None))
+
+        self.assertEqual(2, len(pages))
+        self.assertEqual(2, mock_call_api_json.call_count)
+
+    @patch("tap_zendesk.http.time.time", return_value=1672532000)
+    @patch("tap_zendesk.http.call_api_json")
+    def test_organizations_export_finishes_when_caught_up(self, mock_call_api_json, mock_time):
+        mock_call_api_json.side_effect = [
+            {"organizations": [{"id": 1, "updated_at": "2023-01-01T00:00:00Z"}], "next_page": "page_2",
+             "end_time": 1672531900},
+            AssertionError("requested a page after catching up"),
+        ]
+        instance = streams.Organizations(None, {"subdomain": "acme", "access_token": "token"})
+        instance.stream = "organizations"
+
+        records = list(instance.sync({"bookmarks": {"organizations": {"updated_at": "2023-01-01T00:00:00Z"}}}))
+
+        self.assertEqual(1, len(records))
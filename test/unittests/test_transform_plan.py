@@ -0,0 +1,75 @@
+import copy
+import json
+import unittest
+import singer
+from singer import Transformer, metadata
+from singer.transform import SchemaMismatch
+from tap_zendesk.discover import load_shared_schema_refs, get_abs_path
+from tap_zendesk.transform import TransformPlan
+
+TICKET = {
+    "id": "1,001",
+    "generated_timestamp": 1672531200,
+    "created_at": "2023-01-01T10:00:00+02:00",
+    "updated_at": "",
+    "is_public": "false",
+    "tags": ["a", None],
+    "custom_fields": [{"id": 1, "value": {"nested": True}}],
+    "satisfaction_rating": {"score": "good", "unknown_key": 1},
+    "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+    "subject": "Hello",
+    "not_in_schema": "dropped",
+}
+
+
+def load_schema(name):
+    with open(get_abs_path("schemas/{}.json".format(name)), encoding="UTF-8") as f:
+        return singer.resolve_schema_references(json.load(f), load_shared_schema_refs())
+
+
+def load_mdata(schema, deselected=()):
+    mdata = metadata.new()
+    for field_name in schema["properties"]:
+        inclusion = "automatic" if field_name == "id" else "available"
+        mdata = metadata.write(mdata, ("properties", field_name), "inclusion", inclusion)
+        if field_name in deselected:
+            mdata = metadata.write(mdata, ("properties", field_name), "selected", False)
+    return mdata
+
+
+class TestTransformPlan(unittest.TestCase):
+    """
+    Confirm that a compiled TransformPlan gives the same result as singer's Transformer.
+    """
+
+    def assert_same_as_transformer(self, record, schema, mdata):
+        expected_transformer, actual_transformer = Transformer(), Transformer()
+        expected = expected_transformer.transform(copy.deepcopy(record), copy.deepcopy(schema), mdata)
+        plan = TransformPlan(copy.deepcopy(schema), mdata, actual_transformer)
+        self.assertEqual(expected, plan.transform(copy.deepcopy(record)))
+        self.assertEqual(expected_transformer.removed, actual_transformer.removed)
+        self.assertEqual(expected_transformer.filtered, actual_transformer.filtered)
+
+    def test_ticket_matches_transformer(self):
+        schema = load_schema("tickets")
+        self.assert_same_as_transformer(TICKET, schema, load_mdata(schema))
+
+    def test_deselected_fields_match_transformer(self):
+        schema = load_schema("tickets")
+        self.assert_same_as_transformer(TICKET, schema, load_mdata(schema, deselected=("subject", "id")))
+
+    def test_plan_is_reused_across_records(self):
+        schema = load_schema("tickets")
+        plan = TransformPlan(schema, load_mdata(schema), Transformer())
+        for ticket_id in range(3):
+            self.assertEqual(ticket_id, plan.transform({"id": ticket_id})["id"])
+
+    def test_schema_mismatch_is_raised_by_transformer(self):
+        schema = load_schema("tickets")
+        mdata = load_mdata(schema)
+        record = {"id": "not-an-integer", "tags": "not-a-list"}
+        with self.assertRaises(SchemaMismatch) as expected:
+            Transformer().transform(copy.deepcopy(record), copy.deepcopy(schema), mdata)
+        with self.assertRaises(SchemaMismatch) as actual:
+            TransformPlan(schema, mdata, Transformer()).transform(record)
+        self.assertEqual(str(expected.exception), str(actual.exception))
@@ -0,0 +1,215 @@
+import datetime
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pytz
+from tap_zendesk import http, streams
+
+NOW = datetime.datetime(2023, 1, 31, 0, 0, 0, tzinfo=pytz.UTC)
+DAY = 24 * 60 * 60
+# 2023-01-01T00:00:00Z
+JAN_1 = 1672531200
+
+
+def ticket(ticket_id, generated_timestamp):
+    return {"id": ticket_id, "generated_timestamp": generated_timestamp, "fields": "duplicate"}
+
+
+def fake_export(tickets):
+    """ Incremental export from `start_time`, in generated_timestamp order """
+    def get_objects(start_time, side_load=None, **kwargs):
+        if not isinstance(start_time, int):
+            start_time = start_time.timestamp()
+        for record in sorted(tickets, key=lambda record: record["generated_timestamp"]):
+            if record["generated_timestamp"] >= start_time:
+                yield dict(record)
+    return get_objects
+
+
+@patch("tap_zendesk.streams.utils.now", MagicMock(return_value=NOW))
+@patch("tap_zendesk.streams.singer.write_state")
+@patch("tap_zendesk.streams.zendesk_metrics.capture")
+class TestTicketsBackfill(unittest.TestCase):
+
+    config = {"tickets_backfill_concurrency": 3, "tickets_backfill_window_days": 10}
+
+    def state(self, bookmark="2023-01-01T00:00:00Z"):
+        return {"bookmarks": {"tickets": {"generated_timestamp": bookmark}}}
+
+    def test_windows_cover_bookmark_to_now(self, mock_capture, mock_write_state):
+        state = self.state()
+        instance = streams.Tickets(None, self.config)
+        windows = instance._backfill_windows(state, instance.get_bookmark(state))
+
+        self.assertEqual([("2023-01-01T00:00:00.000000Z", "2023-01-11T00:00:00.000000Z"),
+                          ("2023-01-11T00:00:00.000000Z", "2023-01-21T00:00:00.000000Z"),
+                          ("2023-01-21T00:00:00.000000Z", "2023-01-31T00:00:00.000000Z")], windows)
+        # Checkpointed before any window is exported
+        self.assertEqual(3, len(state["bookmarks"]["tickets"]["backfill"]["windows"]))
+        self.assertTrue(mock_write_state.called)
+
+    def test_no_backfill_when_bookmark_is_recent(self, mock_capture, mock_write_state):
+        state = self.state("2023-01-25T00:00:00Z")
+        instance = streams.Tickets(None, self.config)
+        self.assertEqual([], instance._backfill_windows(state, instance.get_bookmark(state)))
+        self.assertNotIn("backfill", state["bookmarks"]["tickets"])
+
+    def test_tickets_of_every_window_are_emitted_once(self, mock_capture, mock_write_state):
+        tickets = [ticket(i, JAN_1 + i * DAY) for i in range(30)] + [ticket(30, JAN_1 + 30 * DAY + 5)]
+        state = self.state()
+        instance = streams.Tickets(None, self.config)
+        instance.stream = MagicMock(tap_stream_id="tickets")
+        instance.get_objects = fake_export(tickets)
+
+        records = [record for _, record in instance.sync(state)]
+
+        # Windows are exported in parallel, then the incremental export carries on from where the backfill ended
+        self.assertEqual(list(range(31)), sorted(record["id"] for record in records))
+        self.assertEqual(30, records[-1]["id"])
+        self.assertEqual({"generated_timestamp": "2023-01-31T00:00:05.000000Z"}, state["bookmarks"]["tickets"])
+
+    def test_bookmark_only_moves_past_completed_windows(self, mock_capture, mock_write_state):
+        release_first_window = threading.Event()
+        tickets = [ticket(i, JAN_1 + i * DAY) for i in range(30)]
+        export = fake_export(tickets)
+
+        def get_objects(start_time, side_load=None, **kwargs):
+            if start_time == JAN_1:
+                release_first_window.wait(5)
+            yield from export(start_time, side_load)
+
+        state = self.state()
+        instance = streams.Tickets(None, self.config)
+        instance.stream = MagicMock(tap_stream_id="tickets")
+        instance.get_objects = get_objects
+
+        bookmarks = []
+        for _, record in instance.sync(state):
+            bookmarks.append(state["bookmarks"]["tickets"]["generated_timestamp"])
+            if record["id"] >= 10:
+                release_first_window.set()
+
+        # Tickets of the later windows arrive first, but the bookmark waits for the first window
+        self.assertEqual({"2023-01-01T00:00:00Z"}, set(bookmarks[:20]))
+        self.assertEqual("2023-01-31T00:00:00.000000Z", state["bookmarks"]["tickets"]["generated_timestamp"])
+        self.assertNotIn("backfill", state["bookmarks"]["tickets"])
+
+    def test_resumes_unfinished_windows(self, mock_capture, mock_write_state):
+        tickets = [ticket(i, JAN_1 + i * DAY) for i in range(30)]
+        state = self.state("2023-01-11T00:00:00.000000Z")
+        state["bookmarks"]["tickets"]["backfill"] = {
+            "end": "2023-01-31T00:00:00.000000Z",
+            "windows": [["2023-01-11T00:00:00.000000Z", "2023-01-21T00:00:00.000000Z"]],
+        }
+        instance = streams.Tickets(None, self.config)
+        instance.stream = MagicMock(tap_stream_id="tickets")
+        instance.get_objects = fake_export(tickets)
+
+        records = [record for _, record in instance.sync(state)]
+
+        # Only the unfinished window is exported again, tickets of the other windows had been
+        # emitted before the tap stopped
+        self.assertEqual(list(range(10, 20)), sorted(record["id"] for record in records))
+        self.assertEqual("2023-01-31T00:00:00.000000Z", state["bookmarks"]["tickets"]["generated_timestamp"])
+        self.assertNotIn("backfill", state["bookmarks"]["tickets"])
+
+
+@patch("tap_zendesk.streams.utils.now", MagicMock(return_value=NOW))
+@patch("tap_zendesk.streams.singer.write_state")
+class TestUsersBackfill(unittest.TestCase):
+
+    def test_users_are_backfilled_in_windows(self, mock_write_state):
+        users = [{"id": i, "updated_at": "2023-01-{:02d}T00:00:00Z".format(i + 1)} for i in range(30)]
+
+        def get_objects(start_time, side_load=None, **kwargs):
+            if not isinstance(start_time, int):
+                start_time = int(start_time.timestamp())
+            for user in users:
+                if JAN_1 + user["id"] * DAY >= start_time:
+                    yield dict(user)
+
+        state = {"bookmarks": {"users": {"updated_at": "2023-01-01T00:00:00Z"}}}
+        instance = streams.Users(None, {"users_backfill_concurrency": 2, "users_backfill_window_days": 7})
+        instance.stream = MagicMock(tap_stream_id="users")
+        instance.get_objects = get_objects
+
+        records = [record for _, record in instance.sync(state)]
+
+        self.assertEqual(list(range(30)), sorted(record["id"] for record in records))
+        self.assertEqual({"updated_at": "2023-01-31T00:00:00.000000Z"}, state["bookmarks"]["users"])
+        # State is written once the windows are planned, as each of the 5 windows completes, and at the end
+        self.assertEqual(7, mock_write_state.call_count)
+
+
+@patch("tap_zendesk.streams.utils.now", MagicMock(return_value=NOW))
+@patch("tap_zendesk.streams.singer.write_state")
+class TestTicketMetricEventsBackfill(unittest.TestCase):
+
+    @patch("tap_zendesk.http.get_time_based_export")
+    def test_windows_use_the_time_based_export(self, mock_get_export, mock_write_state):
+        def get_export(url, access_token, request_timeout, start_time, side_load):
+            events = [{"id": i, "time": "2023-01-{:02d}T00:00:00Z".format(i + 1)} for i in range(30)
+                      if JAN_1 + i * DAY >= start_time]
+            return iter([{"ticket_metric_events": events[:5]}, {"ticket_metric_events": events[5:]}])
+        mock_get_export.side_effect = get_export
+
+        client = MagicMock()
+        state = {"bookmarks": {"ticket_metric_events": {"time": "2023-01-01T00:00:00Z"}}}
+        instance = streams.TicketMetricEvents(client, {"subdomain": "test", "access_token": "token",
+                                                       "ticket_metric_events_backfill_concurrency": 3,
+                                                       "ticket_metric_events_backfill_window_days": 10})
+        instance.stream = MagicMock(tap_stream_id="ticket_metric_events")
+
+        records = [record for _, record in instance.sync(state)]
+
+        self.assertEqual(list(range(30)), sorted(record["id"] for record in records))
+        self.assertEqual(30, instance.count)
+        # The incremental export carries on from the end of the backfill
+        self.assertEqual([JAN_1, JAN_1 + 10 * DAY, JAN_1 + 20 * DAY, int(NOW.timestamp()) - 1],
+                         sorted(call.args[3] for call in mock_get_export.call_args_list))
+        self.assertEqual("https://test.zendesk.com/api/v2/incremental/ticket_metric_events.json",
+                         mock_get_export.call_args.args[0])
+        self.assertEqual({"time": "2023-01-31T00:00:00.000000Z"}, state["bookmarks"]["ticket_metric_events"])
+
+
+class TestWindowedExport(unittest.TestCase):
+
+    def test_streams_must_implement_the_export_hooks(self):
+        class NoHooks(streams.WindowedExport, streams.CursorBasedExportStream):
+            name = "no_hooks"
+
+        with self.assertRaises(TypeError):
+            NoHooks(None, {})
+
+
+class TestMergeExports(unittest.TestCase):
+
+    def test_yields_records_and_end_of_every_export(self):
+        results = list(http.merge_exports([iter([1, 2]), iter([]), iter([3])], 2))
+
+        self.assertEqual([(0, 1), (0, 2), (0, http.STREAM_END)], [item for item in results if item[0] == 0])
+        self.assertEqual([(1, http.STREAM_END)], [item for item in results if item[0] == 1])
+        self.assertEqual([(2, 3), (2, http.STREAM_END)], [item for item in results if item[0] == 2])
+
+    def test_errors_are_raised_to_the_reader(self):
+        def failing():
+            yield 1
+            raise http.ZendeskInternalServerError("boom")
+
+        with self.assertRaises(http.ZendeskInternalServerError):
+            list(http.merge_exports([failing()], 1))
+
+    def test_stopping_early_stops_the_exports(self):
+        read = []
+
+        def endless():
+            while True:
+                read.append(1)
+                yield len(read)
+
+        merged = http.merge_exports([endless()], 1, max_buffered_records=2)
+        next(merged)
+        merged.close()
+        count = len(read)
+        self.assertLessEqual(count, 4)